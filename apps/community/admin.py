@@ -1,6 +1,5 @@
 from django.contrib import admin
 from .models import Post, PostUpvote, Comment
-from django.db.models import Count
 
 
 # -------------------------------
@@ -8,19 +7,10 @@ from django.db.models import Count
 # -------------------------------
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'project', 'type', 'upvotes_count', 'created_at')
+    list_display = ('id', 'user', 'project', 'type', 'upvotes_count', 'comments_count', 'created_at')
     list_filter = ('type', 'project')
     search_fields = ('user__phone_number', 'content', 'project__title')
-    readonly_fields = ('created_at',)
-
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            upvotes_count_annotated=Count('upvotes')
-        )
-
-    def upvotes_count(self, obj):
-        return obj.upvotes_count_annotated
-    upvotes_count.short_description = 'Upvotes' #type: ignore
+    readonly_fields = ('created_at', 'upvotes_count', 'comments_count')
 
 # -------------------------------
 # Post Upvote Admin
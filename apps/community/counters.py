@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import Post, PostUpvote, Comment
+
+COUNTER_FIELDS = ('upvotes_count', 'comments_count')
+
+
+def _shift(post_id, field, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    return posts.update(**{field: F(field) + delta})
+
+
+def upvoted(post_id, delta):
+    """ Shift the stored upvote count of a post, never below zero """
+    return _shift(post_id, 'upvotes_count', delta)
+
+
+def commented(post_id, delta):
+    """ Shift the stored comment count of a post, never below zero """
+    return _shift(post_id, 'comments_count', delta)
+
+
+def replied(comment, delta):
+    """ Shift the reply count of every ancestor of a comment by delta, in one UPDATE """
+    ancestors = Comment.objects.filter(pk__in=comment.ancestor_ids)
+    if delta < 0:
+        ancestors = ancestors.filter(reply_count__gte=-delta)
+    return ancestors.update(reply_count=F('reply_count') + delta)
+
+
+def _actual_counts():
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+                total=Count('id')
+            ).values('total')
+        ), Value(0))
+
+    return Post.objects.annotate(
+        actual_upvotes=count_of(PostUpvote),
+        actual_comments=count_of(Comment),
+    ).exclude(
+        upvotes_count=F('actual_upvotes'), comments_count=F('actual_comments')
+    ).values_list('id', 'upvotes_count', 'actual_upvotes', 'comments_count', 'actual_comments')
+
+
+def repair(fix=True):
+    """
+    Find posts whose stored counters disagree with the upvote and comment
+    tables. Returns a list of (post id, {field: (stored, actual)}).
+    """
+    drift = []
+    with transaction.atomic():
+        for pk, upvotes_count, actual_upvotes, comments_count, actual_comments in _actual_counts():
+            changes = {}
+            if upvotes_count != actual_upvotes:
+                changes['upvotes_count'] = (upvotes_count, actual_upvotes)
+            if comments_count != actual_comments:
+                changes['comments_count'] = (comments_count, actual_comments)
+            drift.append((pk, changes))
+            if fix:
+                Post.objects.filter(pk=pk).update(**{field: actual for field, (_, actual) in changes.items()})
+    return drift
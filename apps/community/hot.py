@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Post
+
+
+def _age_factor(created_at, now):
+    """ (age in hours + 2) ** gravity: how much a post's engagement is discounted by its age """
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    return (age_hours + 2) ** settings.HOT_FEED_GRAVITY
+
+
+def score(upvotes, comments, created_at, now=None):
+    """ Time-decayed hot score: engagement over a growing power of age """
+    now = now or timezone.now()
+    engagement = upvotes + settings.HOT_FEED_COMMENT_WEIGHT * comments + 1
+    return engagement / _age_factor(created_at, now)
+
+
+def refresh(post, now=None):
+    """
+    Recompute one post's score after an upvote or comment, in a single
+    UPDATE that reads the stored counters, so concurrent events can't write
+    a score from stale counts.
+    """
+    now = now or timezone.now()
+    engagement = Cast(F('upvotes_count') + settings.HOT_FEED_COMMENT_WEIGHT * F('comments_count') + 1, FloatField())
+    return Post.objects.filter(pk=post.pk).update(
+        hot_score=engagement / Value(_age_factor(post.created_at, now), output_field=FloatField())
+    )
+
+
+def decay(batch_size=1000, now=None):
+    """
+    Periodic pass that ages the stored scores. Posts inside the
+    HOT_FEED_HORIZON_DAYS window are recomputed in id-ordered batches; older
+    posts drop to 0, at which point the feed falls back to newest first.
+    Returns (recomputed, retired).
+    """
+    now = now or timezone.now()
+    horizon = now - timedelta(days=settings.HOT_FEED_HORIZON_DAYS)
+
+    retired = Post.objects.filter(created_at__lt=horizon, hot_score__gt=0).update(hot_score=0)
+
+    recomputed = 0
+    last_id = 0
+    recent = Post.objects.filter(created_at__gte=horizon).order_by('id')
+    while True:
+        posts = list(recent.filter(id__gt=last_id).only('id', 'upvotes_count', 'comments_count', 'created_at')[:batch_size])
+        if not posts:
+            break
+        for post in posts:
+            post.hot_score = score(post.upvotes_count, post.comments_count, post.created_at, now)
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, ['hot_score'])
+        recomputed += len(posts)
+        last_id = posts[-1].id
+    return recomputed, retired
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.community import hot
+
+
+class Command(BaseCommand):
+    help = "Recompute the time-decayed hot scores of recent posts (run every few minutes, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Posts updated per transaction")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        recomputed, retired = hot.decay(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {recomputed} scores, retired {retired} old posts in {time.perf_counter() - started:.1f}s"
+        ))
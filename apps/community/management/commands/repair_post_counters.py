@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from apps.community import counters
+
+
+class Command(BaseCommand):
+    help = "Recount post upvotes and comments, report drift and correct it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it")
+
+    def handle(self, *args, **options):
+        drift = counters.repair(fix=not options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Post counters are in sync"))
+            return
+
+        for pk, changes in drift:
+            details = ', '.join(f"{field} {stored} -> {actual}" for field, (stored, actual) in changes.items())
+            self.stdout.write(self.style.WARNING(f"Post {pk}: {details}"))
+        if options['dry_run']:
+            self.stdout.write("Dry run, nothing was changed")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} posts"))
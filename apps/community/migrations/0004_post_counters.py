@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model('community', 'Post')
+    PostUpvote = apps.get_model('community', 'PostUpvote')
+    Comment = apps.get_model('community', 'Comment')
+
+    def count_of(model):
+        return models.functions.Coalesce(models.Subquery(
+            model.objects.filter(post=models.OuterRef('pk')).order_by().values('post').annotate(
+                total=models.Count('id')
+            ).values('total')
+        ), models.Value(0))
+
+    Post.objects.update(upvotes_count=count_of(PostUpvote), comments_count=count_of(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0003_post_datetime_post_description_post_location_and_more'),
+        ('projects', '0009_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='upvotes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['upvotes_count', 'id'], name='post_upvotes_count_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
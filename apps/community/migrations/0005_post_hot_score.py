@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:09
+
+import django.db.models.functions.text
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_hot_scores(apps, schema_editor):
+    """ Same formula as apps.community.hot.score, for posts inside the horizon """
+    Post = apps.get_model('community', 'Post')
+    now = timezone.now()
+    posts = list(Post.objects.filter(created_at__gte=now - timedelta(days=settings.HOT_FEED_HORIZON_DAYS)))
+    for post in posts:
+        age_hours = max((now - post.created_at).total_seconds() / 3600, 0)
+        engagement = post.upvotes_count + settings.HOT_FEED_COMMENT_WEIGHT * post.comments_count + 1
+        post.hot_score = engagement / (age_hours + 2) ** settings.HOT_FEED_GRAVITY
+    Post.objects.bulk_update(posts, ['hot_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_post_counters'),
+        ('projects', '0009_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['hot_score', 'id'], name='post_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['project', 'hot_score', 'id'], name='post_project_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(django.db.models.functions.text.Upper('sector'), models.F('hot_score'), models.F('id'), name='post_sector_hot_idx'),
+        ),
+        migrations.RunPython(populate_hot_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    """ Existing comments are all top-level: their path is their own zero-padded id """
+    Comment = apps.get_model('community', 'Comment')
+    Comment.objects.update(path=models.functions.LPad(
+        models.functions.Cast('id', output_field=models.CharField()), 10, models.Value('0')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0005_post_hot_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='community.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,20 @@
 from django.db import models
+from django.db.models.functions import Upper
 from apps.users.models import User
 from apps.projects.models import Project
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self, user=None):
+        """ Load everything PostSerializer needs so a page costs a fixed number of queries """
+        queryset = self.select_related('user', 'project')
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                is_upvoted=models.Exists(PostUpvote.objects.filter(post=models.OuterRef('pk'), user=user))
+            )
+        return queryset
+
+
 class Post(models.Model):
     POST_TYPE_CHOICES = [
         ("suggestion", "Suggestion"),
@@ -22,14 +34,26 @@ class Post(models.Model):
     content = models.TextField()
     type = models.CharField(max_length=50, choices=POST_TYPE_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized counters, kept in step by the upvote/comment views (see counters.py)
+    upvotes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Time-decayed ranking, refreshed on upvotes/comments and by decay_hot_scores (see hot.py)
+    hot_score = models.FloatField(default=0)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['upvotes_count', 'id'], name='post_upvotes_count_idx'),
+            models.Index(fields=['hot_score', 'id'], name='post_hot_idx'),
+            models.Index(fields=['project', 'hot_score', 'id'], name='post_project_hot_idx'),
+            # The feed matches sectors case-insensitively
+            models.Index(Upper('sector'), models.F('hot_score'), models.F('id'), name='post_sector_hot_idx'),
+        ]
 
     def __str__(self):
         return f"{self.type} by {self.user.phone_number}"
 
-    @property 
-    def upvotes_count(self):
-        return self.upvotes.count()  #type: ignore
-
     def has_upvoted(self, user):
         return self.upvotes.filter(user=user).exists() #type: ignore
 
@@ -44,11 +68,56 @@ class PostUpvote(models.Model):
     def __str__(self):
         return f"{self.user.phone_number} upvoted {self.post.id}" #type: ignore
     
+class CommentQuerySet(models.QuerySet):
+    def thread(self, post):
+        """ Every comment of a post in display order (each reply right after its parent), one index range """
+        return self.filter(post=post).order_by('path')
+
+    def subtree(self, comment):
+        """ The replies under a comment, at any depth, in display order """
+        # Descendant paths start with "<path>/"; '0' is the character right after '/'
+        return self.filter(
+            post_id=comment.post_id, path__gt=f"{comment.path}/", path__lt=f"{comment.path}0"
+        ).order_by('path')
+
+
 class Comment(models.Model):
+    # Materialized path: the ids of the ancestors and of the comment itself, zero padded and
+    # joined with '/', so sorting by path lists a thread in display order
+    PATH_SEGMENT_WIDTH = 10
+    MAX_DEPTH = 10
+
     user =  models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     post =  models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
+    parent = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="replies")
     content = models.TextField()
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Replies at any depth under this comment, kept in step by the comment views (see counters.py)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.phone_number} on post {self.post.id}" #type: ignore
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        if creating and self.parent_id:
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+        if creating:
+            # The path ends with the comment's own id, which only exists after the insert
+            segment = f"{self.pk:0{self.PATH_SEGMENT_WIDTH}d}"
+            self.path = f"{self.parent.path}/{segment}" if self.parent_id else segment
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    @property
+    def ancestor_ids(self):
+        return [int(segment) for segment in self.path.split('/')[:-1]]
@@ -1,24 +1,44 @@
 from rest_framework import serializers
 from .models import Post, PostUpvote, Comment
-from apps.users.serializers import UserSerializer
+from apps.users.serializers import UserSummarySerializer
 
 class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    """ Comment with a compact author (load comments with select_related('user')) """
+    user = UserSummarySerializer(read_only=True)
 
     class Meta:
         model = Comment
-        fields = ["id", "user", "content", "created_at"]
-        read_only_fields = ["created_at"]
+        fields = ["id", "post", "parent", "user", "content", "depth", "reply_count", "created_at"]
+        read_only_fields = ["depth", "reply_count", "created_at"]
+        # The per-post comments action takes the post from the URL
+        extra_kwargs = {"post": {"required": False}}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # A comment can't move: its path and its ancestors' reply counts depend on where it was posted
+            for name in ("post", "parent"):
+                fields[name].read_only = True
+        return fields
+
+    def validate(self, attrs):
+        parent = attrs.get("parent")
+        if parent:
+            post = attrs.get("post") or self.context.get("post")
+            if post and parent.post_id != post.id:
+                raise serializers.ValidationError({"parent": "The parent comment belongs to another post."})
+            if parent.depth + 1 > Comment.MAX_DEPTH:
+                raise serializers.ValidationError({"parent": "This thread is too deep to reply to."})
+        return attrs
 
     def create(self, validated_data):
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
 
 class PostSerializer(serializers.ModelSerializer):
-    upvotes_count = serializers.ReadOnlyField()
+    """ Uses the is_upvoted annotation of Post.objects.for_listing when present, a per-post query otherwise """
     has_upvoted = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -27,20 +47,19 @@ class PostSerializer(serializers.ModelSerializer):
             'content', 'type', 'user', 'user_name', 'project', 
             'upvotes_count', 'has_upvoted', 'comments_count', 'created_at'
         ]
-        read_only_fields = ['created_at', 'user']
+        read_only_fields = ['created_at', 'user', 'upvotes_count', 'comments_count']
 
     def get_has_upvoted(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            if hasattr(obj, 'is_upvoted'):
+                return obj.is_upvoted
             return obj.has_upvoted(request.user)
         return False
     
     def get_user_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}".strip() or obj.user.phone_number
     
-    def get_comments_count(self, obj):
-        return obj.comments.count()
-    
     def create(self, validated_data):
         request = self.context.get('request')
         if not request:
@@ -1,3 +1,342 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.projects.models import Project
+from apps.users.models import User
+from .models import Post, PostUpvote, Comment
+from .views import CommentViewSet
+from . import counters, hot
+
+
+class PostListQueryCountTests(TestCase):
+    """ A page of posts must cost a handful of queries whatever its size """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(phone_number="788000201", first_name="Aline", last_name="Uwase")
+        cls.reader = User.objects.create_user(phone_number="788000202")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def _create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(user=self.author, content=f"Post {i}", type="suggestion")
+            Comment.objects.create(user=self.reader, post=post, content="Nice")
+            Comment.objects.create(user=self.author, post=post, content="Thanks")
+            PostUpvote.objects.create(user=self.author, post=post)
+            if i % 2:
+                PostUpvote.objects.create(user=self.reader, post=post)
+        counters.repair()
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        self._create_posts(4)
+        small, _ = self._count_queries("/api/community/posts/")
+        self._create_posts(96)
+        large, response = self._count_queries("/api/community/posts/")
+
+        self.assertEqual(len(response.data), 100)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 1)
+
+        counts = {(post["upvotes_count"], post["has_upvoted"]) for post in response.data}
+        self.assertEqual(counts, {(1, False), (2, True)})
+        self.assertEqual({post["comments_count"] for post in response.data}, {2})
+        self.assertEqual(response.data[0]["user_name"], "Aline Uwase")
+
+    def test_cursor_page_query_count(self):
+        self._create_posts(100)
+        queries, response = self._count_queries("/api/community/posts/?cursor=&page_size=100")
+
+        self.assertEqual(len(response.data["results"]), 100)
+        self.assertLessEqual(queries, 1)
+
+
+@override_settings(HOT_FEED_GRAVITY=1.5, HOT_FEED_COMMENT_WEIGHT=2, HOT_FEED_HORIZON_DAYS=14)
+class HotFeedTests(TestCase):
+    """ Hot scores follow engagement and age, and the feed filters read them through their indexes """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(phone_number="788000211")
+        cls.reader = User.objects.create_user(phone_number="788000212")
+        cls.project = Project.objects.create(
+            title="Road works", sector="Nyamirambo", datetime=timezone.now() + timedelta(days=3), admin=cls.author,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.now = timezone.now()
+
+    def _post(self, age=timedelta(0), upvotes=0, comments=0, **kwargs):
+        post = Post.objects.create(user=self.author, content="Idea", type="suggestion", **kwargs)
+        Post.objects.filter(pk=post.pk).update(
+            created_at=self.now - age, upvotes_count=upvotes, comments_count=comments
+        )
+        post.refresh_from_db()
+        return post
+
+    def _feed(self, query=''):
+        response = self.client.get(f"/api/community/posts/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [post["id"] for post in response.data]
+
+    def test_score_weighs_comments_and_decays_with_age(self):
+        created = self.now - timedelta(hours=2)
+        self.assertAlmostEqual(hot.score(3, 1, created, self.now), (3 + 2 * 1 + 1) / 4 ** 1.5)
+        self.assertGreater(hot.score(0, 1, created, self.now), hot.score(1, 0, created, self.now))
+        self.assertGreater(hot.score(5, 0, created, self.now), hot.score(5, 0, created - timedelta(hours=5), self.now))
+        # A clock skewed post from the future counts as brand new
+        self.assertEqual(hot.score(0, 0, self.now + timedelta(hours=1), self.now), 1 / 2 ** 1.5)
+
+    def test_refresh_reads_the_stored_counters(self):
+        post = self._post(age=timedelta(hours=3), upvotes=4, comments=2)
+
+        self.assertEqual(hot.refresh(post, self.now), 1)
+        post.refresh_from_db()
+        self.assertAlmostEqual(post.hot_score, hot.score(4, 2, post.created_at, self.now))
+
+    def test_decay_recomputes_recent_posts_and_retires_old_ones(self):
+        recent = [self._post(age=timedelta(hours=hours), upvotes=hours) for hours in (1, 5, 30)]
+        old = self._post(age=timedelta(days=15), upvotes=50)
+        Post.objects.update(hot_score=100)
+
+        self.assertEqual(hot.decay(batch_size=2, now=self.now), (3, 1))
+        for post in recent:
+            post.refresh_from_db()
+            self.assertAlmostEqual(post.hot_score, hot.score(post.upvotes_count, 0, post.created_at, self.now))
+        old.refresh_from_db()
+        self.assertEqual(old.hot_score, 0)
+        # Retired posts aren't written again
+        self.assertEqual(hot.decay(now=self.now), (3, 0))
+
+    def test_hot_feed_order(self):
+        fresh = self._post(age=timedelta(hours=1), upvotes=2)
+        popular_old = self._post(age=timedelta(days=2), upvotes=20)
+        quiet = self._post(age=timedelta(hours=1))
+        hot.decay(now=self.now)
+
+        self.assertEqual(self._feed("sort_by=hot"), [fresh.pk, quiet.pk, popular_old.pk])
+        self.assertEqual(self._feed("sort_by=popular"), [popular_old.pk, fresh.pk, quiet.pk])
+
+    def test_filters(self):
+        in_project = self._post(project=self.project, sector="Nyamirambo")
+        feedback = self._post(sector="nyamirambo")
+        Post.objects.filter(pk=feedback.pk).update(type="feedback")
+        self._post(sector="Remera")
+
+        self.assertEqual(self._feed(f"project={self.project.pk}"), [in_project.pk])
+        self.assertEqual(self._feed("type=feedback"), [feedback.pk])
+        self.assertEqual(self._feed("sector=NYAMIRAMBO&sort_by=hot"), [feedback.pk, in_project.pk])
+
+    def test_invalid_project_filter_is_a_bad_request(self):
+        for value in ("abc", "1.5", "-1"):
+            response = self.client.get(f"/api/community/posts/?project={value}")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("project", response.data)
+
+
+class CommentThreadQueryCountTests(TestCase):
+    """ A whole thread is one index range read on the comment paths, however many comments it has """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(phone_number="788000221", first_name="Eric")
+        cls.post = Post.objects.create(user=cls.author, content="Clean the market", type="suggestion")
+        # 50 roots, each with 3 replies that have 2 replies of their own: 500 comments
+        for i in range(50):
+            root = Comment.objects.create(user=cls.author, post=cls.post, content=f"Root {i}")
+            for j in range(3):
+                reply = Comment.objects.create(user=cls.author, post=cls.post, parent=root, content=f"Reply {j}")
+                for k in range(2):
+                    Comment.objects.create(user=cls.author, post=cls.post, parent=reply, content=f"Nested {k}")
+        cls.root = Comment.objects.filter(post=cls.post, depth=0).order_by('path').first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def _assert_thread_order(self, comments):
+        seen = set()
+        for comment in comments:
+            # Every reply comes after its parent
+            self.assertTrue(comment["parent"] is None or comment["parent"] in seen)
+            seen.add(comment["id"])
+
+    def test_threaded_list_query_count(self):
+        queries, response = self._count_queries(f"/api/community/comments/?post={self.post.pk}&threaded=1")
+
+        self.assertEqual(len(response.data), 500)
+        self.assertLessEqual(queries, 1)
+        self._assert_thread_order(response.data)
+        self.assertEqual(response.data[0]["user"]["name"], "Eric")
+
+    def test_post_thread_query_count(self):
+        queries, response = self._count_queries(f"/api/community/posts/{self.post.pk}/comments/?threaded=1")
+
+        self.assertEqual(len(response.data), 500)
+        # The post, then the thread
+        self.assertLessEqual(queries, 2)
+        self._assert_thread_order(response.data)
+
+    def test_threaded_cursor_page_query_count(self):
+        queries, response = self._count_queries(
+            f"/api/community/comments/?post={self.post.pk}&threaded=1&cursor=&page_size=100"
+        )
+
+        self.assertEqual(len(response.data["results"]), 100)
+        self.assertLessEqual(queries, 1)
+        self._assert_thread_order(response.data["results"])
+
+    def test_replies_query_count(self):
+        queries, response = self._count_queries(f"/api/community/comments/{self.root.pk}/replies/")
+
+        self.assertEqual(len(response.data), 9)
+        self.assertLessEqual(queries, 2)
+
+    def test_invalid_post_filter_is_a_bad_request(self):
+        response = self.client.get("/api/community/comments/?post=abc")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("post", response.data)
+
+
+class CommentTreeTests(TestCase):
+    """ Comment paths, subtrees and the reply/comment counters kept by the comment views """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(phone_number="788000231")
+        cls.post = Post.objects.create(user=cls.author, content="Plant trees", type="suggestion")
+        cls.other_post = Post.objects.create(user=cls.author, content="Fix the road", type="suggestion")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def _comment(self, parent=None, post=None):
+        return Comment.objects.create(user=self.author, post=post or self.post, parent=parent, content="Yes")
+
+    def _reply(self, parent):
+        response = self.client.post(
+            "/api/community/comments/", {"post": self.post.pk, "parent": parent.pk, "content": "Agreed"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        return Comment.objects.get(pk=response.data["id"])
+
+    def _counts(self, *comments):
+        return [Comment.objects.get(pk=comment.pk).reply_count for comment in comments]
+
+    def test_save_builds_path_and_depth(self):
+        root = self._comment()
+        reply = self._comment(parent=root)
+        nested = self._comment(parent=reply)
+
+        self.assertEqual((root.path, root.depth), (f"{root.pk:010d}", 0))
+        self.assertEqual((reply.path, reply.depth), (f"{root.pk:010d}/{reply.pk:010d}", 1))
+        self.assertEqual(nested.depth, 2)
+        self.assertEqual(nested.ancestor_ids, [root.pk, reply.pk])
+        # The path was written to the row too, not just the instance
+        self.assertEqual(Comment.objects.get(pk=nested.pk).path, nested.path)
+
+        # Saving again leaves the path alone
+        nested.content = "Edited"
+        nested.save()
+        self.assertEqual(Comment.objects.get(pk=nested.pk).path, nested.path)
+
+    def test_subtree_is_exactly_the_descendants(self):
+        root = self._comment()
+        reply = self._comment(parent=root)
+        nested = self._comment(parent=reply)
+        sibling = self._comment()
+        self._comment(parent=sibling)
+        self._comment(post=self.other_post)
+
+        self.assertEqual(list(Comment.objects.subtree(root)), [reply, nested])
+        self.assertEqual(list(Comment.objects.subtree(reply)), [nested])
+        self.assertEqual(list(Comment.objects.subtree(nested)), [])
+        self.assertEqual(list(Comment.objects.thread(self.post))[:3], [root, reply, nested])
+
+    def test_subtree_of_a_prefix_id(self):
+        # Ids 1 and 10 share a prefix, the zero padding keeps their subtrees apart
+        for _ in range(10):
+            self._comment()
+        first, tenth = Comment.objects.filter(post=self.post).order_by('id')[:10][::9]
+        reply = self._comment(parent=tenth)
+
+        self.assertEqual(list(Comment.objects.subtree(first)), [])
+        self.assertEqual(list(Comment.objects.subtree(tenth)), [reply])
+
+    def test_replies_shift_every_ancestor(self):
+        root = self._comment()
+        reply = self._reply(root)
+        nested = self._reply(reply)
+        self._reply(nested)
+
+        self.assertEqual(self._counts(root, reply, nested), [3, 2, 1])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+
+    def test_destroy_removes_the_subtree_from_the_counters(self):
+        root = self._comment()
+        counters.repair()
+        reply = self._reply(root)
+        self._reply(self._reply(reply))
+
+        response = self.client.delete(f"/api/community/comments/{reply.pk}/")
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(self._counts(root), [0])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_destroy_counts_replies_its_reply_count_missed(self):
+        root = self._comment()
+        counters.repair()
+        reply = self._reply(root)
+        # The view read the comment, then a reply landed under it before the delete
+        with mock.patch.object(CommentViewSet, 'get_object', return_value=Comment.objects.get(pk=reply.pk)):
+            self._reply(reply)
+            response = self.client.delete(f"/api/community/comments/{reply.pk}/")
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(self._counts(root), [0])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_update_cannot_move_a_comment(self):
+        root = self._comment()
+        other_root = self._comment(post=self.other_post)
+        reply = self._reply(root)
+
+        for method in (self.client.patch, self.client.put):
+            response = method(
+                f"/api/community/comments/{reply.pk}/",
+                {"post": self.other_post.pk, "parent": other_root.pk, "content": "Moved"},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 200)
+
+        reply.refresh_from_db()
+        self.assertEqual((reply.post_id, reply.parent_id, reply.content), (self.post.pk, root.pk, "Moved"))
+        self.assertEqual(self._counts(root, other_root), [1, 0])
 
-# Create your tests here.
@@ -1,20 +1,85 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.db import transaction, IntegrityError
+from django.db.models.functions import Upper
 from django.shortcuts import get_object_or_404
 from .models import Post, PostUpvote, Comment
+from . import counters, hot
 from .serializers import PostSerializer, PostUpvoteSerializer, CommentSerializer
 from apps.notifications.utils import create_comment_notification, create_upvote_notification
+from umugandatech.pagination import KeysetPagination
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+
+def _id_param(params, name):
+    """ An id filter from the query string, a 400 rather than a database error when it isn't one """
+    value = params.get(name)
+    if not value:
+        return None
+    if not value.isdigit():
+        raise ValidationError({name: ['A valid integer is required.']})
+    return int(value)
+
+
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    # Stored, indexed sort keys (see the Post indexes)
+    SORT_OPTIONS = {
+        'recent': '-created_at',
+        'popular': '-upvotes_count',
+        'hot': '-hot_score',
+    }
+
+    def get_queryset(self): #type: ignore
+        # The requester's upvote and the author come with the posts, not one query per post
+        queryset = Post.objects.for_listing(self.request.user)
+        params = self.request.query_params
+
+        # Filters
+        post_type = params.get('type')
+        if post_type:
+            queryset = queryset.filter(type=post_type)
+        project = _id_param(params, 'project')
+        if project:
+            queryset = queryset.filter(project_id=project)
+        sector = params.get('sector')
+        if sector:
+            # Same expression as post_sector_hot_idx
+            queryset = queryset.alias(sector_key=Upper('sector')).filter(sector_key=sector.upper())
+
+        sort_field = self.SORT_OPTIONS.get(params.get('sort_by'), '-created_at')
+        return queryset.order_by(sort_field, '-id')
 
     def get_serializer_context(self):
         return {'request': self.request}
+
+    @swagger_auto_schema(
+        operation_description="Community feed. Add ?cursor= for cursor pagination",
+        manual_parameters=[
+            openapi.Parameter('sort_by', openapi.IN_QUERY, description="Feed order", type=openapi.TYPE_STRING,
+                              enum=['recent', 'popular', 'hot'], default='recent'),
+            openapi.Parameter('type', openapi.IN_QUERY, description="Post type", type=openapi.TYPE_STRING,
+                              enum=[value for value, _ in Post.POST_TYPE_CHOICES]),
+            openapi.Parameter('project', openapi.IN_QUERY, description="Project id", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('sector', openapi.IN_QUERY, description="Sector (case-insensitive)", type=openapi.TYPE_STRING),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous page's next link",
+                              type=openapi.TYPE_STRING),
+        ],
+        responses={200: PostSerializer(many=True)}
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        post = serializer.save()
+        hot.refresh(post)
     @swagger_auto_schema(
         operation_description="Toggle upvote on a post",
         responses={
@@ -40,32 +105,55 @@ class PostViewSet(viewsets.ModelViewSet):
         """ Toggle upvote on a post """
         post = self.get_object()
 
-        #Check if user already upvoted 
-        upvote = PostUpvote.objects.filter(user=request.user, post=post).first()
+        upvote = None
+        with transaction.atomic():
+            # Remove the upvote if there is one, otherwise add it
+            removed, _ = PostUpvote.objects.filter(user=request.user, post=post).delete()
+            if removed:
+                counters.upvoted(post.id, -1)
+            else:
+                try:
+                    with transaction.atomic():
+                        upvote = PostUpvote.objects.create(user=request.user, post=post)
+                except IntegrityError:
+                    # A concurrent double tap inserted it first, it already counted
+                    pass
+                else:
+                    counters.upvoted(post.id, 1)
+            if removed or upvote:
+                hot.refresh(post)
+        upvotes_count = Post.objects.filter(pk=post.pk).values_list('upvotes_count', flat=True).first()
 
-        if upvote:
-            # Remove upvote
-            upvote.delete()
+        if removed:
             return Response({
                 'message': 'Upvote removed successfully.',
                 'upvoted': False,
-                'upvotes_count': post.upvotes_count
+                'upvotes_count': upvotes_count
             })
-        else:
-            # Add upvote
-            upvote = PostUpvote.objects.create(user=request.user, post=post)
+        if upvote:
             # Create notification
             create_upvote_notification(upvote)
-            return Response({
-                'message': 'Upvoted successfully.',
-                'upvoted': True,
-                'upvotes_count': post.upvotes_count
-            })
+        return Response({
+            'message': 'Upvoted successfully.',
+            'upvoted': True,
+            'upvotes_count': upvotes_count
+        })
     
 
     @swagger_auto_schema(
         methods=['get'],
-        operation_description="Get all comments for a specific post",
+        operation_description=(
+            "Get all comments for a specific post, newest first, or with ?threaded=true as a thread "
+            "(each reply right after its parent). Add ?cursor= for cursor pagination"
+        ),
+        manual_parameters=[
+            openapi.Parameter('threaded', openapi.IN_QUERY, description="Thread display order",
+                              type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous page's next link",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Comments per page (max 100)",
+                              type=openapi.TYPE_INTEGER),
+        ],
         responses={
             200: openapi.Response('List of comments', CommentSerializer(many=True)),
             404: 'Post not found'
@@ -78,6 +166,7 @@ class PostViewSet(viewsets.ModelViewSet):
             type=openapi.TYPE_OBJECT,
             properties={
                 'content': openapi.Schema(type=openapi.TYPE_STRING, description='Comment content'),
+                'parent': openapi.Schema(type=openapi.TYPE_INTEGER, description='Comment being replied to'),
             },
             required=['content']
         ),
@@ -93,14 +182,25 @@ class PostViewSet(viewsets.ModelViewSet):
         post = self.get_object()
 
         if request.method == 'GET':
-            comments = post.comments.all().order_by('-created_at')
-            serializer = CommentSerializer(comments, many=True)
+            if request.query_params.get('threaded') in ('true', '1'):
+                comments = Comment.objects.thread(post).select_related('user')
+            else:
+                comments = post.comments.select_related('user').order_by('-created_at')
+            page = self.paginate_queryset(comments)
+            if page is not None:
+                serializer = CommentSerializer(page, many=True, context={'request': request})
+                return self.get_paginated_response(serializer.data)
+            serializer = CommentSerializer(comments, many=True, context={'request': request})
             return Response(serializer.data)
         
         elif request.method == 'POST':
-            serializer = CommentSerializer(data=request.data, context={'request': request})                            
+            serializer = CommentSerializer(data=request.data, context={'request': request, 'post': post})
             if serializer.is_valid():
-                comment = serializer.save(post=post)
+                with transaction.atomic():
+                    comment = serializer.save(post=post)
+                    counters.commented(post.id, 1)
+                    counters.replied(comment, 1)
+                    hot.refresh(post)
                 # Create notification
                 create_comment_notification(comment)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -111,6 +211,16 @@ class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all().order_by('-created_at')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self): #type: ignore
+        queryset = Comment.objects.select_related('user')
+        post = _id_param(self.request.query_params, 'post')
+        if post:
+            queryset = queryset.filter(post_id=post)
+            if self.request.query_params.get('threaded') in ('true', '1'):
+                return queryset.order_by('path')
+        return queryset.order_by('-created_at')
 
     def get_serializer_context(self):
         return {'request': self.request}
@@ -127,11 +237,50 @@ class CommentViewSet(viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
     
     @swagger_auto_schema(
-        operation_description="Get all comments",
+        operation_description="Get all comments, newest first. Add ?cursor= for cursor pagination",
+        manual_parameters=[
+            openapi.Parameter('post', openapi.IN_QUERY, description="Only comments on this post", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('threaded', openapi.IN_QUERY, description="With post: thread display order",
+                              type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous page's next link",
+                              type=openapi.TYPE_STRING),
+        ],
         responses={200: CommentSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
+    @swagger_auto_schema(
+        operation_description="Replies under a comment at any depth, in thread order. Add ?cursor= for cursor pagination",
+        responses={200: CommentSerializer(many=True)}
+    )
+    @action(detail=True, methods=['get'])
+    def replies(self, request, pk=None):
+        """ A comment's subtree, read as one index range on its path """
+        replies = Comment.objects.subtree(self.get_object()).select_related('user')
+        page = self.paginate_queryset(replies)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(replies, many=True).data)
+
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        parent = serializer.validated_data.get('parent')
+        post = serializer.validated_data.get('post') or (parent.post if parent else None)
+        if not post:
+            raise ValidationError({'post': ['This field is required.']})
+        with transaction.atomic():
+            comment = serializer.save(user=self.request.user, post=post)
+            counters.commented(comment.post_id, 1)
+            counters.replied(comment, 1)
+            hot.refresh(comment.post)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Locking the row waits for replies being posted under it, so they go with it
+            instance = get_object_or_404(Comment.objects.select_for_update(), pk=instance.pk)
+            # Replies go with the comment; count what was deleted, reply_count may lag behind
+            _, deleted = instance.delete()
+            removed = deleted.get(Comment._meta.label, 0)
+            counters.commented(instance.post_id, -removed)
+            counters.replied(instance, -removed)
+            hot.refresh(instance.post)
@@ -0,0 +1,162 @@
+import logging
+import re
+import time
+from string import Formatter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+
+from apps.projects.models import ProjectRegistration
+from apps.users.sms_service import format_phone_number
+from .models import OutboundMessage, SMSCampaign
+from . import jobs, outbound
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDERS = ('title', 'date', 'time', 'location', 'sector')
+
+PHONE_RE = re.compile(r'\+\d{9,15}')
+
+
+def template_errors(template):
+    """ Unknown or malformed placeholders in a campaign template, for validation """
+    try:
+        fields = {name for _, name, _, _ in Formatter().parse(template) if name is not None}
+    except ValueError as e:
+        return [str(e)]
+    return [f"Unknown placeholder {{{name}}}" for name in sorted(fields - set(PLACEHOLDERS))]
+
+
+def render(template, project):
+    """ The one message of a campaign; only project-level placeholders, so it is rendered once """
+    local = timezone.localtime(project.datetime)
+    return template.format(
+        title=project.title,
+        date=local.strftime('%d/%m/%Y'),
+        time=local.strftime('%H:%M'),
+        location=project.location or '',
+        sector=project.sector,
+    )
+
+
+def normalize(phone_number):
+    """ E.164 form used to dedupe recipients, None when it can't be a phone number """
+    phone_number = format_phone_number(phone_number or '')
+    return phone_number if PHONE_RE.fullmatch(phone_number) else None
+
+
+def run(campaign, chunk_size=None):
+    """
+    Queue the campaign's SMS, chunk by chunk, from where it stopped.
+
+    Registrations are streamed by id after ``last_registration_id``; every
+    chunk is queued and the cursor and counters advanced in the same
+    transaction, so an interrupted campaign resumes exactly where its last
+    committed chunk ended. The (campaign, recipient) unique constraint keeps
+    a number from being texted twice by volunteers sharing it or overlapping runs.
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_FANOUT_BATCH_SIZE
+    if not campaign.message:
+        campaign.message = render(campaign.template, campaign.project)
+    campaign.status = 'queuing'
+    campaign.save(update_fields=['message', 'status'])
+
+    started = time.perf_counter()
+    while True:
+        rows = list(
+            ProjectRegistration.objects.filter(
+                project_id=campaign.project_id, status='registered', id__gt=campaign.last_registration_id,
+            ).order_by('id').values_list('id', 'user_id', 'user__phone_number')[:chunk_size]
+        )
+        if not rows:
+            break
+
+        recipients, invalid = {}, 0
+        for _, user_id, phone_number in rows:
+            number = normalize(phone_number)
+            if number is None:
+                invalid += 1
+            else:
+                recipients.setdefault(number, user_id)
+
+        with transaction.atomic():
+            already = set(
+                OutboundMessage.objects.filter(campaign=campaign, recipient__in=recipients)
+                .values_list('recipient', flat=True)
+            )
+            new = [number for number in recipients if number not in already]
+            outbound.enqueue_many([
+                OutboundMessage(
+                    channel='sms', recipient=number, body=campaign.message, user_id=recipients[number],
+                    project_id=campaign.project_id, campaign=campaign, priority=OutboundMessage.PRIORITY_BULK,
+                )
+                for number in new
+            ], ignore_conflicts=True)
+            campaign.last_registration_id = rows[-1][0]
+            SMSCampaign.objects.filter(pk=campaign.pk).update(
+                last_registration_id=campaign.last_registration_id,
+                recipients_count=F('recipients_count') + len(new),
+                duplicates_count=F('duplicates_count') + len(rows) - invalid - len(new),
+                invalid_count=F('invalid_count') + invalid,
+                locked_until=jobs.lease(),
+            )
+
+    seconds = time.perf_counter() - started
+    SMSCampaign.objects.filter(pk=campaign.pk).update(
+        status='queued', locked_until=None, finished_at=timezone.now(), queue_seconds=F('queue_seconds') + seconds,
+    )
+    campaign.refresh_from_db()
+    logger.info(
+        "SMS campaign %s: %d recipients queued (%d duplicates, %d invalid) in %.2fs",
+        campaign.pk, campaign.recipients_count, campaign.duplicates_count, campaign.invalid_count, seconds,
+    )
+    return campaign
+
+
+def delivery_stats(campaign):
+    """ Delivery progress of a campaign's queued messages """
+    stats = campaign.messages.aggregate(
+        pending=Count('id', filter=Q(status__in=['pending', 'sending'])),
+        sent=Count('id', filter=Q(status='sent')),
+        failed=Count('id', filter=Q(status='failed')),
+        first_sent=Min('sent_at'),
+        last_sent=Max('sent_at'),
+    )
+    first_sent, last_sent = stats.pop('first_sent'), stats.pop('last_sent')
+    seconds = (last_sent - first_sent).total_seconds() if first_sent else 0
+    stats['sent_per_second'] = round(stats['sent'] / seconds, 1) if seconds else None
+    stats['queued_per_second'] = (
+        round(campaign.recipients_count / campaign.queue_seconds, 1) if campaign.queue_seconds else None
+    )
+    return stats
+
+
+def resume(campaign):
+    """
+    Take over a campaign whose queuing stopped. Returns None while a live
+    worker holds its lease, so two runs never add to the same counters.
+    Without NOTIFICATION_FANOUT_ASYNC the rest is queued inline, otherwise the
+    campaign is released for run_fanout_worker.
+    """
+    claimed = jobs.claim(
+        SMSCampaign.objects.filter(pk=campaign.pk).exclude(status='queued').select_related('project'), 'queuing'
+    )
+    if claimed is None:
+        return None
+    if not settings.NOTIFICATION_FANOUT_ASYNC:
+        return run(claimed)
+    SMSCampaign.objects.filter(pk=claimed.pk).update(locked_until=None)
+    claimed.locked_until = None
+    return claimed
+
+
+def dispatch(campaign):
+    """
+    Campaigns are queued by run_fanout_worker, which picks up the pending row
+    once the request commits; without NOTIFICATION_FANOUT_ASYNC they run inline.
+    """
+    if not settings.NOTIFICATION_FANOUT_ASYNC:
+        return run(campaign)
+    return campaign
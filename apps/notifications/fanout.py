@@ -0,0 +1,119 @@
+import logging
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.users.models import User
+from .models import FanoutJob, Notification
+from . import jobs, push, unread
+
+logger = logging.getLogger(__name__)
+
+
+def fan_out(user_ids, title, message, notification_type, project_id=None, chunk_size=None, batch_size=None):
+    """
+    Create one notification per user id without loading users into memory.
+
+    ``user_ids`` is a ``values_list('id', flat=True)`` queryset; ids are
+    streamed with ``iterator(chunk_size)`` and written in bounded
+    ``bulk_create`` batches, so memory stays flat however many users match.
+    Returns (rows, seconds).
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+    batch_size = batch_size or settings.NOTIFICATION_FANOUT_BATCH_SIZE
+    ids = user_ids.order_by().iterator(chunk_size=chunk_size)
+
+    rows = 0
+    started = time.perf_counter()
+    while batch := list(islice(ids, batch_size)):
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                project_id=project_id,
+            )
+            for user_id in batch
+        ], batch_size=batch_size)
+        # Callers such as reminders.process run this inside their transaction: counters and
+        # pushes follow its commit (push.notify defers itself) and are skipped on rollback
+        transaction.on_commit(lambda batch=batch: unread.invalidate(batch))
+        push.notify(notifications)
+        rows += len(batch)
+
+    seconds = time.perf_counter() - started
+    logger.info(
+        "Fan-out %s: %d notifications in %.2fs (%.0f rows/sec)",
+        notification_type, rows, seconds, rows / seconds if seconds else rows,
+    )
+    return rows, seconds
+
+
+def audience(job):
+    """ User ids a fan-out job writes to """
+    if job.audience == 'registered':
+        return User.objects.filter(
+            project_registrations__project_id=job.project_id,
+            project_registrations__status='registered',
+        ).values_list('id', flat=True)
+    raise ValueError(f"Unknown fan-out audience {job.audience!r}")
+
+
+def run(job, batch_size=None):
+    """
+    Write a FanoutJob's notifications, batch by batch, from where it stopped.
+
+    Users are walked by id after ``last_user_id``; every batch is inserted and
+    the cursor advanced (and the lease renewed) in one transaction, so a job
+    whose worker died is resumed by the next claim without duplicates. Unread
+    counts and pushes follow each committed batch.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_FANOUT_BATCH_SIZE
+    started = time.perf_counter()
+    while batch := list(audience(job).filter(id__gt=job.last_user_id).order_by('id')[:batch_size]):
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    title=job.title,
+                    message=job.message,
+                    notification_type=job.notification_type,
+                    project_id=job.project_id,
+                )
+                for user_id in batch
+            ])
+            job.last_user_id = batch[-1]
+            FanoutJob.objects.filter(pk=job.pk).update(
+                last_user_id=job.last_user_id, rows=F('rows') + len(batch), locked_until=jobs.lease(),
+            )
+            transaction.on_commit(lambda batch=batch, notifications=notifications: (
+                unread.invalidate(batch), push.notify(notifications)
+            ))
+
+    FanoutJob.objects.filter(pk=job.pk).update(status='done', locked_until=None, finished_at=timezone.now())
+    job.refresh_from_db()
+    seconds = time.perf_counter() - started
+    logger.info("Fan-out job %s (%s): %d notifications in %.2fs", job.pk, job.notification_type, job.rows, seconds)
+    return job
+
+
+def dispatch(project, title, message, notification_type, audience='registered'):
+    """
+    Fan a notification out off the request path.
+
+    The fan-out is stored as a FanoutJob in the caller's transaction, so it
+    exists exactly when the change it announces was committed, and it survives
+    restarts and deploys until run_fanout_worker writes it. Without
+    NOTIFICATION_FANOUT_ASYNC the job runs inline, which is what tests rely on.
+    """
+    job = FanoutJob.objects.create(
+        project=project, audience=audience, title=title, message=message, notification_type=notification_type,
+    )
+    if not settings.NOTIFICATION_FANOUT_ASYNC:
+        return run(job)
+    return job
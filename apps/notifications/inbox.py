@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models import BooleanField, Case, CharField, Exists, F, IntegerField, OuterRef, Q, Value, When
+from django.utils import timezone
+
+from apps.projects.models import LeaderFollowing
+from .models import Notification, BroadcastNotification, BroadcastReadMarker, BroadcastRead
+from . import push, unread
+
+PERSONAL = 'personal'
+BROADCAST = 'broadcast'
+# Column order shared by both sides of the UNION
+ITEM_FIELDS = [
+    'id', 'title', 'message', 'notification_type', 'project_id', 'project__title', 'project__image',
+    'created_at', 'kind', 'read', 'digest_count',
+]
+
+
+def broadcast(title, message, notification_type, project=None, audience='all', sector=None, leader=None, excluded_user=None):
+    """ Record one broadcast for a whole audience, readers see it through the inbox """
+    notification = BroadcastNotification.objects.create(
+        audience=audience, sector=sector, leader=leader, excluded_user=excluded_user,
+        title=title, message=message, notification_type=notification_type, project=project,
+    )
+    # Every cached unread count of the audience is now stale
+    transaction.on_commit(unread.invalidate_all)
+    push.notify_broadcast(notification)
+    return notification
+
+
+def visible_broadcasts(user):
+    """ Broadcasts addressed to the user, created since they signed up """
+    audience = Q(audience='all') | Q(
+        audience='followers', leader__in=LeaderFollowing.objects.filter(follower=user).values('leader')
+    )
+    if user.sector:
+        audience |= Q(audience='sector', sector__iexact=user.sector)
+    return BroadcastNotification.objects.filter(
+        audience, created_at__gte=user.created_at
+    ).exclude(excluded_user=user)
+
+
+def _read_up_to(user):
+    return BroadcastReadMarker.objects.filter(user=user).values_list('read_up_to', flat=True).first()
+
+
+def _broadcast_read_flag(user, watermark):
+    read = Exists(BroadcastRead.objects.filter(user=user, broadcast=OuterRef('pk')))
+    if watermark is not None:
+        read = Q(created_at__lte=watermark) | Q(read)
+    return Case(When(read, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
+def _after(kind, position):
+    """ Keyset filter for one side of the UNION, ordered by (created_at, kind, id) descending """
+    if position is None:
+        return Q()
+    created_at, cursor_kind, pk = position
+    if kind < cursor_kind:
+        return Q(created_at__lte=created_at)
+    if kind == cursor_kind:
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+    return Q(created_at__lt=created_at)
+
+
+def items(user, unread_only=False, position=None):
+    """
+    Personal notifications and visible broadcasts merged into one queryset of
+    dicts (ITEM_FIELDS), newest first. ``position`` is a keyset cursor
+    (created_at, kind, id); rows after it are returned.
+    """
+    personal = Notification.objects.filter(user=user).filter(_after(PERSONAL, position))
+    if unread_only:
+        personal = personal.filter(is_read=False)
+    personal = personal.annotate(
+        kind=Value(PERSONAL, output_field=CharField()), read=F('is_read'), digest_count=F('actor_count')
+    ).values(*ITEM_FIELDS)
+
+    broadcasts = visible_broadcasts(user).filter(_after(BROADCAST, position)).annotate(
+        kind=Value(BROADCAST, output_field=CharField()), read=_broadcast_read_flag(user, _read_up_to(user)),
+        digest_count=Value(1, output_field=IntegerField()),
+    )
+    if unread_only:
+        broadcasts = broadcasts.filter(read=False)
+    broadcasts = broadcasts.order_by().values(*ITEM_FIELDS)
+
+    return personal.order_by().union(broadcasts, all=True).order_by('-created_at', '-kind', '-id')
+
+
+def mark_broadcasts_read(user, broadcast_ids):
+    """ Add broadcasts to the user's read-set, returns how many were newly read """
+    visible = visible_broadcasts(user).filter(id__in=broadcast_ids).exclude(reads__user=user)
+    watermark = _read_up_to(user)
+    if watermark is not None:
+        visible = visible.filter(created_at__gt=watermark)
+    created = BroadcastRead.objects.bulk_create(
+        [BroadcastRead(user=user, broadcast_id=pk) for pk in visible.values_list('id', flat=True)],
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def mark_all_broadcasts_read(user):
+    """
+    Move the watermark to now; the read-set below it is no longer needed.
+    Returns how many broadcasts were unread.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        unread = visible_broadcasts(user).filter(created_at__lte=now).annotate(
+            read=_broadcast_read_flag(user, _read_up_to(user))
+        ).filter(read=False).count()
+        BroadcastReadMarker.objects.update_or_create(user=user, defaults={'read_up_to': now})
+        BroadcastRead.objects.filter(user=user, broadcast__created_at__lte=now).delete()
+    return unread
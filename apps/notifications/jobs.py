@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+def lease():
+    """ Deadline of a fresh lease; workers renew it with every chunk they commit """
+    return timezone.now() + timedelta(seconds=settings.FANOUT_LEASE_SECONDS)
+
+
+def claim(queryset, running_status):
+    """
+    Lease the oldest unfinished job of ``queryset`` that no live worker holds:
+    never started, or whose worker died (its lease expired). ``skip_locked``
+    lets several workers claim concurrently. Returns the job or None.
+    """
+    with transaction.atomic():
+        job = (
+            queryset.select_for_update(skip_locked=True)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=timezone.now()))
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status, job.locked_until = running_status, lease()
+        job.save(update_fields=['status', 'locked_until'])
+    return job
+
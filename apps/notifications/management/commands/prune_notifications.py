@@ -0,0 +1,55 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.notifications import retention, unread
+from apps.notifications.models import Notification, BroadcastNotification
+
+
+class Command(BaseCommand):
+    help = "Delete notifications and broadcasts older than their type's retention period (NOTIFICATION_RETENTION_DAYS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per transaction")
+        parser.add_argument('--sleep', type=float, default=0, help="Seconds to pause between batches")
+        parser.add_argument('--archive-dir', help="Write pruned rows to a gzip JSONL file in this directory first")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        started = time.perf_counter()
+        pause = (lambda: time.sleep(options['sleep'])) if options['sleep'] else None
+
+        archive = None
+        if options['archive_dir'] and not options['dry_run']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+            path = os.path.join(options['archive_dir'], f"notifications-{now:%Y%m%dT%H%M%S}.jsonl.gz")
+            archive = retention.Archive(path)
+
+        report = []
+        try:
+            for kind, model in (('personal', Notification), ('broadcast', BroadcastNotification)):
+                for notification_type, queryset in retention.expired(model, now).items():
+                    if options['dry_run']:
+                        count = queryset.count()
+                    else:
+                        count = retention.prune(queryset, kind, options['batch_size'], archive, pause)
+                    if count:
+                        report.append((kind, notification_type, count))
+        finally:
+            if archive:
+                archive.close()
+
+        if any(kind == 'broadcast' for kind, _, _ in report) and not options['dry_run']:
+            unread.invalidate_all()
+
+        for kind, notification_type, count in report:
+            days = retention.ttl_days(notification_type)
+            self.stdout.write(f"{kind:<10} {notification_type:<22} {count:>8} rows (older than {days} days)")
+        total = sum(count for _, _, count in report)
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} rows in {time.perf_counter() - started:.1f}s"))
+        if archive:
+            self.stdout.write(f"Archived to {archive.path}")
@@ -0,0 +1,59 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.notifications import campaigns, fanout, jobs
+from apps.notifications.models import FanoutJob, SMSCampaign
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run notification fan-outs (FanoutJob) and queue SMS campaigns. Jobs are leased, so several "
+        "workers can run side by side and a job whose worker died is resumed from its cursor"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2, help="Seconds to wait when there is no job")
+        parser.add_argument('--once', action='store_true', help="Run what is waiting now and exit (e.g. from cron)")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while not self.stopping:
+            close_old_connections()
+            if self.process_next():
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS("Fan-out worker stopped"))
+
+    def process_next(self):
+        """ Claim and run one job, False when nothing is waiting """
+        job = jobs.claim(FanoutJob.objects.exclude(status='done').select_related('project'), 'running')
+        run = fanout.run
+        if job is None:
+            job = jobs.claim(SMSCampaign.objects.exclude(status='queued').select_related('project'), 'queuing')
+            run = campaigns.run
+        if job is None:
+            return False
+        try:
+            job = run(job)
+        except Exception:
+            # The lease runs out and the next claim resumes from the job's cursor
+            logger.exception("%s %s failed", type(job).__name__, job.pk)
+            return True
+        self.stdout.write(f"{job} finished")
+        return True
+
+    def stop(self, signum, frame):
+        # Finish the current job; an interrupted one would be resumed anyway once its lease expires
+        self.stopping = True
@@ -0,0 +1,51 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.notifications import outbound
+from apps.notifications.providers import close_providers
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued SMS/email (OutboundMessage) with retries and per-provider rate limits. "
+        "Run as many worker processes as needed, they never claim the same message"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOUND_BATCH_SIZE, help="Messages claimed at a time")
+        parser.add_argument('--poll-interval', type=float, default=2, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Drain what is due now and exit (e.g. from cron)")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        total_sent = total_claimed = 0
+        while not self.stopping:
+            close_old_connections()
+            requeued = outbound.requeue_stale()
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} messages from a dead worker")
+
+            claimed, sent = outbound.process_batch(options['batch_size'])
+            total_claimed += claimed
+            total_sent += sent
+            if claimed:
+                self.stdout.write(f"Sent {sent}/{claimed}")
+                continue
+            if options['once']:
+                break
+            close_providers()
+            time.sleep(options['poll_interval'])
+
+        close_providers()
+        self.stdout.write(self.style.SUCCESS(f"Worker stopped: sent {total_sent} of {total_claimed} claimed"))
+
+    def stop(self, signum, frame):
+        # Finish the current batch so no claimed message is left leased
+        self.stopping = True
@@ -0,0 +1,45 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.notifications import reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Schedule reminders for projects entering a reminder window (PROJECT_REMINDER_WINDOWS) "
+        "and send them to registered volunteers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=60, help="Seconds between scheduling passes")
+        parser.add_argument('--batch-size', type=int, default=20, help="Reminders sent per transaction")
+        parser.add_argument('--once', action='store_true', help="Run one pass and exit (e.g. from cron)")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while not self.stopping:
+            close_old_connections()
+            scheduled = reminders.schedule()
+            if scheduled:
+                self.stdout.write(f"Scheduled {scheduled} reminders")
+            while not self.stopping:
+                # A reminder that fails is pushed back to its retry time, so every pass claims
+                # different rows and this ends once nothing is due
+                claimed, sent = reminders.process(options['batch_size'])
+                if not claimed:
+                    break
+                self.stdout.write(f"Sent {sent}/{claimed} reminders")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Reminder scheduler stopped"))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.notifications import campaigns, jobs
+from apps.notifications.models import SMSCampaign
+
+
+class Command(BaseCommand):
+    help = "Queue (or resume queuing) SMS campaigns and report their delivery progress"
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_ids', nargs='*', type=int, help="Campaigns to run")
+        parser.add_argument('--unfinished', action='store_true', help="Resume every campaign that isn't fully queued")
+        parser.add_argument('--chunk-size', type=int, help="Registrations queued per transaction")
+
+    def handle(self, *args, **options):
+        queryset = SMSCampaign.objects.select_related('project')
+        if options['unfinished']:
+            queryset = queryset.exclude(status='queued')
+        elif options['campaign_ids']:
+            queryset = queryset.filter(pk__in=options['campaign_ids'])
+        else:
+            raise CommandError("Give campaign ids or --unfinished")
+
+        for campaign in queryset.order_by('id'):
+            if campaign.status != 'queued':
+                # Claim it like a worker would, a campaign another worker is queuing is left alone
+                claimed = jobs.claim(SMSCampaign.objects.filter(pk=campaign.pk).select_related('project'), 'queuing')
+                if claimed is None:
+                    self.stdout.write(f"Campaign {campaign.pk} is being queued by another worker, skipped")
+                    continue
+                campaign = campaigns.run(claimed, options['chunk_size'])
+            stats = campaigns.delivery_stats(campaign)
+            self.stdout.write(
+                f"Campaign {campaign.pk} ({campaign.project.title}): {campaign.recipients_count} queued, "
+                f"{campaign.duplicates_count} duplicates, {campaign.invalid_count} invalid, "
+                f"{stats['queued_per_second'] or '-'} queued/sec | "
+                f"{stats['sent']} sent, {stats['failed']} failed, {stats['pending']} pending, "
+                f"{stats['sent_per_second'] or '-'} sent/sec"
+            )
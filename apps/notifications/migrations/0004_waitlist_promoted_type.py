@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('project_update', 'Project Update'), ('new_comment', 'New Comment'), ('project_reminder', 'Project Reminder'), ('upvote_received', 'Upvote Received'), ('project_created', 'New Project Created'), ('project_registration', 'New Registration'), ('leader_new_project', 'Leader New Project'), ('waitlist_promoted', 'Waitlist Promoted')], max_length=50),
+        ),
+    ]
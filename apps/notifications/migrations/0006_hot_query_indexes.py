@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_broadcastnotification'),
+        ('projects', '0009_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['audience', '-created_at'], name='broadcast_audience_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notification_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='notification_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_hot_query_indexes'),
+        ('projects', '0009_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='group_key',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('group_key__isnull', False), ('is_read', False)), fields=['user', 'group_key', '-created_at'], name='notification_digest_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_outbound_queue'),
+        ('projects', '0009_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template', models.TextField()),
+                ('message', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('queuing', 'Queuing'), ('queued', 'Queued')], default='pending', max_length=20)),
+                ('last_registration_id', models.PositiveBigIntegerField(default=0)),
+                ('recipients_count', models.PositiveIntegerField(default=0)),
+                ('duplicates_count', models.PositiveIntegerField(default=0)),
+                ('invalid_count', models.PositiveIntegerField(default=0)),
+                ('queue_seconds', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sms_campaigns', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sms_campaigns', to='projects.project')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='outboundmessage',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='notifications.smscampaign'),
+        ),
+        migrations.AddConstraint(
+            model_name='outboundmessage',
+            constraint=models.UniqueConstraint(condition=models.Q(('campaign__isnull', False)), fields=('campaign', 'recipient'), name='outbound_campaign_recipient_uniq'),
+        ),
+    ]
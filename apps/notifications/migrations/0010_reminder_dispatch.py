@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_sms_campaigns'),
+        ('projects', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderDispatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.PositiveIntegerField(help_text='Hours before the project starts')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent')], default='pending', max_length=20)),
+                ('recipients_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminder_dispatches', to='projects.project')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='reminder_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'window'), name='reminder_project_window_uniq')],
+            },
+        ),
+    ]
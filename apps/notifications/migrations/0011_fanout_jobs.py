@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0010_reminder_dispatch'),
+        ('projects', '0010_project_search_gin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanoutJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(choices=[('registered', 'Registered volunteers')], default='registered', max_length=20)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('notification_type', models.CharField(choices=[('project_update', 'Project Update'), ('new_comment', 'New Comment'), ('project_reminder', 'Project Reminder'), ('upvote_received', 'Upvote Received'), ('project_created', 'New Project Created'), ('project_registration', 'New Registration'), ('leader_new_project', 'Leader New Project'), ('waitlist_promoted', 'Waitlist Promoted')], max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done')], default='pending', max_length=20)),
+                ('last_user_id', models.PositiveBigIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='smscampaign',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='smscampaign',
+            index=models.Index(condition=models.Q(('status', 'queued'), _negated=True), fields=['locked_until'], name='campaign_open_idx'),
+        ),
+        migrations.AddField(
+            model_name='fanoutjob',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fanout_jobs', to='projects.project'),
+        ),
+        migrations.AddIndex(
+            model_name='fanoutjob',
+            index=models.Index(condition=models.Q(('status', 'done'), _negated=True), fields=['locked_until'], name='fanout_open_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0012_drop_notification_user_fk_index'),
+        ('projects', '0010_project_search_gin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboundmessage',
+            name='outbound_due_idx',
+        ),
+        migrations.AddField(
+            model_name='outboundmessage',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Transactional'), (10, 'Bulk')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='outboundmessage',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['priority', 'next_attempt_at'], name='outbound_due_idx'),
+        ),
+    ]
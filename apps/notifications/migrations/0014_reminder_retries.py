@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0013_outbound_priority'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reminderdispatch',
+            name='reminder_pending_idx',
+        ),
+        migrations.AddField(
+            model_name='reminderdispatch',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reminderdispatch',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='reminderdispatch',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='reminderdispatch',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='reminderdispatch',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at', 'id'], name='reminder_due_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 from apps.users.models import User
 from apps.projects.models import Project
 from django.utils.html import escape
@@ -11,33 +14,132 @@ class Notification(models.Model):
         ("upvote_received", "Upvote Received"),
         ("project_created", "New Project Created"),
         ("project_registration", "New Registration"),
-        ("leader_new_project", "Leader New Project")
+        ("leader_new_project", "Leader New Project"),
+        ("waitlist_promoted", "Waitlist Promoted")
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    # No FK index of its own: notification_user_recent_idx starts with user and serves every user lookup
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications", db_index=False)
     title = models.CharField(max_length=255)
     message = models.TextField()
     notification_type = models.CharField(max_length=50, choices=NOTIFICATION_TYPES)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name="notifications")
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Digest: bursts of the same event (e.g. upvotes on one post) share one row per group_key
+    group_key = models.CharField(max_length=100, null=True, blank=True)
+    actor_count = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="notification_user_recent_idx"),
+            models.Index(
+                fields=["user", "group_key", "-created_at"],
+                condition=models.Q(group_key__isnull=False, is_read=False),
+                name="notification_digest_idx",
+            ),
+            # Unread badge and unread list only ever look at unread rows
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(is_read=False),
+                name="notification_unread_idx",
+            ),
+        ]
     
     def __str__(self):
         return f"{escape(self.title)} - {escape(self.user.phone_number)}"
     
     @classmethod
-    def create_notification(cls, user, title, message, notification_type, project=None):
+    def create_notification(cls, user, title, message, notification_type, project=None, group_key=None):
         """ Helper method to create notifications """
-        return cls.objects.create(
+        from . import push, unread
+        notification = cls.objects.create(
             user=user,
             title=title,
             message=message,
             notification_type=notification_type,
-            project=project
+            project=project,
+            group_key=group_key
         )
+        unread.incr(notification.user_id)
+        push.notify([notification])
+        return notification
+
+    @classmethod
+    def coalesce_notification(cls, user, group_key, title, message, notification_type, project=None, digest_message=None):
+        """
+        Merge into the user's unread notification with the same group_key from
+        the last NOTIFICATION_DIGEST_WINDOW seconds, or create a new one.
+
+        ``digest_message(count)`` returns the message of a merged row for its
+        new actor count. It is a callable rather than a template so names in
+        the text are never run through str.format. A merge moves the row to the
+        top of the list but is already unread, so it neither changes the unread
+        count nor pushes again.
+        """
+        since = timezone.now() - timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+        with transaction.atomic():
+            existing = cls.objects.select_for_update().filter(
+                user=user, group_key=group_key, is_read=False, created_at__gte=since
+            ).order_by("-created_at").first()
+            if existing is None:
+                return cls.create_notification(user, title, message, notification_type, project, group_key)
+
+            existing.actor_count += 1
+            existing.message = digest_message(existing.actor_count) if digest_message else message
+            existing.created_at = timezone.now()
+            cls.objects.filter(pk=existing.pk).update(
+                actor_count=existing.actor_count, message=existing.message, created_at=existing.created_at
+            )
+            return existing
+
+class BroadcastNotification(models.Model):
+    """
+    One row per event shown to a whole audience, instead of one Notification per user.
+    Read state lives in BroadcastReadMarker (watermark) and BroadcastRead (reads above it).
+    """
+    AUDIENCE_CHOICES = [
+        ("all", "All Users"),
+        ("sector", "Sector"),
+        ("followers", "Leader Followers"),
+    ]
+
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default="all")
+    sector = models.CharField(max_length=100, blank=True, null=True)
+    leader = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="leader_broadcasts")
+    # Usually the user who triggered the event, they don't need to hear about it
+    excluded_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPES)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name="broadcasts")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["audience", "-created_at"], name="broadcast_audience_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{escape(self.title)} - {self.audience}"
+
+
+class BroadcastReadMarker(models.Model):
+    """ Every broadcast created up to read_up_to counts as read for the user """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="broadcast_read_marker")
+    read_up_to = models.DateTimeField()
+
+
+class BroadcastRead(models.Model):
+    """ Broadcasts read individually after the user's watermark """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="broadcast_reads")
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name="reads")
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("user", "broadcast")
 
 class NotificationLog(models.Model):
     """ This model is for SMS/Email Logging """
@@ -59,3 +161,166 @@ class NotificationLog(models.Model):
 
     def __str__(self):
         return f"{self.channel} to {escape(self.user.phone_number)} ({self.status})"
+
+
+class OutboundMessage(models.Model):
+    """ DB-backed queue of SMS/email sends, drained by the run_outbound_worker command """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+    # Claimed lowest first: an OTP must not wait behind a large campaign
+    PRIORITY_TRANSACTIONAL = 0
+    PRIORITY_BULK = 10
+    PRIORITY_CHOICES = [
+        (PRIORITY_TRANSACTIONAL, "Transactional"),
+        (PRIORITY_BULK, "Bulk"),
+    ]
+
+    channel = models.CharField(max_length=20, choices=NotificationLog.CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="outbound_messages")
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name="outbound_messages")
+    campaign = models.ForeignKey("SMSCampaign", on_delete=models.CASCADE, null=True, blank=True, related_name="messages")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_TRANSACTIONAL)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Lease of the worker currently sending it; an expired lease means the worker died
+    locked_until = models.DateTimeField(null=True, blank=True)
+    provider = models.CharField(max_length=50, blank=True)
+    provider_message_id = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["priority", "next_attempt_at"],
+                condition=models.Q(status="pending"),
+                name="outbound_due_idx",
+            ),
+            models.Index(
+                fields=["locked_until"],
+                condition=models.Q(status="sending"),
+                name="outbound_leased_idx",
+            ),
+        ]
+        constraints = [
+            # A campaign texts each normalized number once, even when it is resumed
+            models.UniqueConstraint(
+                fields=["campaign", "recipient"],
+                condition=models.Q(campaign__isnull=False),
+                name="outbound_campaign_recipient_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {escape(self.recipient)} ({self.status})"
+
+
+class SMSCampaign(models.Model):
+    """ SMS to every registered volunteer of a project, queued in resumable chunks (see campaigns.py) """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("queuing", "Queuing"),
+        ("queued", "Queued"),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="sms_campaigns")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="sms_campaigns")
+    template = models.TextField()
+    # The template rendered once for the whole campaign
+    message = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    # Resume point: registrations up to this id are already queued
+    last_registration_id = models.PositiveBigIntegerField(default=0)
+    recipients_count = models.PositiveIntegerField(default=0)
+    duplicates_count = models.PositiveIntegerField(default=0)
+    invalid_count = models.PositiveIntegerField(default=0)
+    queue_seconds = models.FloatField(default=0)
+    # Lease of the worker queuing it (see jobs.py); an expired lease means the worker died
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["locked_until"], condition=~models.Q(status="queued"), name="campaign_open_idx"),
+        ]
+
+    def __str__(self):
+        return f"SMS campaign for {self.project.title} ({self.status})"
+
+
+class FanoutJob(models.Model):
+    """ A notification to every user of a project audience, written in resumable chunks by run_fanout_worker """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+    ]
+    AUDIENCE_CHOICES = [
+        ("registered", "Registered volunteers"),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="fanout_jobs")
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default="registered")
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    # Resume point: users up to this id already have their notification
+    last_user_id = models.PositiveBigIntegerField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["locked_until"], condition=~models.Q(status="done"), name="fanout_open_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} fan-out for {self.project.title} ({self.status})"
+
+
+class ReminderDispatch(models.Model):
+    """ One reminder per project and window (hours before it starts), scheduled by reminders.schedule """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="reminder_dispatches")
+    window = models.PositiveIntegerField(help_text="Hours before the project starts")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    recipients_count = models.PositiveIntegerField(default=0)
+    # Failed sends are retried with backoff, then given up after PROJECT_REMINDER_MAX_ATTEMPTS
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["project", "window"], name="reminder_project_window_uniq"),
+        ]
+        indexes = [
+            # Due reminders only, so sent and failed ones never weigh on the scheduler's claim
+            models.Index(
+                fields=["next_attempt_at", "id"], condition=models.Q(status="pending"), name="reminder_due_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.window}h reminder for {self.project.title} ({self.status})"
+
@@ -0,0 +1,193 @@
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundMessage, NotificationLog
+from .providers import ProviderError, get_provider
+
+logger = logging.getLogger(__name__)
+
+PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+
+UPDATE_FIELDS = [
+    'status', 'attempts', 'next_attempt_at', 'locked_until',
+    'provider', 'provider_message_id', 'last_error', 'sent_at',
+]
+
+
+# -----------------------------
+# Producers
+# -----------------------------
+def enqueue(channel, recipient, body, subject='', user=None, project=None):
+    """ Queue one SMS/email; the request only pays for an INSERT """
+    return OutboundMessage.objects.create(
+        channel=channel, recipient=recipient, body=body, subject=subject, user=user, project=project,
+    )
+
+
+def enqueue_many(messages, batch_size=None, ignore_conflicts=False):
+    """ Queue unsaved OutboundMessage instances in bounded bulk inserts """
+    return OutboundMessage.objects.bulk_create(
+        messages, batch_size=batch_size or settings.NOTIFICATION_FANOUT_BATCH_SIZE, ignore_conflicts=ignore_conflicts,
+    )
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+class RateLimiter:
+    """
+    At most ``per_second`` sends per provider, counted in one-second windows
+    in the cache so every worker process shares the same budget (with Redis).
+    """
+
+    def __init__(self, name, per_second):
+        self.name = name
+        self.per_second = per_second
+
+    def wait(self, count=1):
+        """ Block until ``count`` sends fit in the current window (count <= per_second) """
+        if not self.per_second:
+            return
+        while True:
+            now = time.time()
+            key = f'outbound:rate:{self.name}:{int(now)}'
+            cache.add(key, 0, 5)
+            try:
+                used = cache.incr(key, count)
+            except ValueError:
+                # Window key evicted between add and incr
+                used = count
+            if used <= self.per_second:
+                return
+            time.sleep(int(now) + 1 - now)
+
+
+_limiters = {}
+
+
+def _limiter(provider):
+    if provider.name not in _limiters:
+        _limiters[provider.name] = RateLimiter(provider.name, settings.OUTBOUND_RATE_LIMITS.get(provider.name, 0))
+    return _limiters[provider.name]
+
+
+def backoff(attempts):
+    """ Exponential delay before retry number ``attempts``, with jitter so retries don't align """
+    delay = min(settings.OUTBOUND_RETRY_BASE * 2 ** (attempts - 1), settings.OUTBOUND_RETRY_MAX)
+    return timedelta(seconds=delay + random.uniform(0, delay / 2))
+
+
+def requeue_stale():
+    """ Put back messages whose worker died mid-send (their lease expired) """
+    return OutboundMessage.objects.filter(status=SENDING, locked_until__lt=timezone.now()).update(
+        status=PENDING, locked_until=None
+    )
+
+
+def claim(batch_size):
+    """
+    Lease up to batch_size due messages to this worker, transactional ones
+    (OTP) before bulk campaign messages. ``skip_locked`` lets several workers
+    claim concurrently without blocking on each other's rows.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.OUTBOUND_LEASE_SECONDS)
+    with transaction.atomic():
+        ids = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=PENDING, next_attempt_at__lte=now)
+            .order_by('priority', 'next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboundMessage.objects.filter(id__in=ids, status=PENDING).update(status=SENDING, locked_until=lease)
+    # Databases without row locks (SQLite) can race on the update, keep only what we leased
+    return list(
+        OutboundMessage.objects.filter(id__in=ids, status=SENDING, locked_until=lease).order_by('priority', 'next_attempt_at')
+    )
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _record(message, provider, result):
+    """ Apply one send result to a claimed message """
+    message.provider = provider.name
+    message.attempts += 1
+    message.locked_until = None
+    if isinstance(result, ProviderError):
+        message.last_error = str(result)
+        if result.permanent or message.attempts >= settings.OUTBOUND_MAX_ATTEMPTS:
+            message.status = FAILED
+            logger.warning("Outbound %s %s failed for good: %s", message.channel, message.id, result)
+        else:
+            message.status = PENDING
+            message.next_attempt_at = timezone.now() + backoff(message.attempts)
+    else:
+        message.status = SENT
+        message.provider_message_id = result or ''
+        message.sent_at = timezone.now()
+        message.last_error = ''
+
+
+def deliver(messages):
+    """
+    Send claimed messages through their channel's provider in batches (no
+    larger than the provider's per-second budget), then record the outcome
+    of the whole claim at once: one bulk_update for the queue rows and one
+    bulk_create for the NotificationLog rows of finished messages.
+    Returns the number of messages sent.
+    """
+    started = time.perf_counter()
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message.channel, []).append(message)
+
+    for channel, group in by_channel.items():
+        provider = get_provider(channel)
+        limiter = _limiter(provider)
+        for chunk in _chunks(group, limiter.per_second or len(group)):
+            limiter.wait(len(chunk))
+            try:
+                results = provider.send_many(chunk)
+            except Exception as e:
+                # A provider that raises instead of returning errors must not leave the claim leased
+                logger.exception("Outbound %s provider %s failed on a batch of %d", channel, provider.name, len(chunk))
+                results = [ProviderError(str(e)) for _ in chunk]
+            for message, result in zip(chunk, results):
+                _record(message, provider, result)
+
+    logs = [
+        NotificationLog(
+            user_id=message.user_id, project_id=message.project_id, channel=message.channel,
+            message=message.body, status=message.status,
+        )
+        for message in messages if message.status != PENDING and message.user_id
+    ]
+    with transaction.atomic():
+        OutboundMessage.objects.bulk_update(messages, UPDATE_FIELDS)
+        NotificationLog.objects.bulk_create(logs)
+
+    sent = sum(message.status == SENT for message in messages)
+    seconds = time.perf_counter() - started
+    logger.info(
+        "Outbound: %d/%d sent in %.2fs (%.0f msgs/sec)",
+        sent, len(messages), seconds, len(messages) / seconds if seconds else len(messages),
+    )
+    return sent
+
+
+def process_batch(batch_size=None):
+    """ Claim and deliver one batch, returns (claimed, sent) """
+    messages = claim(batch_size or settings.OUTBOUND_BATCH_SIZE)
+    if not messages:
+        return 0, 0
+    return len(messages), deliver(messages)
@@ -0,0 +1,53 @@
+import base64
+import json
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+
+from umugandatech.pagination import KeysetPagination
+from . import inbox
+
+
+class InboxPagination(KeysetPagination):
+    """
+    Keyset pagination over the merged inbox (personal notifications UNION
+    broadcasts), keyed on (created_at, kind, id). The cursor is applied to
+    each side of the UNION since the combined query cannot be filtered.
+    """
+
+    def paginate_inbox(self, request, user, unread_only=False):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        self.total = self.get_total(inbox.items(user, unread_only), request)
+
+        results = list(inbox.items(user, unread_only, position)[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_total(self, queryset, request):
+        # The planner estimate needs a plain queryset, a UNION is always counted exactly
+        if request.query_params.get(self.count_query_param) in ('exact', 'approx'):
+            return queryset.count()
+        return None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, kind, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            created_at = parse_datetime(created_at)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None or kind not in (inbox.PERSONAL, inbox.BROADCAST) or type(pk) is not int:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, kind, pk
+
+    def encode_cursor(self, item):
+        payload = json.dumps([item['created_at'].isoformat(), item['kind'], item['id']], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
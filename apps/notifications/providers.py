@@ -0,0 +1,141 @@
+import itertools
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+
+
+class ProviderError(Exception):
+    """ A send failed; ``permanent`` errors are not retried """
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class Provider:
+    """
+    Delivers OutboundMessage rows for one channel. Instances are created once
+    per process (see get_provider), so anything expensive to set up, like an
+    HTTP session or an SMTP connection, is reused across sends.
+    """
+    name = None
+
+    def send(self, message):
+        """ Deliver one message, return the provider's message id or raise ProviderError """
+        raise NotImplementedError
+
+    def send_many(self, messages):
+        """
+        Deliver a batch, returning one result per message: the provider's
+        message id or the ProviderError it failed with. Providers with a bulk
+        API override this; the default sends one by one over the shared client.
+        """
+        results = []
+        for message in messages:
+            try:
+                results.append(self.send(message))
+            except ProviderError as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        """ Called by the worker when it goes idle """
+
+
+class TwilioProvider(Provider):
+    name = 'twilio'
+
+    # Twilio error codes that will fail the same way on every retry (invalid/unreachable number, opted out)
+    PERMANENT_ERRORS = {21211, 21408, 21610, 21614}
+
+    def __init__(self):
+        from apps.users.sms_service import twilio_client
+        self.client = twilio_client()
+        self.from_number = settings.TWILIO_PHONE_NUMBER
+
+    def send(self, message):
+        from twilio.base.exceptions import TwilioRestException
+        try:
+            sent = self.client.messages.create(body=message.body, from_=self.from_number, to=message.recipient)
+        except TwilioRestException as e:
+            raise ProviderError(str(e), permanent=e.code in self.PERMANENT_ERRORS)
+        except Exception as e:
+            raise ProviderError(str(e))
+        return sent.sid
+
+
+class EmailProvider(Provider):
+    name = 'email'
+
+    def __init__(self):
+        self.connection = None
+
+    def send(self, message):
+        return self.send_many([message])[0]
+
+    def send_many(self, messages):
+        # One SMTP session for the whole batch
+        if self.connection is None:
+            try:
+                connection = get_connection()
+                connection.open()
+            except Exception as e:
+                # Server down or credentials refused: every message of the batch is retried later
+                return [ProviderError(str(e)) for _ in messages]
+            self.connection = connection
+        results = []
+        for message in messages:
+            email = EmailMessage(message.subject, message.body, settings.DEFAULT_FROM_EMAIL,
+                                 [message.recipient], connection=self.connection)
+            try:
+                email.send()
+            except Exception as e:
+                self.close()
+                results.append(ProviderError(str(e)))
+                continue
+            results.append('')
+        return results
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class FakeProvider(Provider):
+    """
+    Offline provider for development and tests: keeps sent messages in
+    ``outbox`` and fails the next ``fail_next`` sends.
+    """
+    name = 'fake'
+    outbox = []
+    batches = []
+    fail_next = 0
+    _ids = itertools.count(1)
+
+    def send_many(self, messages):
+        FakeProvider.batches.append(len(messages))
+        return super().send_many(messages)
+
+    def send(self, message):
+        if FakeProvider.fail_next:
+            FakeProvider.fail_next -= 1
+            raise ProviderError("Simulated provider failure")
+        FakeProvider.outbox.append(message)
+        return f'fake-{next(self._ids)}'
+
+
+_providers = {}
+
+
+def get_provider(channel):
+    """ The provider configured for a channel in OUTBOUND_PROVIDERS, one instance per process """
+    if channel not in _providers:
+        _providers[channel] = import_string(settings.OUTBOUND_PROVIDERS[channel])()
+    return _providers[channel]
+
+
+def close_providers():
+    for provider in _providers.values():
+        provider.close()
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_CHANNEL = 'broadcast'
+
+
+class Broker:
+    """
+    Pub/sub transport between the code that creates notifications and the
+    open push streams. Events are plain JSON-serializable dicts; personal
+    events go to one user, broadcast events to every stream, which filters
+    them by audience.
+    """
+
+    def publish(self, events):
+        """ Deliver (user_id, event) pairs """
+        raise NotImplementedError
+
+    def publish_broadcast(self, event):
+        raise NotImplementedError
+
+    async def subscribe(self, user_id):
+        """ Return a Subscription for the user's events and broadcasts """
+        raise NotImplementedError
+
+
+class Subscription:
+    async def get(self, timeout):
+        """ Next event, or None when nothing arrived within timeout seconds """
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class _QueueSubscription(Subscription):
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.NOTIFICATION_PUSH_QUEUE_SIZE)
+
+    def put(self, event):
+        # Called from whichever thread published; hand over to the stream's event loop
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client loses events rather than growing memory, it refetches on reconnect
+            logger.warning("Push queue full for user %s, dropping event", self.user_id)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._remove(self)
+
+
+class InProcessBroker(Broker):
+    """ Single-node broker: subscriptions live in this process' memory """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def publish(self, events):
+        with self._lock:
+            targets = [
+                (subscription, event) for user_id, event in events
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription, event in targets:
+            subscription.put(event)
+
+    def publish_broadcast(self, event):
+        with self._lock:
+            targets = [sub for subs in self._subscriptions.values() for sub in subs]
+        for subscription in targets:
+            subscription.put(event)
+
+    async def subscribe(self, user_id):
+        subscription = _QueueSubscription(self, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def _remove(self, subscription):
+        with self._lock:
+            subs = self._subscriptions.get(subscription.user_id, set())
+            subs.discard(subscription)
+            if not subs:
+                self._subscriptions.pop(subscription.user_id, None)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Multi-node broker over Redis pub/sub (REDIS_URL). Events are published to
+    Redis; each process keeps one pattern subscription, whatever its number of
+    open streams, and hands what it receives to its local subscriptions.
+    """
+    PREFIX = 'notifications:push:'
+    RECONNECT_SECONDS = 1
+
+    def __init__(self):
+        import redis
+        super().__init__()
+        self.url = settings.REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+        self._listener = None
+
+    def _channel(self, name):
+        return f'{self.PREFIX}{name}'
+
+    def publish(self, events):
+        with self.client.pipeline(transaction=False) as pipe:
+            for user_id, event in events:
+                pipe.publish(self._channel(user_id), json.dumps(event))
+            pipe.execute()
+
+    def publish_broadcast(self, event):
+        self.client.publish(self._channel(BROADCAST_CHANNEL), json.dumps(event))
+
+    async def subscribe(self, user_id):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return await super().subscribe(user_id)
+
+    def _deliver(self, channel, event):
+        name = channel.decode()[len(self.PREFIX):]
+        if name == BROADCAST_CHANNEL:
+            super().publish_broadcast(event)
+        else:
+            super().publish([(int(name), event)])
+
+    async def _listen(self):
+        import redis.asyncio
+        while True:
+            client = redis.asyncio.Redis.from_url(self.url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(self._channel('*'))
+                async for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        self._deliver(message['channel'], json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Push listener lost its Redis connection, reconnecting")
+                await asyncio.sleep(self.RECONNECT_SECONDS)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.NOTIFICATION_PUSH_BROKER)()
+
+
+def _event(kind, notification):
+    return {
+        'id': notification.id,
+        'kind': kind,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'project_id': notification.project_id,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def _publish_safely(publish, *args):
+    try:
+        publish(*args)
+    except Exception:
+        # Push is best effort, clients still see everything through the list endpoints
+        logger.exception("Failed to publish notification push event")
+
+
+def notify(notifications):
+    """ Push personal notifications to their users once the transaction commits """
+    events = [(notification.user_id, _event('personal', notification)) for notification in notifications]
+    if events:
+        transaction.on_commit(lambda: _publish_safely(get_broker().publish, events))
+
+
+def notify_broadcast(broadcast):
+    event = dict(
+        _event('broadcast', broadcast),
+        audience=broadcast.audience,
+        sector=broadcast.sector,
+        leader_id=broadcast.leader_id,
+        excluded_user_id=broadcast.excluded_user_id,
+    )
+    transaction.on_commit(lambda: _publish_safely(get_broker().publish_broadcast, event))
+
+
+def broadcast_visible(event, user_id, sector, followed_leader_ids):
+    """ Audience check for a broadcast event, mirrors inbox.visible_broadcasts """
+    if event.get('excluded_user_id') == user_id:
+        return False
+    audience = event.get('audience')
+    if audience == 'all':
+        return True
+    if audience == 'sector':
+        return bool(sector) and (event.get('sector') or '').lower() == sector.lower()
+    if audience == 'followers':
+        return event.get('leader_id') in followed_leader_ids
+    return False
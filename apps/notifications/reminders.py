@@ -0,0 +1,111 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.projects.models import Project
+from .models import ReminderDispatch, SMSCampaign
+from .utils import create_project_reminder
+from . import campaigns
+
+logger = logging.getLogger(__name__)
+
+
+def schedule(now=None):
+    """
+    Create a pending ReminderDispatch for every planned project that entered
+    a reminder window since the last run. Each window only covers the span
+    down to the next smaller one, (1h, 24h] then (0, 1h], so a project
+    created an hour before it starts gets the 1h reminder but not a late 24h
+    one. Only upcoming projects are read, through project_status_datetime_idx,
+    and the (project, window) unique constraint makes re-runs harmless.
+    Returns the number of dispatches created.
+    """
+    now = now or timezone.now()
+    created = 0
+    lower = 0
+    for hours in sorted(settings.PROJECT_REMINDER_WINDOWS):
+        project_ids = list(
+            Project.objects.filter(
+                status='planned',
+                datetime__gt=now + timedelta(hours=lower),
+                datetime__lte=now + timedelta(hours=hours),
+            ).filter(
+                ~Exists(ReminderDispatch.objects.filter(project=OuterRef('pk'), window=hours))
+            ).values_list('id', flat=True)
+        )
+        ReminderDispatch.objects.bulk_create(
+            [ReminderDispatch(project_id=project_id, window=hours) for project_id in project_ids],
+            ignore_conflicts=True,
+        )
+        created += len(project_ids)
+        lower = hours
+    return created
+
+
+def send(dispatch):
+    """ Notify the registrants of one dispatch (and text them with PROJECT_REMINDER_SMS) """
+    project = dispatch.project
+    now = timezone.now()
+    # Cancelled or moved since it was scheduled: nothing to remind about
+    if project.status == 'planned' and project.datetime > now:
+        # The actual lead time, a late scheduler may send the 24h reminder with 10h to go
+        hours = max(1, round((project.datetime - now).total_seconds() / 3600))
+        dispatch.recipients_count = create_project_reminder(project, hours)
+        if settings.PROJECT_REMINDER_SMS:
+            campaigns.dispatch(SMSCampaign.objects.create(project=project, template=settings.PROJECT_REMINDER_SMS_TEMPLATE))
+    dispatch.status = 'sent'
+    dispatch.sent_at = now
+    dispatch.save(update_fields=['status', 'sent_at', 'recipients_count'])
+
+
+def retry_delay(attempts):
+    """ Wait before retry number ``attempts``, doubling each time """
+    return timedelta(seconds=settings.PROJECT_REMINDER_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def _failed(dispatch, error, now):
+    """ Push a failed reminder back with backoff, or give up on it after PROJECT_REMINDER_MAX_ATTEMPTS """
+    dispatch.attempts += 1
+    dispatch.last_error = str(error)
+    if dispatch.attempts >= settings.PROJECT_REMINDER_MAX_ATTEMPTS:
+        dispatch.status = 'failed'
+        logger.exception("Reminder %s for project %s failed for good", dispatch.pk, dispatch.project_id)
+    else:
+        # send() may have marked it sent before its savepoint rolled back
+        dispatch.status = 'pending'
+        dispatch.next_attempt_at = now + retry_delay(dispatch.attempts)
+        logger.exception("Reminder %s for project %s failed, retrying at %s",
+                         dispatch.pk, dispatch.project_id, dispatch.next_attempt_at)
+    dispatch.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def process(batch_size):
+    """
+    Send a batch of due reminders. Rows are claimed with skip_locked so
+    several schedulers can run; each reminder commits with its notifications
+    in one savepoint, so it is sent exactly once. One that fails is retried
+    later with backoff (and eventually marked failed) rather than claimed
+    again at once, so it can't hold up the reminders queued behind it.
+    Returns (claimed, sent).
+    """
+    sent = 0
+    now = timezone.now()
+    with transaction.atomic():
+        dispatches = list(
+            ReminderDispatch.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('project')
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for dispatch in dispatches:
+            try:
+                with transaction.atomic():
+                    send(dispatch)
+                sent += 1
+            except Exception as e:
+                _failed(dispatch, e, now)
+    return len(dispatches), sent
@@ -0,0 +1,70 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, BroadcastNotification
+from . import unread
+
+ARCHIVE_FIELDS = ['id', 'title', 'message', 'notification_type', 'project_id', 'created_at']
+
+
+def ttl_days(notification_type):
+    policy = settings.NOTIFICATION_RETENTION_DAYS
+    return policy.get(notification_type, policy['default'])
+
+
+def expired(model, now=None):
+    """ Rows of model (Notification or BroadcastNotification) past their type's TTL, per type """
+    now = now or timezone.now()
+    types = [value for value, _ in Notification.NOTIFICATION_TYPES]
+    return {
+        notification_type: model.objects.filter(
+            notification_type=notification_type,
+            created_at__lt=now - timedelta(days=ttl_days(notification_type)),
+        )
+        for notification_type in types
+    }
+
+
+class Archive:
+    """ Append-only gzip JSONL file for pruned rows """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, 'at', encoding='utf-8')
+
+    def write(self, kind, rows):
+        for row in rows:
+            self.file.write(json.dumps(dict(row, kind=kind), cls=DjangoJSONEncoder) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def prune(queryset, kind, batch_size, archive=None, pause=None):
+    """
+    Delete a queryset in small batches, each in its own short transaction so
+    no lock is held for long. Archived rows are written before their batch is
+    deleted. Returns the number of deleted rows.
+    """
+    model = queryset.model
+    fields = ARCHIVE_FIELDS + (['user_id', 'is_read'] if model is Notification else ['audience', 'sector', 'leader_id'])
+    deleted = 0
+    while True:
+        rows = list(queryset.order_by('id').values(*fields)[:batch_size])
+        if not rows:
+            return deleted
+        if archive:
+            archive.write(kind, rows)
+        with transaction.atomic():
+            model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        if model is Notification:
+            unread.invalidate({row['user_id'] for row in rows})
+        deleted += len(rows)
+        if pause:
+            pause()
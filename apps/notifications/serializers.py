@@ -1,16 +1,23 @@
 from rest_framework import serializers
-from .models import Notification, NotificationLog
+from .models import Notification, NotificationLog, SMSCampaign
+from . import campaigns
+from apps.users.models import User
 from apps.users.serializers import UserSerializer
-from apps.projects.serializers import ProjectSerializer
+from apps.projects.models import Project
+from apps.projects.serializers import ProjectSerializer, ProjectSummarySerializer
 
 class  NotificationSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    project = ProjectSerializer(read_only=True)
+    """
+    Compact notification: the user is always the requester so it is just an id,
+    and the project is a summary (load it with select_related('project')).
+    """
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    project = ProjectSummarySerializer(read_only=True)
 
     class Meta:
         model = Notification
-        fields = ["id", "user", "title", "message", "notification_type", "project", "is_read", "created_at"]
-        read_only_fields = ["created_at"]
+        fields = ["id", "user", "title", "message", "notification_type", "project", "actor_count", "is_read", "created_at"]
+        read_only_fields = ["actor_count", "created_at"]
 
     def create(self, validated_data):
         validated_data["user"] = self.context["request"].user
@@ -25,9 +32,84 @@ class NotificationLogSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "project", "channel", "message", "status", "created_at"]
         read_only_fields = ["created_at"]
 
+class InboxItemSerializer(serializers.Serializer):
+    """
+    A personal notification or a broadcast from the merged inbox (see apps.notifications.inbox).
+
+    The project summary comes from columns joined into the inbox query; with
+    ``expand=project`` the view passes fully loaded projects in the context.
+    """
+    id = serializers.IntegerField()
+    kind = serializers.CharField()
+    user = serializers.SerializerMethodField()
+    title = serializers.CharField()
+    message = serializers.CharField()
+    notification_type = serializers.CharField()
+    project = serializers.SerializerMethodField()
+    actor_count = serializers.IntegerField(source="digest_count")
+    is_read = serializers.BooleanField(source="read")
+    created_at = serializers.DateTimeField()
+
+    def get_user(self, item):
+        # Every inbox item belongs to the requester
+        return self.context["request"].user.id
+
+    def get_project(self, item):
+        if not item["project_id"]:
+            return None
+        if "projects" in self.context:
+            project = self.context["projects"].get(item["project_id"])
+            return ProjectSerializer(project, context=self.context).data if project else None
+        summary = Project(id=item["project_id"], title=item["project__title"], image=item["project__image"])
+        return ProjectSummarySerializer(summary, context=self.context).data
+
 class MarkAsReadSerializer(serializers.Serializer):
-    """ Serializer for marking notifications as read """
+    """ Serializer for marking notifications and broadcasts as read """
     notification_ids = serializers.ListField(
         child=serializers.IntegerField(),
-        allow_empty=False
-    )
\ No newline at end of file
+        required=False,
+        default=list
+    )
+    broadcast_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list
+    )
+
+    def validate(self, attrs):
+        if not attrs["notification_ids"] and not attrs["broadcast_ids"]:
+            raise serializers.ValidationError("Provide notification_ids or broadcast_ids")
+        return attrs
+
+class SMSCampaignSerializer(serializers.ModelSerializer):
+    """ SMS campaign to a project's registered volunteers; ``delivery`` is only filled in on retrieve """
+    delivery = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SMSCampaign
+        fields = [
+            "id", "project", "template", "message", "status", "recipients_count", "duplicates_count",
+            "invalid_count", "queue_seconds", "delivery", "created_at", "finished_at",
+        ]
+        read_only_fields = [
+            "message", "status", "recipients_count", "duplicates_count", "invalid_count",
+            "queue_seconds", "created_at", "finished_at",
+        ]
+
+    def get_delivery(self, campaign):
+        if not self.context.get("with_delivery"):
+            return None
+        return campaigns.delivery_stats(campaign)
+
+    def validate_template(self, value):
+        errors = campaigns.template_errors(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
+    def validate_project(self, project):
+        user = self.context["request"].user
+        if project.admin_id != user.id and user.role != User.Roles.ADMIN:
+            raise serializers.ValidationError("Only the project's leader or an admin can text its volunteers")
+        return project
+
@@ -1,3 +1,839 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import json
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connection, transaction
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.users.models import User
+from apps.community.models import Comment, Post, PostUpvote
+from apps.projects.models import Project, ProjectRegistration
+from .models import (
+    BroadcastNotification, BroadcastRead, FanoutJob, Notification, NotificationLog, OutboundMessage, ReminderDispatch,
+    SMSCampaign,
+)
+from .providers import FakeProvider
+from .views import notification_stream
+from .utils import create_comment_notification, create_upvote_notification
+from . import campaigns, fanout, inbox, outbound, providers, push, reminders, retention, unread
+
+
+class NotificationListQueryCountTests(TestCase):
+    """ A notifications page must cost a handful of queries whatever its size """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000101", role="leader")
+        cls.volunteer = User.objects.create_user(phone_number="788000102")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.volunteer)
+
+    def _create_notifications(self, count):
+        for i in range(count):
+            project = Project.objects.create(
+                title=f"Project {i}",
+                sector="Kimironko",
+                datetime=timezone.now() + timedelta(days=3),
+                required_volunteers=10,
+                admin=self.leader,
+            )
+            if i % 2:
+                Notification.create_notification(self.volunteer, "Update", "Changed", "project_update", project)
+            else:
+                inbox.broadcast("New Project Available", "Created", "project_created", project, excluded_user=self.leader)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        self._create_notifications(4)
+        small, _ = self._count_queries("/api/notifications/notifications/")
+        self._create_notifications(96)
+        large, response = self._count_queries("/api/notifications/notifications/")
+
+        self.assertEqual(len(response.data), 100)
+        self.assertEqual(small, large)
+        # The read watermark and the merged inbox
+        self.assertLessEqual(large, 2)
+
+        item = response.data[0]
+        self.assertEqual(item["user"], self.volunteer.id)
+        self.assertEqual(set(item["project"]), {"id", "title", "image_url"})
+
+    def test_expanded_projects_cost_constant_queries(self):
+        self._create_notifications(4)
+        small, _ = self._count_queries("/api/notifications/notifications/?expand=project")
+        self._create_notifications(96)
+        large, response = self._count_queries("/api/notifications/notifications/?expand=project")
+
+        self.assertEqual(small, large)
+        self.assertIn("registered_count", response.data[0]["project"])
+
+    def test_unread_query_count_is_constant(self):
+        self._create_notifications(4)
+        small, _ = self._count_queries("/api/notifications/notifications/unread/")
+        self._create_notifications(96)
+        large, response = self._count_queries("/api/notifications/notifications/unread/")
+
+        self.assertEqual(response.data["count"], 100)
+        self.assertEqual(small, large)
+
+
+@override_settings(NOTIFICATION_FANOUT_ASYNC=True)
+class FanoutJobTests(TestCase):
+    """ Fan-outs are stored jobs that a worker runs, and resumes after a crash, without duplicates """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000111", role="leader")
+        cls.project = Project.objects.create(
+            title="Clean up", sector="Nyamirambo", datetime=timezone.now() + timedelta(days=3), admin=cls.leader,
+        )
+        cls.users = [User.objects.create_user(phone_number=f"78800012{i}") for i in range(4)]
+        for user in cls.users:
+            ProjectRegistration.objects.create(user=user, project=cls.project)
+
+    def test_dispatch_stores_the_job_for_the_worker(self):
+        job = fanout.dispatch(self.project, "Update", "Changed", "project_update")
+
+        self.assertEqual(job.status, "pending")
+        self.assertFalse(Notification.objects.exists())
+        call_command("run_fanout_worker", "--once", stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows, job.locked_until), ("done", 4, None))
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user_id", flat=True)), [user.pk for user in self.users]
+        )
+
+    def test_job_of_a_dead_worker_resumes_from_its_cursor(self):
+        # The worker wrote the first two users and died holding the lease
+        FanoutJob.objects.create(
+            project=self.project, title="Update", message="Changed", notification_type="project_update",
+            status="running", last_user_id=self.users[1].pk, rows=2,
+            locked_until=timezone.now() + timedelta(minutes=5),
+        )
+        call_command("run_fanout_worker", "--once", stdout=StringIO())
+        self.assertFalse(Notification.objects.exists())
+
+        FanoutJob.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        call_command("run_fanout_worker", "--once", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user_id", flat=True)), [user.pk for user in self.users[2:]]
+        )
+        self.assertEqual(FanoutJob.objects.get().rows, 4)
+
+
+class InboxTests(TestCase):
+    """ The inbox merges personal notifications with visible broadcasts, newest first, with per-user read state """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000131", role="leader")
+        cls.volunteer = User.objects.create_user(phone_number="788000132", sector="Gasabo")
+        # Broadcasts older than the account are hidden, leave room for backdated ones
+        User.objects.filter(pk=cls.volunteer.pk).update(created_at=timezone.now() - timedelta(days=1))
+        cls.volunteer.refresh_from_db()
+        cls.project = Project.objects.create(
+            title="Clean up", sector="Gasabo", datetime=timezone.now() + timedelta(days=3), admin=cls.leader,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.volunteer)
+
+    def _personal(self, title):
+        return Notification.objects.create(
+            user=self.volunteer, title=title, message="m", notification_type="project_update", project=self.project,
+        )
+
+    def _broadcast(self, title, **kwargs):
+        return inbox.broadcast(title, "m", "project_created", self.project, **kwargs)
+
+    def test_union_keeps_only_broadcasts_addressed_to_the_user(self):
+        self._personal("personal")
+        self._broadcast("everyone")
+        self._broadcast("my sector", audience="sector", sector="gasabo")
+        self._broadcast("other sector", audience="sector", sector="Huye")
+        self._broadcast("followers", audience="followers", leader=self.leader)
+        self._broadcast("mine", excluded_user=self.volunteer)
+
+        titles = {item["title"]: item["kind"] for item in inbox.items(self.volunteer)}
+
+        self.assertEqual(titles, {"personal": inbox.PERSONAL, "everyone": inbox.BROADCAST, "my sector": inbox.BROADCAST})
+
+    def test_items_are_newest_first_with_a_stable_tiebreak(self):
+        now = timezone.now()
+        personal = [self._personal(f"p{i}") for i in range(2)]
+        broadcasts = [self._broadcast(f"b{i}") for i in range(2)]
+        Notification.objects.filter(pk=personal[0].pk).update(created_at=now - timedelta(minutes=1))
+        BroadcastNotification.objects.filter(pk=broadcasts[0].pk).update(created_at=now - timedelta(minutes=2))
+        # Same instant on both sides of the UNION: personal sorts before broadcast, then by id
+        Notification.objects.filter(pk=personal[1].pk).update(created_at=now)
+        BroadcastNotification.objects.filter(pk=broadcasts[1].pk).update(created_at=now)
+
+        titles = [item["title"] for item in inbox.items(self.volunteer)]
+
+        self.assertEqual(titles, ["p1", "b1", "p0", "b0"])
+
+    def test_cursor_pages_walk_the_union_without_gaps(self):
+        for i in range(3):
+            self._personal(f"p{i}")
+            self._broadcast(f"b{i}")
+        seen, url = [], "/api/notifications/notifications/?cursor=&page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [item["title"] for item in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(seen, [item["title"] for item in inbox.items(self.volunteer)])
+        self.assertEqual(len(seen), 6)
+
+    def test_cursor_with_a_non_integer_id_is_not_found(self):
+        cursor = base64.urlsafe_b64encode(json.dumps([timezone.now().isoformat(), inbox.PERSONAL, "1"]).encode())
+        response = self.client.get("/api/notifications/notifications/", {"cursor": cursor.decode()})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(NOTIFICATION_LIST_LIMIT=3)
+    def test_list_without_cursor_is_capped(self):
+        for i in range(5):
+            self._personal(f"p{i}")
+
+        self.assertEqual(len(self.client.get("/api/notifications/notifications/").data), 3)
+        response = self.client.get("/api/notifications/notifications/unread/")
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual(len(response.data["notifications"]), 3)
+
+    def test_read_set_and_watermark(self):
+        first, second = self._broadcast("first"), self._broadcast("second")
+
+        self.assertEqual(inbox.mark_broadcasts_read(self.volunteer, [first.pk, first.pk]), 1)
+        self.assertEqual(inbox.mark_broadcasts_read(self.volunteer, [first.pk]), 0)
+        unread_titles = [item["title"] for item in inbox.items(self.volunteer, unread_only=True)]
+        self.assertEqual(unread_titles, ["second"])
+
+        self.assertEqual(inbox.mark_all_broadcasts_read(self.volunteer), 1)
+        # Everything is below the watermark now, the per-broadcast read rows are dropped
+        self.assertFalse(BroadcastRead.objects.filter(user=self.volunteer).exists())
+        self.assertFalse(inbox.items(self.volunteer, unread_only=True).exists())
+        self.assertEqual(inbox.mark_broadcasts_read(self.volunteer, [second.pk]), 0)
+
+        newer = self._broadcast("newer")
+        self.assertEqual([item["id"] for item in inbox.items(self.volunteer, unread_only=True)], [newer.pk])
+
+
+class UnreadCountTests(TestCase):
+    """ The cached unread badge follows notifications created, edited and deleted through the API """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.volunteer = User.objects.create_user(phone_number="788000141")
+
+    def setUp(self):
+        # Counters cached by earlier tests may belong to a reused user id
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.volunteer)
+        self.notifications = [
+            Notification.create_notification(self.volunteer, f"n{i}", "m", "project_update") for i in range(3)
+        ]
+
+    def _badge(self):
+        count = self.client.get("/api/notifications/notifications/unread_count/").data["unread_count"]
+        self.assertEqual(count, inbox.items(self.volunteer, unread_only=True).count())
+        return count
+
+    def test_destroy_updates_the_cached_count(self):
+        self.assertEqual(self._badge(), 3)
+
+        url = f"/api/notifications/notifications/{self.notifications[0].pk}/"
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self._badge(), 2)
+
+        self.client.post(f"/api/notifications/notifications/{self.notifications[1].pk}/mark_as_read/")
+        self.client.delete(f"/api/notifications/notifications/{self.notifications[1].pk}/")
+        self.assertEqual(self._badge(), 1)
+
+    def test_create_and_update_update_the_cached_count(self):
+        self.assertEqual(self._badge(), 3)
+        url = f"/api/notifications/notifications/{self.notifications[0].pk}/"
+
+        self.client.patch(url, {"is_read": True}, format="json")
+        self.assertEqual(self._badge(), 2)
+        self.client.patch(url, {"is_read": False}, format="json")
+        self.assertEqual(self._badge(), 3)
+
+        self.client.post("/api/notifications/notifications/", {
+            "title": "Note", "message": "m", "notification_type": "project_update",
+        }, format="json")
+        self.assertEqual(self._badge(), 4)
+
+
+class NotificationStreamTests(TestCase):
+    """ The push stream takes a one-time ticket instead of a JWT in the URL and ends when the token expires """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.volunteer = User.objects.create_user(phone_number="788000151")
+
+    def setUp(self):
+        cache.clear()
+        self.token = AccessToken.for_user(self.volunteer)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def _ticket(self):
+        response = self.client.post("/api/notifications/stream/ticket/")
+        self.assertEqual(response.status_code, 201)
+        return response.data["ticket"]
+
+    def _stream(self, **params):
+        return notification_stream(AsyncRequestFactory().get("/api/notifications/stream/", params))
+
+    async def test_ticket_opens_one_stream_only(self):
+        ticket = await sync_to_async(self._ticket)()
+
+        response = await self._stream(ticket=ticket)
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+        self.assertEqual((await self._stream(ticket=ticket)).status_code, 401)
+
+    async def test_jwt_in_the_query_string_is_refused(self):
+        self.assertEqual((await self._stream(token=str(self.token))).status_code, 401)
+
+    async def test_stream_delivers_events_and_ends_when_the_token_expires(self):
+        ticket = await sync_to_async(self._ticket)()
+        expires_at = time.time() + 0.5
+        await cache.aset(f"notifications:push:ticket:{ticket}", {"user_id": self.volunteer.pk, "expires_at": expires_at})
+        response = await self._stream(ticket=ticket)
+        stream = response.streaming_content
+
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        push.get_broker().publish([(self.volunteer.pk, {"kind": inbox.PERSONAL, "id": 7})])
+        self.assertIn(b'"id": 7', await anext(stream))
+        remaining = [chunk async for chunk in stream]
+
+        self.assertEqual(remaining[-1], b"event: expired\ndata: {}\n\n")
+        self.assertGreaterEqual(time.time(), expires_at)
+
+
+@override_settings(REDIS_URL="redis://localhost:6379/0")
+class RedisBrokerTests(TestCase):
+    """ Each process keeps one Redis listener and routes what it hears to its local streams """
+
+    async def test_streams_share_one_listener(self):
+        async def listen_forever():
+            await asyncio.sleep(3600)
+
+        broker = push.RedisBroker()
+        with mock.patch.object(push.RedisBroker, "_listen", side_effect=listen_forever) as listen:
+            first, second = await broker.subscribe(1), await broker.subscribe(2)
+            self.assertEqual(listen.call_count, 1)
+
+        broker._deliver(b"notifications:push:1", {"id": 1})
+        broker._deliver(b"notifications:push:broadcast", {"id": 2})
+        self.assertEqual([await first.get(1), await first.get(1)], [{"id": 1}, {"id": 2}])
+        self.assertEqual(await second.get(1), {"id": 2})
+        self.assertIsNone(await second.get(0.01))
+
+        await first.close()
+        await second.close()
+        broker._listener.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await broker._listener
+
+
+class DigestNotificationTests(TestCase):
+    """ Bursts of comments/upvotes on a post merge into one row whose text never goes through str.format """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(phone_number="788000161")
+        cls.post = Post.objects.create(user=cls.author, content="Hello", type="suggestion")
+        cls.commenters = [
+            User.objects.create_user(phone_number=f"78800017{i}", first_name=name)
+            for i, name in enumerate(["{x}", "Aline {0}", "{count}"])
+        ]
+
+    def _comment(self, user):
+        create_comment_notification(Comment.objects.create(user=user, post=self.post, content="Hi"))
+        return Notification.objects.get(user=self.author, notification_type="new_comment")
+
+    def test_names_with_braces_are_kept_verbatim(self):
+        self.assertEqual(self._comment(self.commenters[0]).message, "{x} commented on your post. suggestion")
+
+        notification = self._comment(self.commenters[1])
+        self.assertEqual(notification.message, "Aline {0} and 1 other commented on your post. suggestion")
+
+        notification = self._comment(self.commenters[2])
+        self.assertEqual(notification.message, "{count} and 2 others commented on your post. suggestion")
+        self.assertEqual(notification.actor_count, 3)
+
+    def test_upvotes_merge_into_a_count(self):
+        for user in self.commenters:
+            create_upvote_notification(PostUpvote.objects.create(user=user, post=self.post))
+
+        notification = Notification.objects.get(user=self.author, notification_type="upvote_received")
+        self.assertEqual(notification.message, "3 people upvoted your post. suggestion")
+
+
+class CrashingProvider(FakeProvider):
+    """ A provider that raises instead of returning its errors """
+    name = 'crashing'
+
+    def send_many(self, messages):
+        raise RuntimeError("provider bug")
+
+
+@override_settings(
+    OUTBOUND_PROVIDERS={'sms': 'apps.notifications.providers.FakeProvider'},
+    OUTBOUND_MAX_ATTEMPTS=2, OUTBOUND_RETRY_BASE=30, OUTBOUND_RETRY_MAX=600, OUTBOUND_LEASE_SECONDS=60,
+)
+class OutboundWorkerTests(TestCase):
+    """ The outbound queue leases, retries with backoff and records every delivery """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone_number="788000181")
+
+    def setUp(self):
+        providers._providers.clear()
+        FakeProvider.outbox, FakeProvider.batches, FakeProvider.fail_next = [], [], 0
+
+    def _enqueue(self, count):
+        return [outbound.enqueue('sms', f'+25078800{i:04d}', f'Message {i}', user=self.user) for i in range(count)]
+
+    def test_claims_lease_disjoint_batches_and_dead_leases_are_requeued(self):
+        self._enqueue(3)
+
+        first, second = outbound.claim(2), outbound.claim(2)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({m.pk for m in first} & {m.pk for m in second})
+        self.assertEqual(outbound.claim(2), [])
+        self.assertEqual(outbound.requeue_stale(), 0)
+
+        # The worker holding the first batch died
+        OutboundMessage.objects.filter(pk__in=[m.pk for m in first]).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(outbound.requeue_stale(), 2)
+        self.assertEqual(sorted(m.pk for m in outbound.claim(5)), sorted(m.pk for m in first))
+
+    def test_deliver_records_sends_and_logs(self):
+        messages = self._enqueue(3)
+
+        self.assertEqual(outbound.process_batch(10), (3, 3))
+
+        self.assertEqual([m.body for m in FakeProvider.outbox], [m.body for m in messages])
+        for message in OutboundMessage.objects.all():
+            self.assertEqual(message.status, 'sent')
+            self.assertEqual(message.attempts, 1)
+            self.assertEqual(message.provider, 'fake')
+            self.assertTrue(message.provider_message_id.startswith('fake-'))
+            self.assertIsNone(message.locked_until)
+            self.assertIsNotNone(message.sent_at)
+        self.assertEqual(NotificationLog.objects.filter(user=self.user, status='sent').count(), 3)
+
+    def test_failures_back_off_then_fail_for_good(self):
+        message, = self._enqueue(1)
+        FakeProvider.fail_next = 5
+
+        self.assertEqual(outbound.process_batch(), (1, 0))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=29))
+        self.assertIn('Simulated', message.last_error)
+        # Not due yet, and a retry is not logged as a delivery
+        self.assertEqual(outbound.process_batch(), (0, 0))
+        self.assertFalse(NotificationLog.objects.exists())
+
+        OutboundMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbound.process_batch(), (1, 0))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 2))
+        self.assertEqual(NotificationLog.objects.get().status, 'failed')
+
+    @override_settings(OUTBOUND_PROVIDERS={'email': 'apps.notifications.providers.EmailProvider'})
+    def test_email_server_down_is_a_retryable_failure(self):
+        message = outbound.enqueue('email', 'aline@example.com', 'Hello', subject='Hi', user=self.user)
+        connection = mock.Mock()
+        connection.open.side_effect = OSError("Connection refused")
+
+        with mock.patch.object(providers, 'get_connection', return_value=connection):
+            self.assertEqual(outbound.process_batch(), (1, 0))
+
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.locked_until), ('pending', 1, None))
+        self.assertIn("Connection refused", message.last_error)
+        # The broken connection is not kept, the next batch opens a new one
+        self.assertIsNone(providers.get_provider('email').connection)
+
+    @override_settings(OUTBOUND_PROVIDERS={'sms': 'apps.notifications.tests.CrashingProvider'})
+    def test_a_crashing_provider_does_not_strand_the_claim(self):
+        self._enqueue(2)
+
+        with self.assertLogs('apps.notifications.outbound', 'ERROR'):
+            self.assertEqual(outbound.process_batch(), (2, 0))
+
+        for message in OutboundMessage.objects.all():
+            self.assertEqual((message.status, message.attempts, message.locked_until), ('pending', 1, None))
+            self.assertIn("provider bug", message.last_error)
+
+    def test_backoff_doubles_with_jitter_up_to_the_cap(self):
+        for attempts, delay in [(1, 30), (2, 60), (3, 120), (10, 600)]:
+            seconds = outbound.backoff(attempts).total_seconds()
+            self.assertGreaterEqual(seconds, delay)
+            self.assertLessEqual(seconds, delay * 1.5)
+
+
+class SMSCampaignTests(TestCase):
+    """ Campaigns text each distinct number once, resume from their cursor and never run twice at once """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000191", role="leader")
+        cls.project = Project.objects.create(
+            title="Clean up", sector="Kacyiru", datetime=timezone.now() + timedelta(days=3), admin=cls.leader,
+        )
+        # The first two are the same number written differently, the last one can't be texted
+        numbers = ["0788000201", "250788000201", "788000202", "788000203", "788000204", "12"]
+        cls.registrations = [
+            ProjectRegistration.objects.create(user=User.objects.create_user(phone_number=number), project=cls.project)
+            for number in numbers
+        ]
+
+    def _campaign(self, **kwargs):
+        return SMSCampaign.objects.create(project=self.project, template="{title} on {date}", **kwargs)
+
+    def _recipients(self, campaign):
+        return sorted(campaign.messages.values_list('recipient', flat=True))
+
+    def test_run_dedupes_numbers_and_counts_invalid_ones(self):
+        campaign = campaigns.run(self._campaign(), chunk_size=2)
+
+        self.assertEqual(self._recipients(campaign), ['+250788000201', '+250788000202', '+250788000203', '+250788000204'])
+        self.assertEqual((campaign.recipients_count, campaign.duplicates_count, campaign.invalid_count), (4, 1, 1))
+        self.assertEqual((campaign.status, campaign.locked_until), ('queued', None))
+        self.assertEqual(campaign.last_registration_id, self.registrations[-1].pk)
+        self.assertEqual(set(campaign.messages.values_list('priority', flat=True)), {OutboundMessage.PRIORITY_BULK})
+
+    def _interrupted_campaign(self):
+        # The first worker queued the first three registrations, then died
+        campaign = self._campaign(
+            status='queuing', message="Clean up", last_registration_id=self.registrations[2].pk,
+            recipients_count=2, duplicates_count=1, locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        OutboundMessage.objects.bulk_create([
+            OutboundMessage(channel='sms', recipient=number, body="Clean up", campaign=campaign)
+            for number in ['+250788000201', '+250788000202']
+        ])
+        return campaign
+
+    @override_settings(NOTIFICATION_FANOUT_ASYNC=False)
+    def test_resume_continues_from_the_cursor(self):
+        campaign = campaigns.resume(self._interrupted_campaign())
+
+        self.assertEqual(len(self._recipients(campaign)), 4)
+        self.assertEqual((campaign.recipients_count, campaign.duplicates_count, campaign.invalid_count), (4, 1, 1))
+        self.assertEqual(campaign.status, 'queued')
+
+    @override_settings(NOTIFICATION_FANOUT_ASYNC=True)
+    def test_resume_hands_the_campaign_to_the_worker(self):
+        campaign = campaigns.resume(self._interrupted_campaign())
+
+        # Released for run_fanout_worker, nothing queued by the request itself
+        self.assertEqual((campaign.status, campaign.locked_until), ('queuing', None))
+        self.assertEqual(len(self._recipients(campaign)), 2)
+
+        call_command('run_fanout_worker', '--once', stdout=StringIO())
+
+        campaign.refresh_from_db()
+        self.assertEqual(len(self._recipients(campaign)), 4)
+        self.assertEqual((campaign.recipients_count, campaign.duplicates_count, campaign.invalid_count), (4, 1, 1))
+        self.assertEqual((campaign.status, campaign.locked_until), ('queued', None))
+
+    def test_resume_is_refused_while_a_worker_holds_the_campaign(self):
+        campaign = self._campaign(status='queuing', locked_until=timezone.now() + timedelta(minutes=5))
+        client = APIClient()
+        client.force_authenticate(self.leader)
+
+        response = client.post(f"/api/notifications/campaigns/{campaign.pk}/resume/")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(campaign.messages.exists())
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.recipients_count, 0)
+
+        campaigns.run(campaign)
+        response = client.post(f"/api/notifications/campaigns/{campaign.pk}/resume/")
+        self.assertEqual(response.status_code, 400)
+
+    def test_a_number_is_queued_once_per_campaign(self):
+        campaign = self._campaign()
+        message = dict(channel='sms', recipient='+250788000201', body="Hi")
+        OutboundMessage.objects.create(campaign=campaign, **message)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            OutboundMessage.objects.create(campaign=campaign, **message)
+        # Other campaigns and messages outside campaigns (OTP) are not constrained
+        OutboundMessage.objects.create(campaign=self._campaign(), **message)
+        OutboundMessage.objects.create(**message)
+        OutboundMessage.objects.create(**message)
+
+    def test_transactional_messages_are_claimed_before_campaigns(self):
+        campaigns.run(self._campaign())
+        otp = outbound.enqueue('sms', '+250788000299', 'Your code')
+
+        claimed = outbound.claim(2)
+
+        self.assertEqual(claimed[0].pk, otp.pk)
+        self.assertEqual(claimed[1].priority, OutboundMessage.PRIORITY_BULK)
+
+
+@override_settings(PROJECT_REMINDER_WINDOWS=[24, 1], PROJECT_REMINDER_SMS=False)
+class ReminderTests(TestCase):
+    """ Each project gets one reminder per window it enters, and its side effects follow the commit """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000211", role="leader")
+        cls.volunteers = [User.objects.create_user(phone_number=f"78800022{i}") for i in range(3)]
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def _project(self, starts_in, **kwargs):
+        project = Project.objects.create(
+            title="Tree planting", sector="Remera", datetime=self.now + starts_in, admin=self.leader, **kwargs
+        )
+        for volunteer in self.volunteers[:2]:
+            ProjectRegistration.objects.create(user=volunteer, project=project)
+        ProjectRegistration.objects.create(user=self.volunteers[2], project=project, status='waitlisted')
+        return project
+
+    def _windows(self, project):
+        return sorted(ReminderDispatch.objects.filter(project=project).values_list('window', flat=True))
+
+    def test_schedule_picks_the_window_the_project_is_in(self):
+        day = self._project(timedelta(hours=20))
+        hour = self._project(timedelta(minutes=30))
+        later = self._project(timedelta(hours=30))
+        cancelled = self._project(timedelta(hours=20), status='cancelled')
+
+        self.assertEqual(reminders.schedule(self.now), 2)
+        self.assertEqual(self._windows(day), [24])
+        # An hour before it starts, a late 24h reminder would be noise
+        self.assertEqual(self._windows(hour), [1])
+        self.assertEqual(self._windows(later), [])
+        self.assertEqual(self._windows(cancelled), [])
+
+    def test_schedule_is_idempotent_and_adds_the_next_window(self):
+        project = self._project(timedelta(hours=20))
+        self.assertEqual(reminders.schedule(self.now), 1)
+        self.assertEqual(reminders.schedule(self.now), 0)
+
+        self.assertEqual(reminders.schedule(self.now + timedelta(hours=19, minutes=30)), 1)
+        self.assertEqual(self._windows(project), [1, 24])
+
+    def test_window_edges(self):
+        edge = self._project(timedelta(hours=24))
+        past = self._project(timedelta(hours=24, seconds=1))
+        exactly_one = self._project(timedelta(hours=1))
+
+        reminders.schedule(self.now)
+
+        self.assertEqual(self._windows(edge), [24])
+        self.assertEqual(self._windows(past), [])
+        self.assertEqual(self._windows(exactly_one), [1])
+
+    def test_process_notifies_registered_volunteers_once(self):
+        project = self._project(timedelta(hours=20))
+        reminders.schedule(self.now)
+
+        self.assertEqual(reminders.process(10), (1, 1))
+        self.assertEqual(reminders.process(10), (0, 0))
+
+        dispatch = ReminderDispatch.objects.get(project=project)
+        self.assertEqual((dispatch.status, dispatch.recipients_count), ('sent', 2))
+        self.assertEqual(
+            set(Notification.objects.filter(project=project).values_list('user_id', flat=True)),
+            {volunteer.pk for volunteer in self.volunteers[:2]},
+        )
+
+    def test_process_skips_projects_cancelled_since_scheduling(self):
+        project = self._project(timedelta(hours=20))
+        reminders.schedule(self.now)
+        Project.objects.filter(pk=project.pk).update(status='cancelled')
+
+        self.assertEqual(reminders.process(10), (1, 1))
+        dispatch = ReminderDispatch.objects.get(project=project)
+        self.assertEqual((dispatch.status, dispatch.recipients_count), ('sent', 0))
+        self.assertFalse(Notification.objects.filter(project=project).exists())
+
+    @override_settings(PROJECT_REMINDER_MAX_ATTEMPTS=2, PROJECT_REMINDER_RETRY_SECONDS=60)
+    def test_a_failing_reminder_backs_off_without_blocking_the_others(self):
+        broken = self._project(timedelta(hours=20))
+        working = self._project(timedelta(hours=21))
+        reminders.schedule(self.now)
+        create_project_reminder = reminders.create_project_reminder
+
+        def fail_for_broken(project, hours):
+            if project.pk == broken.pk:
+                raise RuntimeError("template error")
+            return create_project_reminder(project, hours)
+
+        with mock.patch.object(reminders, 'create_project_reminder', side_effect=fail_for_broken), \
+                self.assertLogs('apps.notifications.reminders', 'ERROR'):
+            # The broken one comes first, it must not be claimed again right away
+            self.assertEqual(reminders.process(1), (1, 0))
+            self.assertEqual(reminders.process(1), (1, 1))
+            self.assertEqual(reminders.process(1), (0, 0))
+
+            dispatch = ReminderDispatch.objects.get(project=broken)
+            self.assertEqual((dispatch.status, dispatch.attempts, dispatch.last_error), ('pending', 1, "template error"))
+            self.assertGreater(dispatch.next_attempt_at, timezone.now() + timedelta(seconds=59))
+            self.assertEqual(ReminderDispatch.objects.get(project=working).status, 'sent')
+
+            # Due again, fails its last attempt
+            ReminderDispatch.objects.filter(pk=dispatch.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(reminders.process(10), (1, 0))
+
+        dispatch.refresh_from_db()
+        self.assertEqual((dispatch.status, dispatch.attempts), ('failed', 2))
+        self.assertFalse(Notification.objects.filter(project=broken).exists())
+        self.assertEqual(reminders.process(10), (0, 0))
+
+    def test_scheduler_pass_ends_despite_a_failing_reminder(self):
+        self._project(timedelta(hours=20))
+        self._project(timedelta(minutes=30))
+
+        with mock.patch.object(reminders, 'create_project_reminder', side_effect=RuntimeError("down")) as create, \
+                self.assertLogs('apps.notifications.reminders', 'ERROR'):
+            call_command('run_reminder_scheduler', '--once', '--batch-size', '1', stdout=StringIO())
+
+        # One try each, then the pass stops instead of spinning on them
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual(
+            list(ReminderDispatch.objects.values_list('status', 'attempts')), [('pending', 1), ('pending', 1)]
+        )
+
+    def test_unread_and_pushes_wait_for_the_commit(self):
+        self._project(timedelta(hours=20))
+        reminders.schedule(self.now)
+
+        with mock.patch.object(unread, 'invalidate') as invalidate, mock.patch.object(push, 'get_broker') as broker:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                reminders.process(10)
+                invalidate.assert_not_called()
+                broker.assert_not_called()
+            self.assertTrue(callbacks)
+
+        self.assertEqual(
+            set(invalidate.call_args.args[0]), {volunteer.pk for volunteer in self.volunteers[:2]}
+        )
+        broker.assert_called()
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS={'default': 90, 'project_reminder': 14})
+class RetentionTests(TestCase):
+    """ Notifications past their type's retention are archived, then deleted in batches """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.volunteer = User.objects.create_user(phone_number="788000241")
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def _notification(self, age_days, notification_type="project_update", is_read=True):
+        notification = Notification.objects.create(
+            user=self.volunteer, title="Update", message="Changed", notification_type=notification_type, is_read=is_read,
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.now - timedelta(days=age_days))
+        return notification
+
+    def _remaining(self):
+        return set(Notification.objects.values_list('id', flat=True))
+
+    def test_expired_rows_are_archived_then_deleted(self):
+        old = [self._notification(100), self._notification(100), self._notification(20, "project_reminder")]
+        kept = {
+            self._notification(10).pk,
+            self._notification(10, is_read=False).pk,
+            # project_update keeps 90 days, only reminders expire after 14
+            self._notification(20).pk,
+        }
+        broadcast = inbox.broadcast("New project", "Created", "project_created")
+        BroadcastNotification.objects.filter(pk=broadcast.pk).update(created_at=self.now - timedelta(days=100))
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            out = StringIO()
+            call_command('prune_notifications', '--archive-dir', archive_dir, '--batch-size', '1', stdout=out)
+            path = out.getvalue().split("Archived to ")[1].strip()
+            with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                archived = [json.loads(line) for line in archive]
+
+        self.assertEqual(self._remaining(), kept)
+        self.assertFalse(BroadcastNotification.objects.exists())
+        self.assertEqual(
+            sorted((row['kind'], row['id']) for row in archived),
+            sorted([('personal', notification.pk) for notification in old] + [('broadcast', broadcast.pk)]),
+        )
+        self.assertIn("Deleted 4 rows", out.getvalue())
+
+    def test_dry_run_changes_nothing(self):
+        self._notification(100)
+        out = StringIO()
+        call_command('prune_notifications', '--dry-run', stdout=out)
+
+        self.assertEqual(len(self._remaining()), 1)
+        self.assertIn("Would delete 1 rows", out.getvalue())
+
+    def test_batches_stop_at_the_cutoff(self):
+        expired = [self._notification(90 + i) for i in range(1, 6)]
+        # Just inside the window
+        kept = {self._notification(89.9).pk, self._notification(89.9, is_read=False).pk}
+        pause = mock.Mock()
+
+        queryset = retention.expired(Notification, self.now)['project_update']
+        with CaptureQueriesContext(connection) as context:
+            deleted = retention.prune(queryset, 'personal', 2, pause=pause)
+
+        self.assertEqual(deleted, len(expired))
+        self.assertEqual(self._remaining(), kept)
+        # Batches of 2, 2 and 1, then one empty read ends the loop
+        self.assertEqual(pause.call_count, 3)
+        self.assertEqual(sum('DELETE' in query['sql'] for query in context.captured_queries), 3)
+
+    def test_pruning_unread_rows_refreshes_the_unread_count(self):
+        self._notification(100, is_read=False)
+        self._notification(10, is_read=False)
+        self.assertEqual(unread.get(self.volunteer), 2)
+
+        call_command('prune_notifications', stdout=StringIO())
+
+        self.assertEqual(unread.get(self.volunteer), 1)
 
-# Create your tests here.
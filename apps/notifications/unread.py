@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'notifications:unread:version'
+
+
+def _version():
+    """ Bumped by every broadcast, which changes the unread count of a whole audience at once """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(VERSION_KEY, version, None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _key(user_id, version=None):
+    return f'notifications:unread:{version or _version()}:{user_id}'
+
+
+def get(user):
+    """ Cached unread count (personal notifications and broadcasts), recomputed on a miss """
+    key = _key(user.id)
+    count = cache.get(key)
+    if count is None:
+        from . import inbox
+        count = inbox.items(user, unread_only=True).count()
+        cache.set(key, count, settings.NOTIFICATION_UNREAD_TTL)
+    return count
+
+
+def incr(user_id, delta=1):
+    """ Shift a cached counter; a missing counter is left to be recomputed """
+    key = _key(user_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+
+
+def decr(user_id, delta=1):
+    if delta:
+        incr(user_id, -delta)
+
+
+def reset(user_id):
+    cache.set(_key(user_id), 0, settings.NOTIFICATION_UNREAD_TTL)
+
+
+def invalidate(user_ids):
+    """ Drop the counters of many users at once, e.g. after a bulk fan-out """
+    version = _version()
+    cache.delete_many([_key(user_id, version) for user_id in user_ids])
+
+
+def invalidate_all():
+    cache.set(VERSION_KEY, time.time_ns(), None)
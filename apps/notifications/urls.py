@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NotificationLogViewSet, NotificationViewSet
+from .views import NotificationLogViewSet, NotificationViewSet, SMSCampaignViewSet, notification_stream, stream_ticket
 
 router = DefaultRouter()
 router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'logs', NotificationLogViewSet)
+router.register(r'campaigns', SMSCampaignViewSet, basename='sms-campaign')
 
 urlpatterns = [
+    path('stream/', notification_stream, name='notification-stream'),
+    path('stream/ticket/', stream_ticket, name='notification-stream-ticket'),
     path('', include(router.urls)),
 ]
@@ -1,6 +1,12 @@
 from .models import Notification
 from apps.users.models import User
 from apps.projects.models import Project
+from . import fanout, inbox, push, unread
+
+def _others(count):
+    """ "1 other" / "3 others": everyone in a digest but the latest actor """
+    others = count - 1
+    return f"{others} other" if others == 1 else f"{others} others"
 
 def create_comment_notification(comment):
     """ Create notification when someone ashyize comments on post """
@@ -8,12 +14,16 @@ def create_comment_notification(comment):
 
     # Don't notify if user comments on their own post
     if comment.user != post_author:
-        Notification.create_notification(
+        name = comment.user.first_name or comment.user.phone_number
+        # A burst of comments on one post becomes a single digest row
+        Notification.coalesce_notification(
             user=post_author,
+            group_key=f"new_comment:post:{comment.post_id}",
             title="New Comment kuri post yawe",
-            message=f"{comment.user.first_name or comment.user.phone_number} commented on your post. {comment.post.type}",
+            message=f"{name} commented on your post. {comment.post.type}",
             notification_type="new_comment",
-            project=comment.post.project
+            project=comment.post.project,
+            digest_message=lambda count: f"{name} and {_others(count)} commented on your post. {comment.post.type}"
         )
 
 def create_upvote_notification(upvote):
@@ -22,19 +32,19 @@ def create_upvote_notification(upvote):
 
     #Don't notify if user upvotes their own post
     if upvote.user != post_author:
-        Notification.create_notification(
+        name = upvote.user.first_name or upvote.user.phone_number
+        Notification.coalesce_notification(
             user=post_author,
+            group_key=f"upvote_received:post:{upvote.post_id}",
             title="New Upvote kuri post yawe",
-            message=f"{upvote.user.first_name or upvote.user.phone_number} upvoted your post. {upvote.post.type}",
+            message=f"{name} upvoted your post. {upvote.post.type}",
             notification_type="upvote_received",
-            project=upvote.post.project
+            project=upvote.post.project,
+            digest_message=lambda count: f"{count} people upvoted your post. {upvote.post.type}"
         )
 
 def create_project_notification(project, notification_type="project_created"):
     """ Create notification when a project is created """
-    # Notify all users uretse the project creator
-    users_to_notify = User.objects.exclude(id=project.admin.id)
-
     if notification_type == "project_created":
         title = "New Project Available"
         message = f"New project '{project.title}' has been created in {project.sector}"
@@ -45,41 +55,24 @@ def create_project_notification(project, notification_type="project_created"):
         title = "Project Notification"
         message = f"Notification for the project '{project.title}'."
 
-    # Create notification for all users
-    notifications = []
-    for user in users_to_notify:
-        notifications.append(
-            Notification(
-                user=user,
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                project=project
-            )
-        )
-    # Bulk create for efficiency
-    Notification.objects.bulk_create(notifications)
-
-def create_project_reminder(project):
-    """ Create reminder notification for upcoming projects """
-    # Get users who have attended this project's events before
-    # For now, notify all users
-    users_to_notify = User.objects.all()
-
-    notifications = []
-    for user in users_to_notify:
-        notifications.append(
-            Notification(
-                user=user,
-                title="Project Reminder",
-                message=f"Don't forget about the upcoming project '{project.title}' in {project.sector} is happening soon Murakoze! ",
-                notification_type="project_reminder",
-                project=project
-            
-            )
-        )
+    # One broadcast for all users uretse the project creator, instead of a row per user
+    inbox.broadcast(title, message, notification_type, project, excluded_user=project.admin)
 
-    Notification.objects.bulk_create(notifications)
+def create_project_reminder(project, hours=None):
+    """ Remind the project's registered volunteers that it is coming up, returns how many were notified """
+    registered_users = User.objects.filter(
+        project_registrations__project=project,
+        project_registrations__status='registered'
+    ).values_list('id', flat=True)
+    when = f"in {hours} hour{'s' if hours != 1 else ''}" if hours else "soon"
+    rows, _ = fanout.fan_out(
+        registered_users,
+        "Project Reminder",
+        f"Don't forget about the upcoming project '{project.title}' in {project.sector}, it starts {when}. Murakoze!",
+        "project_reminder",
+        project.id,
+    )
+    return rows
 
 # ---------------------------------------
 # for leader notification
@@ -89,26 +82,14 @@ def notify_registered_users(project, notification_type="project_reminder"):
     """Notify users who registered for project updates"""
     from apps.projects.models import ProjectRegistration
     
-    registered_users = User.objects.filter(
-        project_registrations__project=project,
-        project_registrations__status='registered'
-    )
-    
-    notifications = []
-    for user in registered_users:
-        if notification_type == "project_reminder":
-            title = "Project Reminder"
-            message = f"Reminder: '{project.title}' is happening soon!"
-        elif notification_type == "project_update":
-            title = "Project Update"
-            message = f"Update for '{project.title}' you joined"
-        
-        notifications.append(Notification(
-            user=user, title=title, message=message, #type: ignore
-            notification_type=notification_type, project=project
-        ))
-    
-    Notification.objects.bulk_create(notifications)
+    if notification_type == "project_reminder":
+        title = "Project Reminder"
+        message = f"Reminder: '{project.title}' is happening soon!"
+    elif notification_type == "project_update":
+        title = "Project Update"
+        message = f"Update for '{project.title}' you joined"
+
+    fanout.dispatch(project, title, message, notification_type) #type: ignore
 
 # ---------------------------------
 # Notification on leader
@@ -117,21 +98,14 @@ def notify_registered_users(project, notification_type="project_reminder"):
 
 def notify_leader_followers(leader, project):
     """Notify followers when leader creates new project"""
-    from apps.projects.models import LeaderFollowing
-    
-    followers = User.objects.filter(following_leaders__leader=leader)
-    
-    notifications = []
-    for follower in followers:
-        notifications.append(Notification(
-            user=follower,
-            title="New Project from Leader",
-            message=f"Leader you follow created '{project.title}'",
-            notification_type="leader_new_project",
-            project=project
-        ))
-    
-    Notification.objects.bulk_create(notifications)
+    inbox.broadcast(
+        "New Project from Leader",
+        f"Leader you follow created '{project.title}'",
+        "leader_new_project",
+        project,
+        audience="followers",
+        leader=leader
+    )
 
 # ----------------------------
 # notify new registration on project to leader
@@ -147,3 +121,22 @@ def notify_project_leader_new_registration(project, user):
             notification_type="project_registration",
             project=project
         )
+
+# ----------------------------
+# notify volunteers promoted from a project waitlist
+# ----------------------------
+
+def notify_waitlist_promoted(project, users):
+    """Notify waitlisted users who got a place on the project, in one insert"""
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user=user,
+            title="You're In!",
+            message=f"A place opened up on '{project.title}', you are now registered",
+            notification_type="waitlist_promoted",
+            project=project
+        )
+        for user in users
+    ])
+    unread.invalidate([notification.user_id for notification in notifications])
+    push.notify(notifications)
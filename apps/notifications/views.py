@@ -1,15 +1,35 @@
-from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+import json
+import secrets
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import Notification, NotificationLog
-from .serializers import NotificationSerializer, NotificationLogSerializer, MarkAsReadSerializer
+from django.utils.http import parse_etags, quote_etag
+from .models import Notification, NotificationLog, SMSCampaign
+from .serializers import (
+    NotificationSerializer, NotificationLogSerializer, MarkAsReadSerializer, InboxItemSerializer, SMSCampaignSerializer
+)
+from .pagination import InboxPagination
+from . import campaigns, inbox, push
+from . import unread as unread_counts
+from apps.projects.models import Project, LeaderFollowing
+from apps.users.models import User
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InboxPagination
 
     def get_queryset(self): #type: ignore
         # Handle Swagger schema generation
@@ -21,11 +41,58 @@ class NotificationViewSet(viewsets.ModelViewSet):
             return Notification.objects.none()
             
         # only return notifications for the current user
-        return Notification.objects.filter(user=user)
+        return Notification.objects.filter(user=user).select_related('project')
 
     
     def get_serializer_context(self):
         return {'request': self.request}
+
+    # The cached unread count follows every write that adds, removes or flips an unread row
+    def perform_create(self, serializer):
+        notification = serializer.save()
+        if not notification.is_read:
+            unread_counts.incr(notification.user_id)
+
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        notification = serializer.save()
+        if was_read != notification.is_read:
+            unread_counts.incr(notification.user_id, -1 if notification.is_read else 1)
+
+    def perform_destroy(self, instance):
+        was_read = instance.is_read
+        instance.delete()
+        if not was_read:
+            unread_counts.decr(instance.user_id)
+
+    def serialize_inbox(self, items):
+        """ Serialize merged inbox items; ?expand=project loads full projects in one query """
+        items = list(items)
+        context = self.get_serializer_context()
+        if 'project' in self.request.query_params.get('expand', '').split(','):
+            project_ids = {item['project_id'] for item in items if item['project_id']}
+            context['projects'] = Project.objects.for_listing(self.request.user).in_bulk(project_ids) if project_ids else {}
+        return InboxItemSerializer(items, many=True, context=context).data
+
+    @swagger_auto_schema(
+        operation_description="List personal notifications merged with broadcasts addressed to the current user, newest first",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Opt in to cursor pagination (empty for the first page). "
+                                          "Without it only the newest NOTIFICATION_LIST_LIMIT items are returned"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['project'],
+                              description="Return full project details instead of the summary"),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        """ Personal notifications and broadcasts in one list """
+        page = self.paginator.paginate_inbox(request, request.user)
+        if page is not None:
+            return self.paginator.get_paginated_response(self.serialize_inbox(page))
+        # Without a cursor only the newest items, older ones are reached through cursor pages
+        return Response(self.serialize_inbox(inbox.items(request.user)[:settings.NOTIFICATION_LIST_LIMIT]))
+
     @swagger_auto_schema(
         operation_description="Get only unread notifications for current user",
         responses={
@@ -48,14 +115,38 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def unread(self, request):
-        """ Get only unread notifications """
-        unread_notifications = self.get_queryset().filter(is_read=False)
-        serializer = self.get_serializer(unread_notifications, many=True)
+        """ Get only unread notifications, broadcasts included """
+        unread_notifications = inbox.items(request.user, unread_only=True)
         return Response({
             'count': unread_notifications.count(),
-            'notifications': serializer.data
+            'notifications': self.serialize_inbox(unread_notifications[:settings.NOTIFICATION_LIST_LIMIT])
         })
     
+    @swagger_auto_schema(
+        operation_description="Unread notification count for badges, served from a cached counter. "
+                              "Send the returned ETag back in If-None-Match to get 304 while it is unchanged.",
+        responses={
+            200: openapi.Response('Unread count', examples={
+                'application/json': {
+                    'unread_count': 5
+                }
+            }),
+            304: 'Count unchanged since the ETag sent in If-None-Match'
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """ Unread badge count, without serializing any notification """
+        count = unread_counts.get(request.user)
+        etag = quote_etag(f'unread-{request.user.id}-{count}')
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'unread_count': count})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     @swagger_auto_schema(
         operation_description="Mark a single notification as read",
         responses={
@@ -71,8 +162,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_as_read(self, request, pk=None):
         """ Mark a single notification as read """
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if not notification.is_read:
+            notification.is_read = True
+            notification.save()
+            unread_counts.decr(request.user.id)
         return Response({'message': 'Notification marked as read'})
     
     @swagger_auto_schema(
@@ -90,6 +183,9 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_all_as_read(self, request):
         """ Mark all unread notifications as read """
         updated_count = self.get_queryset().filter(is_read=False).update(is_read=True)
+        # Broadcasts only need the user's watermark moved
+        updated_count += inbox.mark_all_broadcasts_read(request.user)
+        unread_counts.reset(request.user.id)
         return Response({
             'message': f'{updated_count} notifications marked as read',
             'updated_count': updated_count
@@ -115,7 +211,11 @@ class NotificationViewSet(viewsets.ModelViewSet):
         serializer =  MarkAsReadSerializer(data=request.data)
         if serializer.is_valid():
             notification_ids = serializer.validated_data['notification_ids'] #type: ignore
+            broadcast_ids = serializer.validated_data['broadcast_ids'] #type: ignore
             updated_count = self.get_queryset().filter(id__in=notification_ids, is_read=False).update(is_read=True)
+            if broadcast_ids:
+                updated_count += inbox.mark_broadcasts_read(request.user, broadcast_ids)
+            unread_counts.decr(request.user.id, updated_count)
             return Response({
                 'message': f'{updated_count} notifications marked as read',
                 'count': updated_count
@@ -150,3 +250,176 @@ class NotificationLogViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 
+
+class SMSCampaignViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """SMS campaigns to the registered volunteers of a project.
+
+    Creating a campaign renders its template once and queues one SMS per
+    distinct phone number in the background; the outbound worker sends them.
+    """
+    serializer_class = SMSCampaignSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self): #type: ignore
+        if getattr(self, 'swagger_fake_view', False):
+            return SMSCampaign.objects.none()
+        user = self.request.user
+        queryset = SMSCampaign.objects.select_related('project').order_by('-created_at')
+        if user.role == User.Roles.ADMIN:
+            return queryset
+        return queryset.filter(project__admin=user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['with_delivery'] = self.action in ('retrieve', 'resume')
+        return context
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Text every registered volunteer of a project. Placeholders: "
+            + ", ".join('{%s}' % name for name in campaigns.PLACEHOLDERS)
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'project': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'template': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    example="Reminder: {title} on {date} at {time}, {location}. See you there!"
+                ),
+            },
+            required=['project', 'template']
+        ),
+        responses={201: SMSCampaignSerializer, 400: 'Invalid template or not the project leader'}
+    )
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        campaign = serializer.save(created_by=self.request.user)
+        campaigns.dispatch(campaign)
+
+    @swagger_auto_schema(
+        operation_description="Resume a campaign whose queuing was interrupted",
+        request_body=openapi.Schema(type=openapi.TYPE_OBJECT, properties={}),
+        responses={
+            202: SMSCampaignSerializer,
+            400: 'Campaign already queued',
+            409: 'Campaign is being queued by a worker',
+        }
+    )
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        campaign = self.get_object()
+        if campaign.status == 'queued':
+            return Response({'error': 'Campaign already queued'}, status=status.HTTP_400_BAD_REQUEST)
+        resumed = campaigns.resume(campaign)
+        if resumed is None:
+            return Response({'error': 'Campaign is being queued by a worker'}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(resumed).data, status=status.HTTP_202_ACCEPTED)
+
+
+
+
+# ---------------------------------
+# Real-time push (Server-Sent Events)
+# ---------------------------------
+
+def _ticket_key(ticket):
+    return f'notifications:push:ticket:{ticket}'
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="One-time ticket for opening the notification stream with EventSource, which cannot "
+                          "send the Authorization header. Redeem it within NOTIFICATION_PUSH_TICKET_TTL seconds "
+                          "as /api/notifications/stream/?ticket=<ticket>",
+    request_body=openapi.Schema(type=openapi.TYPE_OBJECT, properties={}),
+    responses={201: openapi.Response('Ticket', examples={
+        'application/json': {'ticket': 'Jx3...', 'expires_in': 30}
+    })}
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def stream_ticket(request):
+    ticket = secrets.token_urlsafe(32)
+    # The stream lives no longer than the access token that asked for it
+    cache.set(
+        _ticket_key(ticket),
+        {'user_id': request.user.id, 'expires_at': request.auth['exp']},
+        settings.NOTIFICATION_PUSH_TICKET_TTL,
+    )
+    return Response({'ticket': ticket, 'expires_in': settings.NOTIFICATION_PUSH_TICKET_TTL}, status=status.HTTP_201_CREATED)
+
+
+async def _stream_user(request):
+    """
+    The stream's user and the timestamp its access ends, from a JWT in the
+    Authorization header or a one-time ?ticket= (a JWT in the query string
+    would end up in access logs). (None, None) when unauthenticated.
+    """
+    ticket = request.GET.get('ticket')
+    if ticket:
+        claims = await cache.aget(_ticket_key(ticket))
+        # Only the request that deletes the ticket may use it
+        if claims is None or not await cache.adelete(_ticket_key(ticket)):
+            return None, None
+        user = await User.objects.filter(pk=claims['user_id'], is_active=True).afirst()
+        return user, claims['expires_at']
+
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if not raw_token:
+        return None, None
+    try:
+        validated_token = auth.get_validated_token(raw_token)
+        return await sync_to_async(auth.get_user)(validated_token), validated_token['exp']
+    except (InvalidToken, AuthenticationFailed):
+        return None, None
+
+
+async def notification_stream(request):
+    """
+    Stream new notifications and broadcasts for the current user as
+    Server-Sent Events, so clients don't have to poll. Needs the ASGI server.
+    The stream ends with an ``expired`` event when the access token behind it
+    expires; clients reconnect with a fresh ticket.
+    """
+    if 'wsgi.version' in request.META:
+        return JsonResponse({'error': 'Streaming is only available on the ASGI server'}, status=501)
+
+    user, expires_at = await _stream_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+    followed_leader_ids = set(await sync_to_async(list)(
+        LeaderFollowing.objects.filter(follower=user).values_list('leader_id', flat=True)
+    ))
+    subscription = await push.get_broker().subscribe(user.id)
+
+    async def events():
+        try:
+            yield f"retry: {settings.NOTIFICATION_PUSH_RETRY_MS}\n\n"
+            while True:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    yield "event: expired\ndata: {}\n\n"
+                    return
+                event = await subscription.get(min(settings.NOTIFICATION_PUSH_HEARTBEAT, remaining))
+                if event is None:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if event['kind'] == inbox.BROADCAST and not push.broadcast_visible(
+                    event, user.id, user.sector, followed_leader_ids
+                ):
+                    continue
+                yield f"id: {event['kind']}-{event['id']}\nevent: notification\ndata: {json.dumps(event)}\n\n"
+        finally:
+            await subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
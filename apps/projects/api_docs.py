@@ -397,8 +397,8 @@ def api_overview(request):
                 'response': {'detail': 'Not found.'}
             },
             'project_full': {
-                'status': 400,
-                'response': {'error': 'Project is full'}
+                'status': 202,
+                'response': {'message': 'Project is full, you have been added to the waitlist', 'waitlisted': True, 'position': 3}
             }
         },
         
@@ -409,6 +409,7 @@ def api_overview(request):
             ],
             'automatic_notifications': {
                 'project_join': 'Leader notified when someone joins their project',
+                'waitlist_promoted': 'Waitlisted volunteers notified when a place opens up',
                 'new_comment': 'Post author notified of new comments',
                 'post_upvote': 'Post author notified of upvotes',
                 'project_created': 'All users notified of new projects',
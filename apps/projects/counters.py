@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import Project, ProjectRegistration, Attendance
+from . import feeds
+
+COUNTER_FIELDS = ('registered_count', 'volunteer_count')
+
+
+def _registered_changed(updated):
+    # F() updates skip the post_save signal, so the cached discover feed is dropped here
+    if updated:
+        transaction.on_commit(feeds.invalidate)
+    return updated
+
+
+def registered(project_id, delta):
+    """ Shift the stored registration count of a project, never below zero """
+    projects = Project.objects.filter(pk=project_id)
+    if delta < 0:
+        projects = projects.filter(registered_count__gte=-delta)
+    return _registered_changed(projects.update(registered_count=F('registered_count') + delta))
+
+
+def reserve(project_id):
+    """
+    Take one place on a project if it has room left.
+
+    A single conditional UPDATE, so concurrent joins never overbook and never
+    wait on each other for longer than the row write itself. Returns False
+    when the project is full.
+    """
+    return bool(_registered_changed(Project.objects.filter(
+        Q(required_volunteers__isnull=True) | Q(registered_count__lt=F('required_volunteers')),
+        pk=project_id,
+    ).update(registered_count=F('registered_count') + 1)))
+
+
+def volunteered(project_id, delta=1):
+    """ Shift the stored count of distinct users who checked in to a project """
+    projects = Project.objects.filter(pk=project_id)
+    if delta < 0:
+        projects = projects.filter(volunteer_count__gte=-delta)
+    return projects.update(volunteer_count=F('volunteer_count') + delta)
+
+
+def _actual_counts():
+    def count_of(queryset, expression):
+        return Coalesce(Subquery(
+            queryset.filter(project=OuterRef('pk')).order_by().values('project').annotate(
+                total=expression
+            ).values('total')
+        ), Value(0))
+
+    return Project.objects.annotate(
+        # Waitlisted registrations do not hold a place
+        actual_registered=count_of(ProjectRegistration.objects.exclude(status='waitlisted'), Count('id')),
+        actual_volunteers=count_of(Attendance.objects.all(), Count('user', distinct=True)),
+    ).exclude(
+        registered_count=F('actual_registered'), volunteer_count=F('actual_volunteers')
+    ).values_list('id', 'registered_count', 'actual_registered', 'volunteer_count', 'actual_volunteers')
+
+
+def repair(fix=True):
+    """
+    Find projects whose stored counters disagree with the registration and
+    attendance tables. Returns a list of (project id, {field: (stored, actual)}).
+    """
+    drift = []
+    with transaction.atomic():
+        for pk, registered_count, actual_registered, volunteer_count, actual_volunteers in _actual_counts():
+            changes = {}
+            if registered_count != actual_registered:
+                changes['registered_count'] = (registered_count, actual_registered)
+            if volunteer_count != actual_volunteers:
+                changes['volunteer_count'] = (volunteer_count, actual_volunteers)
+            drift.append((pk, changes))
+            if fix:
+                Project.objects.filter(pk=pk).update(**{field: actual for field, (_, actual) in changes.items()})
+        if fix and drift:
+            transaction.on_commit(feeds.invalidate)
+    return drift
@@ -0,0 +1,98 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Project, ProjectRegistration
+from .serializers import ProjectSerializer
+
+FEED_VERSION_KEY = 'discover_feed:version'
+ALL_SECTORS = '*'
+
+
+def _feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(FEED_VERSION_KEY, version, None)
+        version = cache.get(FEED_VERSION_KEY, version)
+    return version
+
+
+def _feed_key(sector):
+    return f'discover_feed:{_feed_version()}:{(sector or ALL_SECTORS).lower()}'
+
+
+def invalidate():
+    """ Drop every cached feed at once by moving to a new version; stale entries expire with their TTL """
+    cache.set(FEED_VERSION_KEY, time.time_ns(), None)
+
+
+def build_blocks(sector=None):
+    """ Compute the user-independent discover blocks for a sector (or all sectors) """
+    now = timezone.now()
+    projects = Project.objects.for_listing()
+    if sector and sector != ALL_SECTORS:
+        projects = projects.filter(sector__iexact=sector)
+
+    # Trending projects (most attended recently)
+    trending = projects.annotate(
+        attendance_count=Count('attendances')
+    ).filter(
+        status='ongoing',
+        datetime__gte=now - timedelta(days=30)
+    ).order_by('-attendance_count')[:5]
+
+    # Urgent projects (happenning soon)
+    urgent = projects.filter(
+        datetime__gte=now, datetime__lte=now + timedelta(days=7), status='planned'
+    ).order_by('datetime')[:5]
+
+    # Recent projects (newly created)
+    recent = projects.filter(
+        status='planned', created_at__gte=now - timedelta(days=7)
+    ).order_by('-created_at')[:5]
+
+    return {
+        'trending': list(ProjectSerializer(trending, many=True).data),
+        'urgent': list(ProjectSerializer(urgent, many=True).data),
+        'recent': list(ProjectSerializer(recent, many=True).data),
+    }
+
+
+def warm(sector=None):
+    blocks = build_blocks(sector)
+    cache.set(_feed_key(sector), blocks, settings.DISCOVER_FEED_TTL)
+    return blocks
+
+
+def get_blocks(sector=None):
+    blocks = cache.get(_feed_key(sector))
+    if blocks is None:
+        blocks = warm(sector)
+    return blocks
+
+
+def personalize(blocks, request):
+    """ Overlay the requester-specific bits on cached blocks: registration flag and absolute image URLs """
+    project_ids = {project['id'] for block in blocks.values() for project in block}
+    registered = set()
+    if project_ids and request.user.is_authenticated:
+        registered = set(ProjectRegistration.objects.filter(
+            user=request.user, project_id__in=project_ids
+        ).exclude(status='waitlisted').values_list('project_id', flat=True))
+
+    return {
+        name: [
+            dict(
+                project,
+                is_user_registered=project['id'] in registered,
+                image_url=request.build_absolute_uri(project['image_url']) if project['image_url'] else None,
+            )
+            for project in block
+        ]
+        for name, block in blocks.items()
+    }
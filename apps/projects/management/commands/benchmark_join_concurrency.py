@@ -0,0 +1,74 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.projects.models import Project
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Fire parallel joins at a throwaway project and verify it is never overbooked"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--volunteers', type=int, default=200, help="Number of users joining")
+        parser.add_argument('--capacity', type=int, default=50, help="required_volunteers of the project")
+        parser.add_argument('--workers', type=int, default=16, help="Parallel threads")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated project and users")
+
+    def handle(self, *args, **options):
+        volunteers, capacity = options['volunteers'], options['capacity']
+        prefix = uuid.uuid4().hex[:6]
+
+        leader = User.objects.create_user(phone_number=f"bench{prefix}L", role='leader')
+        users = User.objects.bulk_create([
+            User(phone_number=f"bench{prefix}{i:05d}") for i in range(volunteers)
+        ])
+        project = Project.objects.create(
+            title=f"Join benchmark {prefix}",
+            sector="Benchmark",
+            datetime=timezone.now() + timedelta(days=1),
+            required_volunteers=capacity,
+            admin=leader,
+        )
+        url = f"/api/projects/projects/{project.pk}/join/"
+
+        def join(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                return client.post(url, HTTP_HOST='localhost').status_code
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            statuses = Counter(pool.map(join, users))
+        elapsed = time.perf_counter() - started
+
+        project.refresh_from_db()
+        # Waitlisted registrations don't hold a place, a full project answers them with 202
+        actual = project.registrations.exclude(status='waitlisted').count()
+        waitlisted = project.registrations.filter(status='waitlisted').count()
+        self.stdout.write(f"{volunteers} joins in {elapsed:.2f}s ({volunteers / elapsed:.0f} joins/sec)")
+        self.stdout.write(f"Responses: {dict(sorted(statuses.items()))}")
+        self.stdout.write(
+            f"Capacity {capacity}, registered_count {project.registered_count}, "
+            f"registrations {actual}, waitlisted {waitlisted}"
+        )
+
+        if not options['keep']:
+            project.delete()
+            User.objects.filter(phone_number__startswith=f"bench{prefix}").delete()
+
+        if actual > capacity or project.registered_count != actual or statuses[201] != actual:
+            raise CommandError("Project was overbooked or its counter drifted")
+        if statuses[202] != waitlisted or statuses[201] + statuses[202] != volunteers:
+            raise CommandError("Some joins were neither registered nor waitlisted")
+        self.stdout.write(self.style.SUCCESS("No overbooking"))
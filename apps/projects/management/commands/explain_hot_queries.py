@@ -0,0 +1,157 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from apps.community.models import Post, Comment
+from apps.notifications import inbox
+from apps.notifications.models import BroadcastNotification, Notification
+from apps.projects.models import Project, ProjectRegistration, Attendance
+from apps.users.models import User, OTP
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large throwaway dataset, EXPLAIN the hot queries issued by the views "
+        "and fail if any of them falls back to a sequential scan"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000, help="Users to seed (other tables scale with it)")
+        parser.add_argument('--no-seed', action='store_true', help="Explain against the existing data instead")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan")
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back, seeded rows never persist
+        try:
+            with transaction.atomic():
+                if not options['no_seed']:
+                    self.seed(options['users'])
+                failures = self.explain_all(options['verbose_plans'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"Sequential scans in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Every hot query uses an index"))
+
+    def seed(self, users):
+        self.stdout.write(f"Seeding {users} users...")
+        now = timezone.now()
+        prefix = 'explain'
+        User.objects.bulk_create(
+            [User(phone_number=f"{prefix}{i:07d}", sector=f"Sector {i % 30}") for i in range(users)], batch_size=2000
+        )
+        user_ids = list(User.objects.filter(phone_number__startswith=prefix).values_list('id', flat=True))
+        admin_id = user_ids[0]
+        statuses = ['planned', 'ongoing', 'completed', 'cancelled']
+        Project.objects.bulk_create([
+            Project(
+                title=f"Seeded project {i}", sector=f"Sector {i % 30}", admin_id=admin_id,
+                datetime=now + timedelta(days=i % 120 - 60), status=statuses[i % 4], required_volunteers=50,
+            )
+            for i in range(max(users // 20, 1))
+        ], batch_size=2000)
+        project_ids = list(Project.objects.filter(title__startswith="Seeded project").values_list('id', flat=True))
+
+        ProjectRegistration.objects.bulk_create([
+            ProjectRegistration(user_id=user_id, project_id=project_ids[(i * 7 + j) % len(project_ids)],
+                                status='waitlisted' if j == 2 else 'registered')
+            for i, user_id in enumerate(user_ids) for j in range(3)
+        ], batch_size=2000, ignore_conflicts=True)
+        Attendance.objects.bulk_create([
+            Attendance(user_id=user_id, project_id=project_ids[(i * 7 + j) % len(project_ids)],
+                       check_in_time=now - timedelta(days=j), check_out_time=None if j == 0 else now)
+            for i, user_id in enumerate(user_ids) for j in range(3)
+        ], batch_size=2000)
+        Notification.objects.bulk_create([
+            Notification(user_id=user_id, title="Seeded", message="Seeded", notification_type='project_update',
+                         is_read=j > 1)
+            for user_id in user_ids for j in range(5)
+        ], batch_size=2000)
+        audiences = [
+            dict(audience='all'), dict(audience='sector', sector='Sector 1'), dict(audience='followers', leader_id=admin_id),
+        ]
+        BroadcastNotification.objects.bulk_create([
+            BroadcastNotification(title="Seeded", message="Seeded", notification_type='project_created',
+                                  **audiences[i % 3])
+            for i in range(max(users // 10, 1))
+        ], batch_size=2000)
+        OTP.objects.bulk_create([
+            OTP(phone_number=f"{prefix}{i:07d}", code=f"{i % 1000000:06d}", is_verified=i % 3 == 0)
+            for i in range(users)
+        ], batch_size=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def hot_queries(self):
+        """ The filters the views run most, keyed by where they come from """
+        user = User.objects.order_by('-id').first()
+        project = Project.objects.order_by('-id').first()
+        user_id, project_id = (user.id if user else 0), (project.id if project else 0)
+        now = timezone.now()
+        return {
+            'notifications list': Notification.objects.filter(user_id=user_id).order_by('-created_at')[:20],
+            'notifications unread': Notification.objects.filter(user_id=user_id, is_read=False).order_by('-created_at'),
+            'inbox page (personal UNION broadcasts)': inbox.items(user)[:20] if user else Notification.objects.none(),
+            'inbox unread': inbox.items(user, unread_only=True) if user else Notification.objects.none(),
+            'checkin/checkout open attendance': Attendance.objects.filter(
+                user_id=user_id, project_id=project_id, check_out_time__isnull=True
+            ),
+            'project_attendance': Attendance.objects.filter(project_id=project_id, check_out_time__isnull=False),
+            'verify_otp': OTP.objects.filter(
+                phone_number=user.phone_number if user else '', code='000000', is_verified=False
+            ).order_by('-created_at')[:1],
+            'registrations by status': ProjectRegistration.objects.filter(project_id=project_id, status='registered'),
+            'waitlist head': ProjectRegistration.objects.filter(
+                project_id=project_id, status='waitlisted'
+            ).order_by('id')[:1],
+            'discover urgent': Project.objects.filter(
+                status='planned', datetime__gte=now, datetime__lte=now + timedelta(days=7)
+            ).order_by('datetime')[:5],
+            'reminder window': Project.objects.filter(
+                status='planned', datetime__gt=now + timedelta(hours=1), datetime__lte=now + timedelta(hours=24)
+            ).values_list('id', flat=True),
+            'sorted by volunteers': Project.objects.order_by('-volunteer_count', '-id')[:10],
+            'popular posts': Post.objects.order_by('-upvotes_count', '-id')[:10],
+            'comment subtree': Comment.objects.filter(
+                post_id=0, path__gt='0000000001/', path__lt='00000000010'
+            ).order_by('path'),
+            'hot posts in a sector': Post.objects.alias(sector_key=Upper('sector')).filter(
+                sector_key='SECTOR 1'
+            ).order_by('-hot_score', '-id')[:10],
+        }
+
+    def explain_all(self, verbose):
+        failures = []
+        for name, queryset in self.hot_queries().items():
+            plan = queryset.explain()
+            scans = sequential_scans(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: sequential scan on {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: index"))
+            if verbose or scans:
+                self.stdout.write(plan)
+        return failures
+
+
+def sequential_scans(plan):
+    """ Tables read in full according to an EXPLAIN plan (PostgreSQL or SQLite) """
+    if connection.vendor == 'postgresql':
+        return re.findall(r'Seq Scan on (\w+)', plan)
+    # SQLite: "SCAN table" without an index is a full table scan
+    return [
+        match.group(1) for match in re.finditer(r'\bSCAN (\w+)(.*)', plan)
+        if 'INDEX' not in match.group(2)
+    ]
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.projects.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the project full-text search index (tsvector on PostgreSQL, FTS5 on SQLite)"
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} projects"))
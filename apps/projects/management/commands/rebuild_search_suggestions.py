@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.projects.suggestions import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the search autocomplete suggestions from the projects table"
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} search suggestions"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.projects import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters from scratch, report drift and correct it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it")
+
+    def handle(self, *args, **options):
+        fresh, drift = stats.reconcile(fix=not options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Dashboard counters are in sync"))
+            return
+
+        for name, difference in drift.items():
+            self.stdout.write(self.style.WARNING(f"{name}: off by {difference:+d} (actual {fresh[name]})"))
+        if options['dry_run']:
+            self.stdout.write("Dry run, nothing was changed")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} counters"))
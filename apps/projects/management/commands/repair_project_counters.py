@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from apps.projects import counters
+
+
+class Command(BaseCommand):
+    help = "Recount project registrations and volunteers, report drift and correct it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it")
+
+    def handle(self, *args, **options):
+        drift = counters.repair(fix=not options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Project counters are in sync"))
+            return
+
+        for pk, changes in drift:
+            details = ', '.join(f"{field} {stored} -> {actual}" for field, (stored, actual) in changes.items())
+            self.stdout.write(self.style.WARNING(f"Project {pk}: {details}"))
+        if options['dry_run']:
+            self.stdout.write("Dry run, nothing was changed")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} projects"))
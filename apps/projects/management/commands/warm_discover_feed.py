@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.projects import feeds
+from apps.projects.models import Project
+
+
+class Command(BaseCommand):
+    help = "Precompute the cached discover feed blocks for every sector (run on a schedule)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sector', action='append', help="Only warm these sectors (repeatable)")
+
+    def handle(self, *args, **options):
+        sectors = options['sector'] or list(
+            Project.objects.order_by().values_list('sector', flat=True).distinct()
+        )
+        feeds.warm()
+        for sector in sectors:
+            feeds.warm(sector)
+        self.stdout.write(self.style.SUCCESS(f"Warmed discover feed for {len(sectors)} sectors plus the global feed"))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:38
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+FTS_TABLE = 'projects_project_fts'
+
+
+def create_search_index(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    connection = schema_editor.connection
+
+    if connection.vendor == 'postgresql':
+        # The GIN index itself is declared on Project.Meta (migration 0010)
+        config = settings.PROJECT_SEARCH_CONFIG
+        Project.objects.update(search_vector=(
+            SearchVector('title', weight='A', config=config) +
+            SearchVector('sector', weight='B', config=config) +
+            SearchVector('location', weight='B', config=config) +
+            SearchVector('description', weight='C', config=config)
+        ))
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            "USING fts5(title, sector, location, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+        for pk, title, sector, location, description in Project.objects.values_list(
+            'id', 'title', 'sector', 'location', 'description'
+        ):
+            schema_editor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, sector, location, description) VALUES (%s, %s, %s, %s, %s)',
+                [pk, title, sector, location or '', description or ''],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_projectregistration_leaderfollowing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
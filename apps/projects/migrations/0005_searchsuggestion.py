@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_suggestions(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    SearchSuggestion = apps.get_model('projects', 'SearchSuggestion')
+    SearchSuggestionKey = apps.get_model('projects', 'SearchSuggestionKey')
+
+    for facet in ('location', 'title', 'sector'):
+        counts = Project.objects.exclude(**{f'{facet}__isnull': True}).exclude(**{facet: ''}).order_by().values_list(
+            facet
+        ).annotate(total=models.Count('id'))
+        for value, total in counts:
+            suggestion = SearchSuggestion.objects.create(facet=facet, value=value, popularity=total)
+            words = ' '.join(value.lower().split())[:255].split(' ')
+            SearchSuggestionKey.objects.bulk_create([
+                SearchSuggestionKey(suggestion=suggestion, key=' '.join(words[i:]))
+                for i in range(min(len(words), 8))
+            ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_project_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('location', 'Location'), ('title', 'Title'), ('sector', 'Sector')], max_length=20)),
+                ('value', models.CharField(max_length=255)),
+                ('popularity', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('facet', 'value')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchSuggestionKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=255)),
+                ('suggestion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keys', to='projects.searchsuggestion')),
+            ],
+        ),
+        migrations.RunPython(populate_suggestions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:42
+
+from django.db import migrations, models
+
+
+def populate_statistics(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    Attendance = apps.get_model('projects', 'Attendance')
+    ProjectStatistic = apps.get_model('projects', 'ProjectStatistic')
+
+    ProjectStatistic.objects.bulk_create([
+        ProjectStatistic(name='total_projects', value=Project.objects.count()),
+        ProjectStatistic(name='active_projects', value=Project.objects.filter(status='ongoing').count()),
+        ProjectStatistic(name='completed_projects', value=Project.objects.filter(status='completed').count()),
+        ProjectStatistic(name='total_volunteers', value=Attendance.objects.values('user').distinct().count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_searchsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    ProjectRegistration = apps.get_model('projects', 'ProjectRegistration')
+    Attendance = apps.get_model('projects', 'Attendance')
+
+    def count_of(model, expression):
+        return models.functions.Coalesce(models.Subquery(
+            model.objects.filter(project=models.OuterRef('pk')).order_by().values('project').annotate(
+                total=expression
+            ).values('total')
+        ), models.Value(0))
+
+    Project.objects.update(
+        registered_count=count_of(ProjectRegistration, models.Count('id')),
+        volunteer_count=count_of(Attendance, models.Count('user', distinct=True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_projectstatistic'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='registered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='volunteer_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['volunteer_count', 'id'], name='project_volunteer_count_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
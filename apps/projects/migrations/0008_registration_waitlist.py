@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_project_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectregistration',
+            name='status',
+            field=models.CharField(choices=[('registered', 'Registered'), ('attended', 'Attended'), ('no_show', 'No Show'), ('waitlisted', 'Waitlisted')], default='registered', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='projectregistration',
+            index=models.Index(fields=['project', 'status', 'id'], name='registration_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_registration_waitlist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('check_out_time__isnull', True)), fields=['user', 'project'], name='attendance_open_checkin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['project', 'check_out_time'], name='attendance_checkout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['status', 'datetime'], name='project_status_datetime_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:20
+
+import apps.projects.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=apps.projects.search.SearchVectorIndex(fields=['search_vector'], name='projects_project_search_gin'),
+        ),
+    ]
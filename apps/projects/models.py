@@ -1,5 +1,7 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from apps.users.models import User, Skill
+from .search import SearchVectorIndex
 import uuid
 import qrcode              #type: ignore
 from io import BytesIO
@@ -23,6 +25,19 @@ class ProjectCategory(models.Model):
 # -------------------------------
 # Projects
 # -------------------------------
+class ProjectQuerySet(models.QuerySet):
+    def for_listing(self, user=None):
+        """ Load everything ProjectSerializer needs so a page costs a fixed number of queries """
+        queryset = self.defer('search_vector').select_related('admin').prefetch_related('project_skills')
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                is_user_registered=models.Exists(
+                    ProjectRegistration.objects.filter(project=models.OuterRef('pk'), user=user).exclude(status='waitlisted')
+                )
+            )
+        return queryset
+
+
 class Project(models.Model):
     STATUS_CHOICES = [
         ("planned", "Planned"),
@@ -42,11 +57,54 @@ class Project(models.Model):
     admin = models.ForeignKey(User, on_delete=models.CASCADE, related_name="projects")
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default="planned")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized counters, kept in step by the join/leave/checkin views (see apps.projects.counters)
+    registered_count = models.PositiveIntegerField(default=0)
+    volunteer_count = models.PositiveIntegerField(default=0)
+    # Maintained by apps.projects.search (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['volunteer_count', 'id'], name='project_volunteer_count_idx'),
+            # Status filters with a date window (discover, dashboard, reminders)
+            models.Index(fields=['status', 'datetime'], name='project_status_datetime_idx'),
+            SearchVectorIndex(fields=['search_vector'], name='projects_project_search_gin'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+# -------------------------------
+# Search Suggestions
+# -------------------------------
+class SearchSuggestion(models.Model):
+    """Distinct facet values offered by search autocomplete, maintained by apps.projects.suggestions"""
+    FACET_CHOICES = [
+        ("location", "Location"),
+        ("title", "Title"),
+        ("sector", "Sector"),
+    ]
+
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    value = models.CharField(max_length=255)
+    popularity = models.PositiveIntegerField(default=0)  # number of projects using this value
+
+    class Meta:
+        unique_together = ("facet", "value")
+
+    def __str__(self):
+        return f"{self.facet}: {self.value} ({self.popularity})"
+
+
+class SearchSuggestionKey(models.Model):
+    """Normalized word-boundary prefixes of a suggestion, so 'env' matches 'Clean Environment'"""
+    suggestion = models.ForeignKey(SearchSuggestion, on_delete=models.CASCADE, related_name="keys")
+    key = models.CharField(max_length=255, db_index=True)
+
+
 class ProjectSkill(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="project_skills")
     skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name="projects")
@@ -69,6 +127,15 @@ class Attendance(models.Model):
         # This suports recurring project and multiple sessions
         # unique_together = ("user", "project")
         ordering = ['-check_in_time']
+        indexes = [
+            # Open check-in lookup on checkin/checkout, only rows not yet checked out
+            models.Index(
+                fields=['user', 'project'],
+                condition=models.Q(check_out_time__isnull=True),
+                name='attendance_open_checkin_idx',
+            ),
+            models.Index(fields=['project', 'check_out_time'], name='attendance_checkout_idx'),
+        ]
 
 
 # -------------------------------
@@ -161,12 +228,17 @@ class ProjectRegistration(models.Model):
     status = models.CharField(max_length=20, choices=[
         ('registered', 'Registered'),
         ('attended', 'Attended'),
-        ('no_show', 'No Show')
+        ('no_show', 'No Show'),
+        ('waitlisted', 'Waitlisted')
     ], default='registered')
     
     class Meta:
         unique_together = ('user', 'project')
         ordering = ['-registered_at']
+        indexes = [
+            # Registrations of a project by status, and the waitlist queue head first (see apps.projects.waitlist)
+            models.Index(fields=['project', 'status', 'id'], name='registration_queue_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.phone_number} registered for {self.project.title}"
@@ -183,3 +255,15 @@ class LeaderFollowing(models.Model):
     
     def __str__(self):
         return f"{self.follower.phone_number} follows {self.leader.phone_number}"
+
+
+# -------------------------------
+# Dashboard Statistics
+# -------------------------------
+class ProjectStatistic(models.Model):
+    """Platform-wide counters kept up to date by apps.projects.stats"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,140 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.backends.ddl_references import Statement
+from django.db.models import Q, Value, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+SEARCH_MODES = ('basic', 'fulltext')
+FTS_TABLE = 'projects_project_fts'
+
+# Columns that feed the search index and their PostgreSQL weights
+SEARCH_FIELDS = {
+    'title': 'A',
+    'sector': 'B',
+    'location': 'B',
+    'description': 'C',
+}
+
+
+class SearchVectorIndex(GinIndex):
+    """
+    GIN index over ``search_vector``. It only exists on PostgreSQL, other
+    backends search through the FTS5 table instead, so they get no index.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Statement('')
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Statement('')
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
+def _terms(search):
+    """ Split user input into safe word tokens for tsquery/FTS5 syntax """
+    return re.findall(r'\w+', search.lower())
+
+
+def fts_available():
+    """ The SQLite FTS5 table is created by migration; tests built without migrations won't have it """
+    return connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+
+
+def project_search_vector():
+    config = settings.PROJECT_SEARCH_CONFIG
+    vector = None
+    for field, weight in SEARCH_FIELDS.items():
+        part = SearchVector(field, weight=weight, config=config)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def search_projects(queryset, search, mode=None):
+    """
+    Filter a Project queryset by a search term and annotate ``search_rank``.
+
+    ``fulltext`` uses the maintained index (tsvector on PostgreSQL, FTS5 on
+    SQLite); ``basic`` keeps the original icontains scan. Backends without an
+    index fall back to ``basic``.
+    """
+    mode = mode if mode in SEARCH_MODES else settings.PROJECT_SEARCH_MODE
+    terms = _terms(search)
+
+    if mode == 'fulltext' and terms:
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                ' & '.join(f'{term}:*' for term in terms),
+                search_type='raw',
+                config=settings.PROJECT_SEARCH_CONFIG,
+            )
+            return queryset.filter(search_vector=query).annotate(
+                # ts_rank() returns real; widen it so keyset cursors round-trip exactly
+                search_rank=Cast(SearchRank('search_vector', query), FloatField())
+            )
+        if fts_available():
+            match = ' AND '.join(f'"{term}"*' for term in terms)
+            return queryset.filter(
+                id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+            ).annotate(
+                # bm25() is lower-is-better, flip it so callers always sort descending
+                search_rank=RawSQL(
+                    f'SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 5.0, 2.0) FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s AND rowid = projects_project.id',
+                    [match],
+                    output_field=FloatField(),
+                )
+            )
+
+    return queryset.filter(
+        Q(title__icontains=search) |
+        Q(description__icontains=search) |
+        Q(location__icontains=search) |
+        Q(sector__icontains=search)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def index_project(project):
+    """ Refresh the search index entry of a single project """
+    from .models import Project
+
+    if connection.vendor == 'postgresql':
+        Project.objects.filter(pk=project.pk).update(search_vector=project_search_vector())
+    elif fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [project.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, sector, location, description) VALUES (%s, %s, %s, %s, %s)',
+                [project.pk, project.title, project.sector, project.location or '', project.description or ''],
+            )
+
+
+def unindex_project(project_id):
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [project_id])
+
+
+def rebuild_index():
+    """ Rebuild the whole search index, returns the number of indexed projects """
+    from .models import Project
+
+    if connection.vendor == 'postgresql':
+        return Project.objects.update(search_vector=project_search_vector())
+    if fts_available():
+        rows = Project.objects.values_list('id', 'title', 'sector', 'location', 'description')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, sector, location, description) VALUES (%s, %s, %s, %s, %s)',
+                [(pk, title, sector, location or '', description or '') for pk, title, sector, location, description in rows],
+            )
+        return len(rows)
+    return 0
@@ -22,13 +22,15 @@ class AttendanceSerializer(serializers.ModelSerializer):
 # Project Serializer
 # -------------------------------
 class ProjectSerializer(serializers.ModelSerializer):
-    skills = ProjectSkillSerializer(source="projectskill_set", many=True, read_only=True)
+    """
+    Use with Project.objects.for_listing() querysets: the registration flag
+    comes from its annotation and only falls back to a query per row without it.
+    """
+    skills = ProjectSkillSerializer(source="project_skills", many=True, read_only=True)
 
     image_url = serializers.SerializerMethodField()
-    volunteer_count = serializers.SerializerMethodField()
     is_user_registered = serializers.SerializerMethodField()
     admin_name = serializers.SerializerMethodField()
-    registered_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Project
@@ -39,13 +41,12 @@ class ProjectSerializer(serializers.ModelSerializer):
             'is_user_registered','skills', 'created_at'
         ]
         read_only_fields = ['admin', 'created_at', 'volunteer_count', 'registered_count', 'is_user_registered']
-    def get_registered_count(self, obj):
-        return obj.registrations.count()
-    
     def get_is_user_registered(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.registrations.filter(user=request.user).exists()
+            if hasattr(obj, 'is_user_registered'):
+                return obj.is_user_registered
+            return obj.registrations.filter(user=request.user).exclude(status='waitlisted').exists()
         return False
 
     def get_image_url(self, obj):
@@ -56,12 +57,25 @@ class ProjectSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
     
-    def get_volunteer_count(self, obj):
-        return Attendance.objects.filter(project=obj).values('user').distinct().count()
-    
     def get_admin_name(self, obj):
         return f"{obj.admin.first_name or ''} {obj.admin.last_name or ''}".strip() or obj.admin.phone_number
 
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    """ Just enough of a project to link to it from notifications """
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Project
+        fields = ['id', 'title', 'image_url']
+
+    def get_image_url(self, obj):
+        if obj.image:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(obj.image.url)
+            return obj.image.url
+        return None
+
 # -------------------------------
 # QR Code Serializers
 # -------------------------------
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Project, Attendance
+from . import feeds, search, stats, suggestions, waitlist
+
+
+@receiver(pre_save, sender=Project)
+def remember_previous_values(sender, instance, update_fields=None, **kwargs):
+    """ Keep the stored facet values, status and capacity around so post_save can apply only the difference """
+    instance._previous_facets = {}
+    instance._previous_status = None
+    instance._previous_capacity = None
+    tracked = set(suggestions.FACETS) | {'status', 'required_volunteers'}
+    if update_fields is not None and not set(update_fields) & tracked:
+        instance._previous_facets = None
+        instance._previous_status = instance.status
+        instance._previous_capacity = instance.required_volunteers
+    elif instance.pk:
+        previous = Project.objects.filter(pk=instance.pk).values(*tracked).first()
+        if previous:
+            # Fields left out of update_fields are not written, so they cannot change
+            for field in tracked - set(update_fields or tracked):
+                previous[field] = getattr(instance, field)
+            instance._previous_status = previous.pop('status')
+            instance._previous_capacity = previous.pop('required_volunteers')
+            instance._previous_facets = {facet: value for facet, value in previous.items() if value}
+
+
+@receiver(post_save, sender=Project)
+def sync_project_search_index(sender, instance, update_fields=None, **kwargs):
+    """ Keep the full-text index in step with the project's searchable columns """
+    if update_fields is not None and not set(update_fields) & set(search.SEARCH_FIELDS):
+        return
+    search.index_project(instance)
+
+
+@receiver(post_save, sender=Project)
+def sync_search_suggestions(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_facets', {})
+    if previous is None:
+        return
+    current = suggestions.project_facets(instance)
+    suggestions.remove_values({facet: value for facet, value in previous.items() if current.get(facet) != value})
+    suggestions.add_values({facet: value for facet, value in current.items() if previous.get(facet) != value})
+
+
+@receiver(post_save, sender=Project)
+def promote_waitlist(sender, instance, created, **kwargs):
+    """ Raising required_volunteers (or removing the limit) opens places for the waitlist """
+    if created:
+        return
+    previous, current = getattr(instance, '_previous_capacity', None), instance.required_volunteers
+    if previous is not None and (current is None or current > previous):
+        waitlist.fill(instance)
+
+
+@receiver(post_delete, sender=Project)
+def remove_project_search_index(sender, instance, **kwargs):
+    search.unindex_project(instance.pk)
+    suggestions.remove_values(suggestions.project_facets(instance))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def invalidate_discover_feed(sender, **kwargs):
+    # Wait for commit so a concurrent rebuild cannot cache the pre-commit state
+    transaction.on_commit(feeds.invalidate)
+
+
+@receiver(post_save, sender=Project)
+def count_project(sender, instance, **kwargs):
+    stats.adjust(stats.project_status_deltas(getattr(instance, '_previous_status', None), instance.status))
+
+
+@receiver(post_delete, sender=Project)
+def uncount_project(sender, instance, **kwargs):
+    stats.adjust(stats.project_status_deltas(instance.status, None))
+
+
+@receiver(post_save, sender=Attendance)
+def count_volunteer(sender, instance, created, **kwargs):
+    # A user becomes a volunteer with their first attendance record
+    if created and not Attendance.objects.filter(user_id=instance.user_id).exclude(pk=instance.pk).exists():
+        stats.adjust({stats.VOLUNTEER_COUNTER: 1})
+
+
+@receiver(post_delete, sender=Attendance)
+def uncount_volunteer(sender, instance, **kwargs):
+    if not Attendance.objects.filter(user_id=instance.user_id).exists():
+        stats.adjust({stats.VOLUNTEER_COUNTER: -1})
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When, BigIntegerField
+from .models import Project, Attendance, ProjectStatistic
+
+# Counter name -> status it tracks (None tracks every project)
+PROJECT_COUNTERS = {
+    'total_projects': None,
+    'active_projects': 'ongoing',
+    'completed_projects': 'completed',
+}
+VOLUNTEER_COUNTER = 'total_volunteers'
+COUNTERS = list(PROJECT_COUNTERS) + [VOLUNTEER_COUNTER]
+
+
+def compute():
+    """ Recompute every counter from scratch """
+    values = {
+        name: Project.objects.filter(status=status).count() if status else Project.objects.count()
+        for name, status in PROJECT_COUNTERS.items()
+    }
+    values[VOLUNTEER_COUNTER] = Attendance.objects.values('user').distinct().count()
+    return values
+
+
+def current():
+    """ Read all counters in one query, bootstrapping the table if it is incomplete """
+    values = dict(ProjectStatistic.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+    if len(values) < len(COUNTERS):
+        values = reconcile()[0]
+    return values
+
+
+def adjust(deltas):
+    """ Apply several counter deltas atomically in a single UPDATE """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    ProjectStatistic.objects.filter(name__in=deltas).update(
+        value=F('value') + Case(
+            *[When(name=name, then=Value(delta)) for name, delta in deltas.items()],
+            default=Value(0),
+            output_field=BigIntegerField(),
+        )
+    )
+
+
+def project_status_deltas(old_status, new_status):
+    """ Counter deltas for a project moving from old_status to new_status (None means absent) """
+    deltas = {}
+    for name, status in PROJECT_COUNTERS.items():
+        was = old_status is not None and (status is None or old_status == status)
+        now = new_status is not None and (status is None or new_status == status)
+        deltas[name] = int(now) - int(was)
+    return deltas
+
+
+def reconcile(fix=True):
+    """
+    Compare stored counters with freshly computed values.
+
+    Returns (fresh values, drift) where drift maps counter name to
+    stored-minus-actual for every counter that was off.
+    """
+    with transaction.atomic():
+        fresh = compute()
+        stored = dict(ProjectStatistic.objects.select_for_update().filter(name__in=COUNTERS).values_list('name', 'value'))
+        drift = {name: stored.get(name, 0) - value for name, value in fresh.items() if stored.get(name) != value}
+        if fix:
+            for name in drift:
+                ProjectStatistic.objects.update_or_create(name=name, defaults={'value': fresh[name]})
+    return fresh, drift
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from .models import Project, SearchSuggestion, SearchSuggestionKey
+
+FACETS = ('location', 'title', 'sector')
+MAX_KEYS_PER_VALUE = 8
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())[:255]
+
+
+def suggestion_keys(value):
+    """ Every word-boundary suffix of the value: 'Clean Environment' -> ['clean environment', 'environment'] """
+    words = normalize(value).split(' ')
+    return [' '.join(words[i:]) for i in range(min(len(words), MAX_KEYS_PER_VALUE))]
+
+
+def project_facets(project):
+    return {facet: getattr(project, facet) for facet in FACETS if getattr(project, facet)}
+
+
+def add_values(facets):
+    """ Count one more project for each facet value, creating suggestions on first use """
+    for facet, value in facets.items():
+        with transaction.atomic():
+            suggestion, created = SearchSuggestion.objects.get_or_create(facet=facet, value=value)
+            if created:
+                SearchSuggestionKey.objects.bulk_create(
+                    [SearchSuggestionKey(suggestion=suggestion, key=key) for key in suggestion_keys(value)]
+                )
+            SearchSuggestion.objects.filter(pk=suggestion.pk).update(popularity=F('popularity') + 1)
+
+
+def remove_values(facets):
+    """ Count one project less for each facet value, dropping suggestions nobody uses anymore """
+    for facet, value in facets.items():
+        SearchSuggestion.objects.filter(facet=facet, value=value, popularity__gt=0).update(
+            popularity=F('popularity') - 1
+        )
+        SearchSuggestion.objects.filter(facet=facet, value=value, popularity=0).delete()
+
+
+def suggest(query, limit=5):
+    """
+    Top ``limit`` values per facet whose words start with ``query``, most used first.
+
+    A single indexed query: the key prefix lookup drives a semi-join and a
+    window function ranks rows within each facet.
+    """
+    matching = SearchSuggestionKey.objects.filter(key__startswith=normalize(query)).values('suggestion_id')
+    rows = SearchSuggestion.objects.filter(pk__in=matching, popularity__gt=0).annotate(
+        facet_rank=Window(
+            RowNumber(),
+            partition_by=[F('facet')],
+            order_by=[F('popularity').desc(), F('value').asc()],
+        )
+    ).filter(facet_rank__lte=limit).order_by('-popularity', 'value').values_list('facet', 'value')
+
+    results = {facet: [] for facet in FACETS}
+    for facet, value in rows:
+        results[facet].append(value)
+    return results
+
+
+def rebuild():
+    """ Recompute every suggestion from the projects table, returns the number of suggestions """
+    suggestions = []
+    for facet in FACETS:
+        counts = Project.objects.exclude(**{f'{facet}__isnull': True}).exclude(**{facet: ''}).order_by().values_list(
+            facet
+        ).annotate(total=Count('id'))
+        suggestions.extend(
+            SearchSuggestion(facet=facet, value=value, popularity=total) for value, total in counts
+        )
+
+    with transaction.atomic():
+        SearchSuggestion.objects.all().delete()
+        created = SearchSuggestion.objects.bulk_create(suggestions, batch_size=500)
+        SearchSuggestionKey.objects.bulk_create(
+            [
+                SearchSuggestionKey(suggestion=suggestion, key=key)
+                for suggestion in created
+                for key in suggestion_keys(suggestion.value)
+            ],
+            batch_size=1000,
+        )
+    return len(created)
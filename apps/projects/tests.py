@@ -1,3 +1,581 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.users.models import User, Skill
+from apps.notifications.models import Notification
+from .models import (
+    Project, ProjectCheckinCode, ProjectSkill, ProjectRegistration, ProjectStatistic, Attendance, SearchSuggestion,
+)
+from .search import FTS_TABLE, search_projects
+from . import counters, feeds, stats, suggestions, waitlist
+
+
+class ProjectListQueryCountTests(TestCase):
+    """ Project list endpoints must cost the same number of queries for any page size """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000001", role="leader", first_name="Aline")
+        cls.volunteer = User.objects.create_user(phone_number="788000002")
+        cls.skill = Skill.objects.create(name="Planting")
+        # Counter rows normally come from the migration
+        stats.reconcile()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.volunteer)
+
+    def _create_projects(self, count):
+        for i in range(count):
+            project = Project.objects.create(
+                title=f"Project {i}",
+                sector="Kimironko",
+                location="Kigali",
+                datetime=timezone.now() + timedelta(days=3),
+                required_volunteers=20,
+                admin=self.leader,
+            )
+            ProjectSkill.objects.create(project=project, skill=self.skill)
+            ProjectRegistration.objects.create(user=self.volunteer, project=project)
+            Attendance.objects.create(user=self.volunteer, project=project, check_in_time=timezone.now())
+        # Rows created directly bypass the views that maintain the stored counters
+        counters.repair()
+
+    def _count_queries(self, url):
+        # Measure the cold path of cached endpoints such as discover
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        self._create_projects(2)
+        small, _ = self._count_queries("/api/projects/projects/")
+        self._create_projects(20)
+        large, response = self._count_queries("/api/projects/projects/")
+
+        self.assertEqual(small, large)
+        # One query for the projects and one for the prefetched skills
+        self.assertEqual(large, 2)
+
+        project = response.data[0]
+        self.assertEqual(project["registered_count"], 1)
+        self.assertEqual(project["volunteer_count"], 1)
+        self.assertTrue(project["is_user_registered"])
+        self.assertEqual(project["admin_name"], "Aline")
+        self.assertEqual(len(project["skills"]), 1)
+
+    def test_other_listings_query_count_is_constant(self):
+        self._create_projects(2)
+        urls = [
+            "/api/projects/projects/discover/",
+            "/api/projects/projects/dashboard/",
+            "/api/projects/projects/sorted_projects/?sort_by=volunteer_count",
+            "/api/projects/projects/my_projects/",
+        ]
+        small = {url: self._count_queries(url)[0] for url in urls}
+        self._create_projects(20)
+        for url in urls:
+            self.assertEqual(self._count_queries(url)[0], small[url], url)
+
+
+def _cursor(*payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class ProjectSearchTests(TestCase):
+    """ Full-text search ranks by field weight and its index follows every project write """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000011", role="leader")
+
+    def setUp(self):
+        if connection.vendor == 'sqlite':
+            # The FTS5 table normally comes from migration 0004
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    "USING fts5(title, sector, location, description, tokenize='unicode61 remove_diacritics 2')"
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(self.leader)
+
+    def _project(self, title="Community work", sector="Gasabo", description="Bring gloves"):
+        return Project.objects.create(
+            title=title, sector=sector, location="Kigali", description=description,
+            datetime=timezone.now() + timedelta(days=3), admin=self.leader,
+        )
+
+    def _search(self, term, mode='fulltext'):
+        return list(search_projects(Project.objects.all(), term, mode).order_by('-search_rank', 'id'))
+
+    def test_fulltext_ranks_title_over_sector_over_description(self):
+        in_description = self._project(description="Plant trees near Rugende")
+        in_sector = self._project(sector="Rugende")
+        in_title = self._project(title="Rugende cleanup")
+        self._project()
+
+        self.assertEqual(self._search("rugende"), [in_title, in_sector, in_description])
+        # Prefix matching, as users type
+        self.assertEqual(self._search("rugen"), [in_title, in_sector, in_description])
+
+        response = self.client.get("/api/projects/projects/?search=Rugende&search_mode=fulltext")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([project["id"] for project in response.data], [in_title.pk, in_sector.pk, in_description.pk])
+
+    def test_fulltext_needs_every_term(self):
+        both = self._project(title="Rugende cleanup", description="Plant trees")
+        self._project(title="Rugende cleanup")
+
+        self.assertEqual(self._search("rugende trees"), [both])
+
+    def test_basic_mode_matches_every_field(self):
+        matches = {
+            self._project(title="Rugende cleanup"),
+            self._project(sector="Rugende"),
+            self._project(description="Near Rugende"),
+        }
+        self._project()
+
+        self.assertEqual(set(self._search("rugende", mode='basic')), matches)
+
+    def test_index_follows_create_update_and_delete(self):
+        project = self._project(title="Rugende cleanup")
+        self.assertEqual(self._search("rugende"), [project])
+
+        project.title = "Kabuga cleanup"
+        project.save()
+        self.assertEqual(self._search("rugende"), [])
+        self.assertEqual(self._search("kabuga"), [project])
+
+        Project.objects.filter(pk=project.pk).first().delete()
+        self.assertEqual(self._search("kabuga"), [])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_saves_without_searchable_fields_leave_the_index_alone(self):
+        project = self._project(title="Rugende cleanup")
+        project.status = 'completed'
+        with CaptureQueriesContext(connection) as context:
+            project.save(update_fields=['status'])
+
+        self.assertFalse([query for query in context.captured_queries if FTS_TABLE in query['sql']])
+        self.assertEqual(self._search("rugende"), [project])
+
+
+class SearchSuggestionTests(TestCase):
+    """ Autocomplete suggestions are counted per project and looked up by word prefix """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000021", role="leader")
+
+    def _project(self, title, sector="Gasabo", location="Kigali"):
+        return Project.objects.create(
+            title=title, sector=sector, location=location, datetime=timezone.now() + timedelta(days=3), admin=self.leader,
+        )
+
+    def _keys(self, facet, value):
+        suggestion = SearchSuggestion.objects.filter(facet=facet, value=value).first()
+        return sorted(suggestion.keys.values_list('key', flat=True)) if suggestion else None
+
+    def test_saving_a_project_adds_its_values(self):
+        project = self._project("Clean Environment Day")
+
+        self.assertEqual(self._keys('title', "Clean Environment Day"), ["clean environment day", "day", "environment day"])
+        self.assertEqual(SearchSuggestion.objects.get(facet='sector', value="Gasabo").popularity, 1)
+
+        project.title = "Tree Planting"
+        project.save()
+        self.assertIsNone(self._keys('title', "Clean Environment Day"))
+        self.assertEqual(self._keys('title', "Tree Planting"), ["planting", "tree planting"])
+        # Unchanged values keep their count
+        self.assertEqual(SearchSuggestion.objects.get(facet='sector', value="Gasabo").popularity, 1)
+
+    def test_deleting_the_last_project_removes_the_value(self):
+        first = self._project("Clean Environment Day", sector="Kicukiro")
+        second = self._project("Tree Planting", sector="Kicukiro")
+
+        first.delete()
+        self.assertEqual(SearchSuggestion.objects.get(facet='sector', value="Kicukiro").popularity, 1)
+        self.assertIsNone(self._keys('title', "Clean Environment Day"))
+
+        second.delete()
+        self.assertFalse(SearchSuggestion.objects.filter(facet='sector', value="Kicukiro").exists())
+        self.assertEqual(suggestions.suggest("kicu")['sector'], [])
+
+    def test_suggest_orders_by_popularity_and_limits_per_facet(self):
+        for sector, projects in (("Kimironko", 3), ("Kimisagara", 2), ("Kinyinya", 1), ("Kacyiru", 4)):
+            for i in range(projects):
+                self._project(f"Project {sector} {i}", sector=sector)
+
+        self.assertEqual(suggestions.suggest("ki")['sector'], ["Kimironko", "Kimisagara", "Kinyinya"])
+        self.assertEqual(suggestions.suggest("KI", limit=2)['sector'], ["Kimironko", "Kimisagara"])
+        # Ties are broken alphabetically
+        self.assertEqual(suggestions.suggest("project kinyinya")['title'], ["Project Kinyinya 0"])
+        self.assertEqual(suggestions.suggest("kimironko", limit=2)['title'], ["Project Kimironko 0", "Project Kimironko 1"])
+
+    def test_suggestions_endpoint(self):
+        self._project("Clean Environment Day", location="Nyamirambo")
+        client = APIClient()
+        client.force_authenticate(self.leader)
+
+        response = client.get("/api/projects/projects/search_suggestions/?q=env")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suggestion']['titles'], ["Clean Environment Day"])
+        self.assertEqual(response.data['suggestion']['locations'], [])
+
+
+class DiscoverFeedCacheTests(TestCase):
+    """ The shared discover blocks are cached per feed version, the per-user bits are not """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000061", role="leader")
+        cls.registered = User.objects.create_user(phone_number="788000062")
+        cls.waitlisted = User.objects.create_user(phone_number="788000063")
+        cls.stranger = User.objects.create_user(phone_number="788000064")
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(
+            title="Market cleanup", sector="Nyarugenge", datetime=timezone.now() + timedelta(days=2),
+            required_volunteers=1, admin=self.leader,
+        )
+
+    def _urgent(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get("/api/projects/projects/discover/")
+        self.assertEqual(response.status_code, 200)
+        return {project["id"]: project for project in response.data["urgent"]}[self.project.pk]
+
+    def _join(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(f"/api/projects/projects/{self.project.pk}/join/")
+
+    def test_feed_is_served_from_cache_until_invalidated(self):
+        self._urgent(self.stranger)
+        # A queryset update sends no signal, so nothing invalidates the cached feed
+        Project.objects.filter(pk=self.project.pk).update(title="Unseen")
+        self.assertEqual(self._urgent(self.stranger)["title"], "Market cleanup")
+
+        feeds.invalidate()
+        self.assertEqual(self._urgent(self.stranger)["title"], "Unseen")
+
+    def test_project_save_bumps_the_version(self):
+        self._urgent(self.stranger)
+        version = cache.get(feeds.FEED_VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.title = "Market and road cleanup"
+            self.project.save()
+
+        self.assertNotEqual(cache.get(feeds.FEED_VERSION_KEY), version)
+        self.assertEqual(self._urgent(self.stranger)["title"], "Market and road cleanup")
+
+    def test_registration_bumps_the_version(self):
+        self.assertEqual(self._urgent(self.stranger)["registered_count"], 0)
+        version = cache.get(feeds.FEED_VERSION_KEY)
+
+        self.assertEqual(self._join(self.registered).status_code, 201)
+
+        self.assertNotEqual(cache.get(feeds.FEED_VERSION_KEY), version)
+        self.assertEqual(self._urgent(self.stranger)["registered_count"], 1)
+
+    def test_registration_flag_is_per_user(self):
+        self._join(self.registered)
+        self.assertEqual(self._join(self.waitlisted).status_code, 202)
+
+        self._urgent(self.stranger)
+        version = cache.get(feeds.FEED_VERSION_KEY)
+
+        self.assertTrue(self._urgent(self.registered)["is_user_registered"])
+        self.assertFalse(self._urgent(self.waitlisted)["is_user_registered"])
+        self.assertFalse(self._urgent(self.stranger)["is_user_registered"])
+        # All three were served the same cached blocks
+        self.assertEqual(cache.get(feeds.FEED_VERSION_KEY), version)
+
+
+class DashboardStatsTests(TestCase):
+    """ The stored dashboard totals follow every project and attendance write """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000071", role="leader")
+        cls.volunteers = [User.objects.create_user(phone_number=f"78800007{i}") for i in range(2, 4)]
+        # Counter rows normally come from the migration
+        stats.reconcile()
+
+    def _project(self, **kwargs):
+        return Project.objects.create(
+            title="Drainage", sector="Kigali", datetime=timezone.now() + timedelta(days=2), admin=self.leader, **kwargs
+        )
+
+    def _dashboard(self):
+        client = APIClient()
+        client.force_authenticate(self.leader)
+        response = client.get("/api/projects/projects/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        return response.data['status']
+
+    def test_project_writes_move_the_totals(self):
+        project = self._project()
+        self._project(status='completed')
+        self.assertEqual(stats.current(), {
+            'total_projects': 2, 'active_projects': 0, 'completed_projects': 1, 'total_volunteers': 0,
+        })
+
+        project.status = 'ongoing'
+        project.save()
+        self.assertEqual((stats.current()['active_projects'], stats.current()['total_projects']), (1, 2))
+
+        project.delete()
+        self.assertEqual(stats.current(), stats.compute())
+        self.assertEqual(self._dashboard()['total_projects'], 1)
+
+    def test_volunteers_count_once_whatever_their_attendances(self):
+        first, second = self._project(), self._project()
+        attendance = Attendance.objects.create(user=self.volunteers[0], project=first, check_in_time=timezone.now())
+        Attendance.objects.create(user=self.volunteers[0], project=second, check_in_time=timezone.now())
+        Attendance.objects.create(user=self.volunteers[1], project=first, check_in_time=timezone.now())
+        # Registrations alone don't make a volunteer
+        ProjectRegistration.objects.create(user=self.leader, project=first)
+        self.assertEqual(stats.current()['total_volunteers'], 2)
+
+        attendance.delete()
+        self.assertEqual(stats.current()['total_volunteers'], 2)
+        Attendance.objects.filter(user=self.volunteers[1]).delete()
+        self.assertEqual(self._dashboard()['total_volunteers'], 1)
+
+    def test_reconcile_command_fixes_drift(self):
+        self._project(status='ongoing')
+        ProjectStatistic.objects.filter(name='active_projects').update(value=7)
+        ProjectStatistic.objects.filter(name='total_volunteers').delete()
+
+        out = StringIO()
+        call_command('reconcile_dashboard_stats', '--dry-run', stdout=out)
+        self.assertIn("active_projects: off by +6 (actual 1)", out.getvalue())
+        self.assertEqual(ProjectStatistic.objects.get(name='active_projects').value, 7)
+
+        call_command('reconcile_dashboard_stats', stdout=StringIO())
+        self.assertEqual(stats.current(), stats.compute())
+        self.assertEqual(self._dashboard()['active_projects'], 1)
+
+
+class VolunteerCountTests(TestCase):
+    """ volunteer_count counts distinct users who checked in, whichever way attendance is written """
+
+    @classmethod
+    def setUpClass(cls):
+        # Check-in codes render their QR image into MEDIA_ROOT
+        media = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(media.cleanup)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media.name))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000081", role="leader")
+        cls.volunteer = User.objects.create_user(phone_number="788000082")
+        cls.project = Project.objects.create(
+            title="Terraces", sector="Huye", datetime=timezone.now(), status='ongoing', admin=cls.leader,
+        )
+        cls.code = ProjectCheckinCode.objects.create(project=cls.project)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.volunteer)
+
+    def _scan(self, endpoint):
+        return self.client.post(
+            f"/api/projects/{endpoint}/", {"qr_code": f"umuganda_checkin:{self.project.pk}:{self.code.code}"}, format="json"
+        )
+
+    def _volunteer_count(self):
+        return Project.objects.values_list('volunteer_count', flat=True).get(pk=self.project.pk)
+
+    def test_only_the_first_checkin_counts(self):
+        self.assertEqual(self._scan("checkin").status_code, 200)
+        self.assertEqual(self._volunteer_count(), 1)
+
+        # Checked in already
+        self.assertEqual(self._scan("checkin").status_code, 400)
+        self.assertEqual(self._scan("checkout").status_code, 200)
+        # Back for a second visit
+        self.assertEqual(self._scan("checkin").status_code, 200)
+
+        self.assertEqual(Attendance.objects.filter(project=self.project).count(), 2)
+        self.assertEqual(self._volunteer_count(), 1)
+
+    def test_deleting_the_last_attendance_removes_the_volunteer(self):
+        self._scan("checkin")
+        self._scan("checkout")
+        self._scan("checkin")
+        first, second = Attendance.objects.filter(project=self.project).order_by('id')
+
+        self.assertEqual(self.client.delete(f"/api/projects/attendances/{first.pk}/").status_code, 204)
+        self.assertEqual(self._volunteer_count(), 1)
+        self.assertEqual(self.client.delete(f"/api/projects/attendances/{second.pk}/").status_code, 204)
+        self.assertEqual(self._volunteer_count(), 0)
+
+    def test_attendance_created_through_the_api_counts(self):
+        for _ in range(2):
+            response = self.client.post(
+                "/api/projects/attendances/",
+                {"user": self.volunteer.pk, "project": self.project.pk, "check_in_time": timezone.now()},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self._volunteer_count(), 1)
+
+    def test_repair_command_restores_the_count(self):
+        self._scan("checkin")
+        Project.objects.filter(pk=self.project.pk).update(volunteer_count=5)
+
+        out = StringIO()
+        call_command('repair_project_counters', stdout=out)
+
+        self.assertIn("volunteer_count 5 -> 1", out.getvalue())
+        self.assertEqual(self._volunteer_count(), 1)
+
+
+class KeysetPaginationTests(TestCase):
+    """ Cursor pages must walk the list without gaps and reject bad cursors with a 404 """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000011", role="leader")
+        for i in range(5):
+            Project.objects.create(
+                title=f"Project {i}", sector="Remera", datetime=timezone.now() + timedelta(days=i), admin=cls.leader,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.leader)
+
+    def test_pages_cover_every_project_once(self):
+        seen = []
+        url = "/api/projects/projects/?cursor=&page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [project["id"] for project in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(sorted(seen), sorted(Project.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_invalid_cursors_are_not_found(self):
+        # The list is keyed on created_at
+        for cursor in [
+            "not-base64!",
+            _cursor("title", "x", 1),
+            _cursor("created_at", "notadate", 1),
+            _cursor("created_at", ["a"], 1),
+            _cursor("created_at", timezone.now().isoformat(), "abc"),
+        ]:
+            response = self.client.get("/api/projects/projects/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class WaitlistTests(TestCase):
+    """ A full project queues joins, and freed places go to the head of the queue """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leader = User.objects.create_user(phone_number="788000021", role="leader")
+        cls.users = [User.objects.create_user(phone_number=f"78800003{i}") for i in range(5)]
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            title="Tree planting", sector="Gisozi", datetime=timezone.now() + timedelta(days=2),
+            required_volunteers=2, admin=self.leader,
+        )
+
+    def _join(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(f"/api/projects/projects/{self.project.pk}/join/")
+
+    def _statuses(self):
+        return dict(ProjectRegistration.objects.filter(project=self.project).values_list("user_id", "status"))
+
+    def test_joins_past_capacity_are_waitlisted_in_order(self):
+        responses = [self._join(user) for user in self.users[:4]]
+
+        self.assertEqual([response.status_code for response in responses], [201, 201, 202, 202])
+        self.assertEqual([response.data["position"] for response in responses[2:]], [1, 2])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.registered_count, 2)
+
+    def test_release_promotes_the_head_of_the_queue(self):
+        for user in self.users[:4]:
+            self._join(user)
+        leaving = ProjectRegistration.objects.get(project=self.project, user=self.users[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            promoted = waitlist.release(leaving)
+
+        self.assertEqual([registration.user for registration in promoted], [self.users[2]])
+        statuses = self._statuses()
+        self.assertEqual(statuses[self.users[2].pk], "registered")
+        self.assertEqual(statuses[self.users[3].pk], waitlist.WAITLISTED)
+        self.assertNotIn(self.users[0].pk, statuses)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.registered_count, 2)
+        self.assertTrue(Notification.objects.filter(
+            user=self.users[2], notification_type="waitlist_promoted"
+        ).exists())
+
+    def test_releasing_a_waitlisted_registration_frees_no_place(self):
+        for user in self.users[:4]:
+            self._join(user)
+        queued = ProjectRegistration.objects.get(project=self.project, user=self.users[2])
+
+        self.assertEqual(waitlist.release(queued), [])
+        self.assertEqual(waitlist.position(ProjectRegistration.objects.get(user=self.users[3])), 1)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.registered_count, 2)
+
+    def test_second_release_of_the_same_registration_is_a_no_op(self):
+        for user in self.users[:3]:
+            self._join(user)
+        leaving = ProjectRegistration.objects.get(project=self.project, user=self.users[0])
+
+        waitlist.release(leaving)
+        self.assertEqual(waitlist.release(leaving), [])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.registered_count, 2)
+        self.assertEqual(waitlist.queue(self.project.pk).count(), 0)
+
+    def test_raising_capacity_fills_from_the_queue(self):
+        for user in self.users:
+            self._join(user)
+
+        self.project.refresh_from_db()
+        self.project.required_volunteers = 4
+        self.project.save()
+
+        statuses = self._statuses()
+        self.assertEqual([statuses[user.pk] for user in self.users], ["registered"] * 4 + [waitlist.WAITLISTED])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.registered_count, 4)
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.db.models import Q, Count
+from django.db.models.functions import Coalesce
 from .models import (
     Project, ProjectSkill, Attendance, 
     ProjectCheckinCode,Certificate, ProjectRegistration, 
@@ -22,10 +23,14 @@ from .serializers import (
 from apps.users.models import User
 from apps.users.permissions import IsOwnerOrAdmin
 from .services import CertificateService
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from apps.notifications.utils import create_project_notification
 from datetime import datetime, timedelta
 from .services import CertificateService,GamificationService
+from .search import search_projects
+from umugandatech.pagination import KeysetPagination
+from .suggestions import suggest
+from . import counters, feeds, stats, waitlist
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -33,6 +38,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     # basic filter
     # filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -47,17 +53,13 @@ class ProjectViewSet(viewsets.ModelViewSet):
         responses={200: ProjectSerializer(many=True)})
 
     def get_queryset(self):  #type: ignore
-        queryset = Project.objects.all()
+        queryset = Project.objects.for_listing(self.request.user)
 
         # Search functionality
         search = self.request.query_params.get('search', None)  #type: ignore
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(location__icontains=search) |
-                Q(sector__icontains=search)
-            )
+            search_mode = self.request.query_params.get('search_mode')  #type: ignore
+            queryset = search_projects(queryset, search, search_mode)
 
         # Filter by status
         status_filter = self.request.query_params.get('status', None) #type: ignore
@@ -77,12 +79,16 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if date_to:
             queryset = queryset.filter(datetime__lte=date_to)
 
+        if search:
+            return queryset.order_by('-search_rank', '-created_at')
         return queryset.order_by('-created_at')
     @swagger_auto_schema(
         operation_description="Smart project discovery based on user preferences",
         manual_parameters=[
             openapi.Parameter('location', openapi.IN_QUERY, 
                             description="Filter by location", type=openapi.TYPE_STRING),
+            openapi.Parameter('sector', openapi.IN_QUERY, 
+                            description="Limit trending/urgent/recent blocks to a sector", type=openapi.TYPE_STRING),
         ],
         responses={200: ProjectSerializer(many=True)}
     )
@@ -90,6 +96,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def discover(self, request):
         """ Smart project discovery based on user profile and preferences """
         user =  request.user
+        projects = Project.objects.for_listing(user)
 
         # Nearby Projects (based on user`s sector or provided loction)
         location = request.query_params.get('location')
@@ -97,34 +104,20 @@ class ProjectViewSet(viewsets.ModelViewSet):
             location = user.sector
 
         if location:
-            nearby = Project.objects.filter(location__icontains=location, status__in=['planned', 'ongoing']).exclude(admin=user)[:5]
+            nearby = projects.filter(location__icontains=location, status__in=['planned', 'ongoing']).exclude(admin=user)[:5]
 
         else:
-            nearby = Project.objects.filter(status__in=['planned', 'ongoing']).exclude(admin=user)[:5]
-
-        # Trending projects (most attended recently)
-        trending = Project.objects.annotate(
-            attendance_count=Count('attendances')
-        ).filter(
-            status='ongoing',
-            datetime__gte=timezone.now() - timedelta(days=30)
-        ).order_by('-attendance_count')[:5]
-
-        # Urgent projects (happenning soon)
-        urgent = Project.objects.filter(
-            datetime__gte=timezone.now(), datetime__lte=timezone.now() + timedelta(days=7), status='planned'
-        ).order_by('datetime')[:5]
-
-        # Recent projects (newly created)
-        recent = Project.objects.filter(
-            status='planned', created_at__gte=timezone.now() - timedelta(days=7)
-        ).order_by('-created_at')[:5]
+            nearby = projects.filter(status__in=['planned', 'ongoing']).exclude(admin=user)[:5]
+
+        # Trending, urgent and recent blocks are shared by everyone, so they come
+        # precomputed from the cache and only the per-user bits are overlaid here
+        blocks = feeds.personalize(feeds.get_blocks(request.query_params.get('sector')), request)
 
         return Response({
             'nearby': ProjectSerializer(nearby, many=True, context={'request': request}).data,
-            'trending': ProjectSerializer(trending, many=True, context={'request': request}).data,
-            'urgent': ProjectSerializer(urgent, many=True, context={'request': request}).data,
-            'recent': ProjectSerializer(recent, many=True, context={'request': request}).data,
+            'trending': blocks['trending'],
+            'urgent': blocks['urgent'],
+            'recent': blocks['recent'],
               })
     @swagger_auto_schema(
         operation_description="Get search suggestions for autocomplete",
@@ -153,26 +146,14 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if len(query) < 2:
             return Response({'suggestions': []})
         
-        # Location suggetions
-        locations = Project.objects.filter(
-            location__icontains=query
-        ).values_list('location', flat=True).distinct()[:5]
-
-        #  Project title suggetions
-        titles = Project.objects.filter(
-            title__icontains=query
-        ).values_list('title', flat=True).distinct()[:5]
-
-        # Sector suggestions 
-        sectors = Project.objects.filter(
-            sector__icontains=query
-        ).values_list('sector', flat=True).distinct()[:5]
-        
+        # One indexed lookup answers all three facets, most used values first
+        suggestions = suggest(query)
+
         return Response({
            'suggestion': {
-               'locations': list(set(locations)),
-                'titles': list(titles),
-                'sectors': list(set(sectors))
+               'locations': suggestions['location'],
+                'titles': suggestions['title'],
+                'sectors': suggestions['sector']
              }
         })
     
@@ -180,31 +161,31 @@ class ProjectViewSet(viewsets.ModelViewSet):
         operation_description="Get projects with advanced sorting and filtering",
         manual_parameters=[
             openapi.Parameter('search', openapi.IN_QUERY, description="Search term", type=openapi.TYPE_STRING),
+            openapi.Parameter('search_mode', openapi.IN_QUERY, description="Search engine mode", type=openapi.TYPE_STRING,
+                            enum=['fulltext', 'basic']),
             openapi.Parameter('status', openapi.IN_QUERY, description="Project status", type=openapi.TYPE_STRING),
             openapi.Parameter('location', openapi.IN_QUERY, description="Location filter", type=openapi.TYPE_STRING),
             openapi.Parameter('sort_by', openapi.IN_QUERY, description="Sort field", type=openapi.TYPE_STRING,
-                            enum=['created_at', 'datetime', 'title', 'volunteer_count', 'required_volunteers', 'urgency']),
+                            enum=['created_at', 'datetime', 'title', 'volunteer_count', 'required_volunteers', 'urgency', 'relevance']),
             openapi.Parameter('order', openapi.IN_QUERY, description="Sort order", type=openapi.TYPE_STRING,
                             enum=['asc', 'desc'], default='desc'),
             openapi.Parameter('page_size', openapi.IN_QUERY, description="Items per page", type=openapi.TYPE_INTEGER, default=10),
             openapi.Parameter('page', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER, default=1),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Opaque cursor from 'next' (send empty for the first page) to switch to cursor pagination", type=openapi.TYPE_STRING),
+            openapi.Parameter('count', openapi.IN_QUERY, description="Total count in cursor mode (omitted by default)", type=openapi.TYPE_STRING,
+                            enum=['exact', 'approx']),
         ]
     )
     
     @action(detail=False, methods=['get'])
     def sorted_projects(self, request):
         """ Get projects with advanced sorting """
-        queryset = Project.objects.all()
+        queryset = Project.objects.for_listing(request.user)
 
         # apply existing filter first
         search = request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(location__icontains=search) |
-                Q(sector__icontains=search)
-            )
+            queryset = search_projects(queryset, search, request.query_params.get('search_mode'))
 
         status_filter = request.query_params.get('status')
         if status_filter:
@@ -218,9 +199,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
         sort_by = request.query_params.get('sort_by', 'created_at')
         order = request.query_params.get('order', 'desc')
 
-        # Annotate with calculated fields for sorting
+        # Annotate with calculated fields for sorting (volunteer_count is a stored column)
         queryset = queryset.annotate(
-            volunteer_count=Count('attendances_user', distinct=True),
             days_until_event=timezone.now() - models.F('datetime')
         )
 
@@ -233,13 +213,27 @@ class ProjectViewSet(viewsets.ModelViewSet):
             'required_volunteers': 'required_volunteers',
             'urgency': 'datetime',  #sort by how soon the event is
         }
+        if search:
+            sort_options['relevance'] = 'search_rank'
         
         sort_field = sort_options.get(sort_by, 'created_at')
+        if sort_field == 'required_volunteers':
+            # Keyset cursors need a non-null sort key
+            queryset = queryset.annotate(required_volunteers_key=Coalesce('required_volunteers', 0))
+            sort_field = 'required_volunteers_key'
 
         if order == 'desc':
             sort_field = f'-{sort_field}'
 
-        queryset = queryset.order_by(sort_field)
+        queryset = queryset.order_by(sort_field, f"{'-' if order == 'desc' else ''}id")
+
+        # Cursor pagination: constant cost per page, no COUNT unless requested
+        paginator = self.paginator
+        if paginator.is_requested(request):
+            projects = paginator.paginate_queryset(queryset, request, view=self, ordering=sort_field)
+            return paginator.get_paginated_response(
+                ProjectSerializer(projects, many=True, context={'request': request}).data
+            )
 
         # pagination
         page_size = int(request.query_params.get('page_size', 10))
@@ -312,25 +306,24 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """ Dashboard statistics for frontend """
-        total_projects = Project.objects.count()
-        active_projects = Project.objects.filter(status='ongoing').count()
-        completed_projects = Project.objects.filter(status='completed').count()
-        total_volunteers = Attendance.objects.values('user').distinct().count()
+        # Counters are maintained incrementally (see apps.projects.stats)
+        totals = stats.current()
 
         # Recent projects
-        recent_projects = Project.objects.order_by('-created_at')[:5]
+        projects = Project.objects.for_listing(request.user)
+        recent_projects = projects.order_by('-created_at')[:5]
         # Upcoming deadlines - projects in next 30 days for calendar
-        upcoming_deadlines = Project.objects.filter(
+        upcoming_deadlines = projects.filter(
             datetime__gte=timezone.now(),
             datetime__lte=timezone.now() + timedelta(days=30),
             status__in=['planned', 'ongoing']
         ).order_by('datetime')[:10]
         return Response({
             'status':  {
-                'total_projects': total_projects,
-                'active_projects': active_projects,
-                'completed_projects': completed_projects,
-                'total_volunteers': total_volunteers,
+                'total_projects': totals['total_projects'],
+                'active_projects': totals['active_projects'],
+                'completed_projects': totals['completed_projects'],
+                'total_volunteers': totals['total_volunteers'],
             },
                 'recent_projects': ProjectSerializer(recent_projects, many=True, context={'request': request}).data,
                 'upcoming_deadlines': ProjectSerializer(upcoming_deadlines, many=True, context={'request': request}).data
@@ -343,12 +336,13 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def my_projects(self, request):
         """ List of projects created by current user """
         user = request.user
+        projects = Project.objects.for_listing(user)
         if user.role == 'leader':
-            projects = Project.objects.filter(admin=user)
+            projects = projects.filter(admin=user)
         else:
             # Get project user has attended 
             attended_project_ids = Attendance.objects.filter(user=user).values_list('project_id', flat=True)
-            projects = Project.objects.filter(id__in=attended_project_ids)
+            projects = projects.filter(id__in=attended_project_ids)
 
         serializer = self.get_serializer(projects, many=True)
         return Response(serializer.data)
@@ -357,8 +351,6 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def join(self, request, pk=None):
         """Join/Register for a project"""
-        from django.db import transaction
-        
         project = self.get_object()
         user = request.user
         
@@ -366,46 +358,56 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if project.status not in ['planned', 'ongoing']:
             return Response({'error': 'Cannot join this project'}, status=status.HTTP_400_BAD_REQUEST)
         
+        if ProjectRegistration.objects.filter(user=user, project=project).exists():
+            return Response({'message': 'Already registered for this project'})
+
         try:
             with transaction.atomic():
-                # Lock the project to prevent race conditions
-                project = Project.objects.select_for_update().get(pk=project.pk)
-                
-                # Check if project is full
-                if project.registrations.count() >= project.required_volunteers:
-                    return Response({'error': 'Project is full'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                registration, created = ProjectRegistration.objects.get_or_create(
-                    user=user, project=project
+                # Reserve a place first, the conditional update is what prevents overbooking
+                reserved = counters.reserve(project.pk)
+
+                # The unique (user, project) constraint catches concurrent double joins
+                registration = ProjectRegistration.objects.create(
+                    user=user, project=project,
+                    status='registered' if reserved else waitlist.WAITLISTED
                 )
-                
-                if created:
-                    from apps.notifications.utils import notify_project_leader_new_registration
-                    notify_project_leader_new_registration(project, user)
-    
-                    return Response({
-                        'message': 'Successfully joined project',
-                        'registration': ProjectRegistrationSerializer(registration).data
-                    }, status=status.HTTP_201_CREATED)
-                else:
-                    return Response({'message': 'Already registered for this project'})
-                    
+        except IntegrityError:
+            # Rolling back the transaction also released the reserved place
+            return Response({'message': 'Already registered for this project'})
         except Exception:
             return Response({'error': 'Failed to join project'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        if not reserved:
+            return Response({
+                'message': 'Project is full, you have been added to the waitlist',
+                'waitlisted': True,
+                'position': waitlist.position(registration),
+                'registration': ProjectRegistrationSerializer(registration).data
+            }, status=status.HTTP_202_ACCEPTED)
+
+        from apps.notifications.utils import notify_project_leader_new_registration
+        notify_project_leader_new_registration(project, user)
+
+        return Response({
+            'message': 'Successfully joined project',
+            'waitlisted': False,
+            'registration': ProjectRegistrationSerializer(registration).data
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['delete'])
     def leave(self, request, pk=None):
-        """Leave/Unregister from a project"""
+        """Leave/Unregister from a project, the first waitlisted volunteer takes the freed place"""
         project = self.get_object()
         try:
             registration = ProjectRegistration.objects.get(
                 user=request.user, project=project
             )
-            registration.delete()
-            return Response({'message': 'Successfully left project'})
         except ProjectRegistration.DoesNotExist:
             return Response({'error': 'Not registered for this project'}, status=status.HTTP_400_BAD_REQUEST)
 
+        waitlist.release(registration)
+        return Response({'message': 'Successfully left project'})
+
     @action(detail=True, methods=['get'])
     def registrations(self, request, pk=None):
         """Get project registrations (Leaders only)"""
@@ -415,11 +417,12 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if project.admin != request.user:
             return Response({'error': 'Only project admin can view registrations'}, status=status.HTTP_403_FORBIDDEN)
         
-        registrations = project.registrations.all()
+        registrations = project.registrations.select_related('user')
         serializer = ProjectRegistrationSerializer(registrations, many=True)
         return Response({
             'project': project.title,
-            'total_registered': registrations.count(),
+            'total_registered': project.registered_count,
+            'total_waitlisted': waitlist.queue(project.pk).count(),
             'registrations': serializer.data
         })
 
@@ -452,6 +455,22 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         else:
             # Volunteers can only see their own attendance
             return Attendance.objects.filter(user=user)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            attendance = serializer.save()
+            # As with checkin, only the user's first attendance adds a volunteer to the project
+            if not Attendance.objects.filter(
+                user_id=attendance.user_id, project_id=attendance.project_id
+            ).exclude(pk=attendance.pk).exists():
+                counters.volunteered(attendance.project_id, 1)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            # The project loses the volunteer with their last attendance record
+            if not Attendance.objects.filter(user_id=instance.user_id, project_id=instance.project_id).exists():
+                counters.volunteered(instance.project_id, -1)
 @swagger_auto_schema(
     method='post',
     operation_description="Generate QR code for project check-in (Project admin only)",
@@ -523,12 +542,18 @@ def checkin(request):
         if existing_attendance:
             return Response({'error': 'You have already checked in to this project.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create attendance record
-        attendance = Attendance.objects.create(
-            user=request.user,
-            project_id=project_id,
-            check_in_time=timezone.now()
-        )
+        with transaction.atomic():
+            # Only the first check-in of a user adds a volunteer to the project
+            first_visit = not Attendance.objects.filter(user=request.user, project_id=project_id).exists()
+
+            # Create attendance record
+            attendance = Attendance.objects.create(
+                user=request.user,
+                project_id=project_id,
+                check_in_time=timezone.now()
+            )
+            if first_visit:
+                counters.volunteered(project_id, 1)
 
         return Response({
             'message': 'Checked in successfully.',
@@ -0,0 +1,52 @@
+from django.db import transaction
+from .models import ProjectRegistration
+from . import counters
+
+WAITLISTED = 'waitlisted'
+
+
+def queue(project_id):
+    """ Waitlisted registrations of a project, head of the queue first """
+    return ProjectRegistration.objects.filter(project_id=project_id, status=WAITLISTED).order_by('id')
+
+
+def position(registration):
+    """ 1-based place of a waitlisted registration in its project's queue """
+    return queue(registration.project_id).filter(id__lt=registration.id).count() + 1
+
+
+def fill(project):
+    """
+    Promote waitlisted registrations while the project has free places.
+
+    Each promotion takes the queue head (an index lookup) and reserves its
+    place with the same conditional update join uses, so it is safe to run
+    next to concurrent joins. Promoted users are notified in one batch once
+    the surrounding transaction commits. Returns the promoted registrations.
+    """
+    promoted = []
+    with transaction.atomic():
+        while True:
+            head = queue(project.pk).select_for_update(skip_locked=True).select_related('user').first()
+            if head is None or not counters.reserve(project.pk):
+                break
+            ProjectRegistration.objects.filter(pk=head.pk).update(status='registered')
+            head.status = 'registered'
+            promoted.append(head)
+
+    if promoted:
+        from apps.notifications.utils import notify_waitlist_promoted
+        users = [registration.user for registration in promoted]
+        transaction.on_commit(lambda: notify_waitlist_promoted(project, users))
+    return promoted
+
+
+def release(registration):
+    """ Delete a registration and hand its place to the head of the queue """
+    with transaction.atomic():
+        # Deleting by pk tells us whether a concurrent leave got there first
+        deleted, _ = ProjectRegistration.objects.filter(pk=registration.pk).delete()
+        if not deleted or registration.status == WAITLISTED:
+            return []
+        counters.registered(registration.project_id, -1)
+        return fill(registration.project)
@@ -46,25 +46,27 @@ def register(request):
         # Generate and send OTP
         otp = OTP.generate_otp(phone_number)
 
-        # Log OTP for debugging gusa
-        print(f"🔥 DEBUG: OTP generated for {phone_number}: {otp.code}")
-        # logger.debug(f"OTP generated for {phone_number}: {otp.code}")
-        logger.info(f"📱 OTP generated for {phone_number}: {otp.code}")
-                # Send SMS
-        # sms_service = SMSService()
-        sms_sent = True
-        sms_result =  "SMS_DISABLED_LOGS_ONLY" 
+        # Queue SMS, the outbound worker sends it
+        if settings.OTP_SMS_ENABLED:
+            sms_sent, sms_result = SMSService().send_otp(phone_number, otp.code)
+            # Never log the live code once it goes out by SMS
+            logger.info(f"📱 OTP generated for {phone_number}, SMS {sms_result}")
+        else:
+            sms_sent = True
+            sms_result =  "SMS_DISABLED_LOGS_ONLY" 
         
-        # Log that SMS is disabled
-        print(f"📵 SMS DISABLED - Check logs for OTP: {otp.code}")
-        logger.info(f"SMS sending disabled - OTP available in logs only")
+            # Log OTP for debugging gusa, only when SMS is disabled
+            print(f"🔥 DEBUG: OTP generated for {phone_number}: {otp.code}")
+            print(f"📵 SMS DISABLED - Check logs for OTP: {otp.code}")
+            logger.info(f"SMS sending disabled - OTP available in logs only")
 
         response_data = {
             "message": "OTP sent to phone number",
             "phone_number": phone_number,
             "sms_sent": sms_sent,
-            "otp": otp.code  # for development only
         }
+        if not settings.OTP_SMS_ENABLED:
+            response_data["otp"] = otp.code  # for development only
 
         # Include OTP in development mode only
         # if settings.DEBUG:
@@ -303,25 +305,26 @@ def resend_otp(request):
     # Generate new OTP
     otp = OTP.generate_otp(phone_number)
 
-    # Log OTP for debugging
-    print(f"🔥 DEBUG: OTP resent for {phone_number}: {otp.code}")
-    # logger.debug(f"OTP resent for {phone_number}: {otp.code}")
-    logger.info(f"📱 OTP resent for {phone_number}: {otp.code}")
-    # Send SMS
-    # sms_service = SMSService()
-
-    sms_sent = True
-    sms_result = "SMS_DISABLED_LOGS_ONLY"
+    # Queue SMS, the outbound worker sends it
+    if settings.OTP_SMS_ENABLED:
+        sms_sent, sms_result = SMSService().send_otp(phone_number, otp.code)
+        # Never log the live code once it goes out by SMS
+        logger.info(f"📱 OTP resent for {phone_number}, SMS {sms_result}")
+    else:
+        sms_sent = True
+        sms_result = "SMS_DISABLED_LOGS_ONLY"
     
-    # Log SMS result
-    print(f"📵 SMS DISABLED - Check logs for OTP: {otp.code}")
-    logger.info(f"SMS sending disabled - OTP available in logs only")
+        # Log OTP for debugging, only when SMS is disabled
+        print(f"🔥 DEBUG: OTP resent for {phone_number}: {otp.code}")
+        print(f"📵 SMS DISABLED - Check logs for OTP: {otp.code}")
+        logger.info(f"SMS sending disabled - OTP available in logs only")
 
     response_data = {
         "message": "OTP resent successfully",
         "sms_sent": sms_sent,
-        'otp_code': otp.code
     }
+    if not settings.OTP_SMS_ENABLED:
+        response_data['otp_code'] = otp.code  # for development only
 
     return Response(response_data, status=status.HTTP_200_OK)
 
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_approval_date_user_approved_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['phone_number', 'code', 'is_verified', '-created_at'], name='otp_lookup_idx'),
+        ),
+    ]
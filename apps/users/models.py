@@ -94,6 +94,10 @@ class OTP(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Latest unverified OTP for a phone number and code
+            models.Index(fields=['phone_number', 'code', 'is_verified', '-created_at'], name='otp_lookup_idx'),
+        ]
 
     def is_expired(self):
         return timezone.now() > self.created_at + timedelta(minutes=5)
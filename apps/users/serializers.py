@@ -79,6 +79,27 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
 
+class UserSummarySerializer(serializers.ModelSerializer):
+    """ Just enough of a user to show as an author (load it with select_related('user')) """
+    name = serializers.SerializerMethodField()
+    avatar_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ["id", "name", "avatar_url"]
+
+    def get_name(self, obj):
+        return " ".join(filter(None, [obj.first_name, obj.last_name])) or obj.phone_number
+
+    def get_avatar_url(self, obj):
+        if obj.avatar:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(obj.avatar.url)
+            return obj.avatar.url
+        return None
+
+
 # --------------------------------
 # Authentication Serializers
 # --------------------------------
@@ -1,33 +1,47 @@
+import re
+from functools import lru_cache
+
 from twilio.rest import Client
 from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=None)
+def twilio_client():
+    """ One Twilio client per process, so its HTTP session (and connections) are reused across sends """
+    return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+
+def format_phone_number(phone_number):
+    """ Format phone number for Rwanda (+250): '0788 123 456', '250788123456' and '+250788123456' are the same number """
+    phone_number = re.sub(r'[\s\-().]', '', phone_number)
+    if not phone_number.startswith('+'):
+        if phone_number.startswith('250'):
+            phone_number = '+' + phone_number
+        else:
+            phone_number = '+250' + phone_number.lstrip('0')
+    return phone_number
+
+
 class SMSService:
     def __init__(self):
-        self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
         self.from_number = settings.TWILIO_PHONE_NUMBER
-    
+
     def send_otp(self, phone_number, otp_code):
-        """Send OTP via SMS"""
+        """Queue the OTP SMS, the run_outbound_worker command delivers it"""
+        from apps.notifications import outbound
+
         try:
-            # Format phone number for Rwanda (+250)
-            if not phone_number.startswith('+'):
-                if phone_number.startswith('250'):
-                    phone_number = '+' + phone_number
-                else:
-                    phone_number = '+250' + phone_number
-            
-            message = self.client.messages.create(
-                body=f'Your UmugandaTech verification code is: {otp_code}. Valid for 5 minutes.',
-                from_=self.from_number,
-                to=phone_number
+            message = outbound.enqueue(
+                'sms',
+                format_phone_number(phone_number),
+                f'Your UmugandaTech verification code is: {otp_code}. Valid for 5 minutes.',
             )
-            
-            logger.info(f'SMS sent successfully to {phone_number}. SID: {message.sid}')
-            return True, message.sid
-            
+            logger.info(f'SMS queued for {message.recipient}. Outbound id: {message.id}')
+            return True, f'queued:{message.id}'
+
         except Exception as e:
-            logger.error(f'Failed to send SMS to {phone_number}: {str(e)}')
+            logger.error(f'Failed to queue SMS to {phone_number}: {str(e)}')
             return False, str(e)
@@ -1,3 +1,49 @@
-from django.test import TestCase
+import logging
+from contextlib import redirect_stdout
+from io import StringIO
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.notifications.models import OutboundMessage
+from .models import OTP
+
+
+class OTPDeliveryTests(TestCase):
+    """ Live OTP codes go out by SMS only, never into logs or responses """
+
+    # Both have their own handlers and don't propagate to the root logger
+    LOGGERS = ('apps.users.auth_views', 'apps.users.sms_service')
+
+    def _post(self, url, phone_number):
+        output = StringIO()
+        handler = logging.StreamHandler(output)
+        for name in self.LOGGERS:
+            logging.getLogger(name).addHandler(handler)
+        try:
+            with redirect_stdout(output):
+                response = APIClient().post(url, {"phone_number": phone_number}, format="json")
+        finally:
+            for name in self.LOGGERS:
+                logging.getLogger(name).removeHandler(handler)
+        self.assertEqual(response.status_code, 200)
+        code = OTP.objects.filter(phone_number=phone_number).latest('created_at').code
+        return response, code, output.getvalue()
+
+    @override_settings(OTP_SMS_ENABLED=True)
+    def test_codes_sent_by_sms_are_not_logged(self):
+        for url in ("/api/users/auth/register/", "/api/users/auth/resend-otp/"):
+            response, code, logged = self._post(url, "788000301")
+
+            self.assertNotIn(code, logged)
+            self.assertNotIn("otp", response.data)
+            self.assertNotIn("otp_code", response.data)
+            self.assertIn(code, OutboundMessage.objects.latest('id').body)
+
+    @override_settings(OTP_SMS_ENABLED=False)
+    def test_codes_are_logged_when_sms_is_disabled(self):
+        response, code, logged = self._post("/api/users/auth/register/", "788000302")
+
+        self.assertIn(code, logged)
+        self.assertEqual(response.data["otp"], code)
+        self.assertFalse(OutboundMessage.objects.exists())
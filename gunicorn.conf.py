@@ -1,6 +1,12 @@
+import os
+
 bind = "0.0.0.0:8000"
-workers = 2
-worker_class = "sync"
+# Several workers need the Redis push broker, a plain local run without REDIS_URL gets one
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 if os.environ.get("REDIS_URL") else 1))
+# Settings refuse to start several workers on the in-process push broker, they read this back
+os.environ["WEB_CONCURRENCY"] = str(workers)
+# Uvicorn workers serve the ASGI app, needed for the notification push stream
+worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 100
@@ -0,0 +1,140 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset (cursor) pagination.
+
+    Active when the request carries ``cursor`` (empty for the first page) or
+    ``pagination=cursor``; otherwise views keep returning plain lists. Pages
+    are keyed on the queryset's first ordering field plus ``id`` as a stable
+    tiebreaker, so deep pages cost the same as the first one. The total count
+    is omitted unless asked for with ``count=exact`` or ``count=approx``.
+    """
+    page_size = 10
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or params.get('pagination') == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, ordering=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(queryset, ordering)
+        self.total = self.get_total(queryset, request)
+
+        direction = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{direction}{self.field}', f'{direction}pk')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            lookup = 'lt' if self.descending else 'gt'
+            try:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__{lookup}': value}) |
+                    Q(**{self.field: value, f'pk__{lookup}': pk})
+                )
+            except (TypeError, ValueError, ValidationError):
+                # Well-formed cursor carrying a value the field can't take
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset, ordering=None):
+        if not ordering:
+            ordering = next(iter(queryset.query.order_by or queryset.model._meta.ordering or ['-pk']))
+            if not isinstance(ordering, str):
+                ordering = '-pk'
+        descending = ordering.startswith('-')
+        field = ordering.lstrip('-')
+        return ('pk' if field == 'id' else field), descending
+
+    def get_total(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            field, value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if field != self.field:
+            # The cursor belongs to a different sort order
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def encode_cursor(self, item):
+        value = getattr(item, self.field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        payload = json.dumps([self.field, value, item.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+            'results': data,
+        }
+        if self.total is not None:
+            response['count'] = self.total
+        return Response(response)
+
+
+def estimate_count(queryset):
+    """ Planner row estimate on PostgreSQL (no table scan), exact count elsewhere """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -15,6 +15,7 @@ from decouple import config
 import os
 from datetime import timedelta
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -110,6 +111,24 @@ else:
     }
 }
 
+# Cache
+# Set REDIS_URL in production so cached feeds and counters are shared by every worker
+REDIS_URL = config("REDIS_URL", default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'umugandatech',
+        }
+    }
+
 AUTH_USER_MODEL = "users.User"
 
 
@@ -233,6 +252,108 @@ TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
 TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER', default='')
 
+# Project search
+# 'fulltext' uses the maintained search index (PostgreSQL tsvector / SQLite FTS5),
+# 'basic' keeps the icontains scan. Clients can override per request with ?search_mode=
+PROJECT_SEARCH_MODE = config('PROJECT_SEARCH_MODE', default='fulltext')
+PROJECT_SEARCH_CONFIG = config('PROJECT_SEARCH_CONFIG', default='simple')
+
+# Seconds a precomputed discover feed stays cached (it is also invalidated on project/attendance changes)
+DISCOVER_FEED_TTL = config('DISCOVER_FEED_TTL', default=300, cast=int)
+
+# Notification fan-out: user ids are streamed in chunks and inserted in bounded batches.
+# With NOTIFICATION_FANOUT_ASYNC fan-outs and SMS campaigns are stored as jobs and run by the
+# run_fanout_worker command; otherwise they run inline in the request.
+NOTIFICATION_FANOUT_ASYNC = config('NOTIFICATION_FANOUT_ASYNC', default=True, cast=bool)
+NOTIFICATION_FANOUT_CHUNK_SIZE = config('NOTIFICATION_FANOUT_CHUNK_SIZE', default=2000, cast=int)
+NOTIFICATION_FANOUT_BATCH_SIZE = config('NOTIFICATION_FANOUT_BATCH_SIZE', default=1000, cast=int)
+# Seconds a fan-out worker may go without committing a batch before another worker takes its job over
+FANOUT_LEASE_SECONDS = config('FANOUT_LEASE_SECONDS', default=300, cast=int)
+# Items returned by the notification list (and unread list) when no cursor is given
+NOTIFICATION_LIST_LIMIT = config('NOTIFICATION_LIST_LIMIT', default=100, cast=int)
+# Seconds a cached unread notification count lives before it is recomputed
+NOTIFICATION_UNREAD_TTL = config('NOTIFICATION_UNREAD_TTL', default=600, cast=int)
+# Seconds during which repeated upvote/comment notifications on a post merge into one digest row
+NOTIFICATION_DIGEST_WINDOW = config('NOTIFICATION_DIGEST_WINDOW', default=3600, cast=int)
+
+# Notification push stream (/api/notifications/stream/, served by the ASGI app).
+# The in-process broker only reaches streams held by the same process, so with several
+# workers or nodes it falls back to Redis pub/sub whenever REDIS_URL is set.
+NOTIFICATION_PUSH_BROKER = config(
+    'NOTIFICATION_PUSH_BROKER',
+    default='apps.notifications.push.RedisBroker' if REDIS_URL else 'apps.notifications.push.InProcessBroker'
+)
+# Web worker processes; gunicorn.conf.py exports it so every worker sees the count it was started with.
+# Several workers on the in-process broker (and local memory cache) would each see only a slice
+# of the streams and counters, refuse to start instead.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)
+if WEB_CONCURRENCY > 1 and NOTIFICATION_PUSH_BROKER.endswith('.InProcessBroker'):
+    raise ImproperlyConfigured(
+        f"WEB_CONCURRENCY={WEB_CONCURRENCY} needs a shared push broker: set REDIS_URL (or NOTIFICATION_PUSH_BROKER)"
+    )
+# Seconds a stream ticket (POST /api/notifications/stream/ticket/) can be redeemed
+NOTIFICATION_PUSH_TICKET_TTL = config('NOTIFICATION_PUSH_TICKET_TTL', default=30, cast=int)
+NOTIFICATION_PUSH_HEARTBEAT = config('NOTIFICATION_PUSH_HEARTBEAT', default=15, cast=int)
+NOTIFICATION_PUSH_RETRY_MS = config('NOTIFICATION_PUSH_RETRY_MS', default=5000, cast=int)
+NOTIFICATION_PUSH_QUEUE_SIZE = config('NOTIFICATION_PUSH_QUEUE_SIZE', default=100, cast=int)
+
+# Days notifications and broadcasts are kept, per notification_type (prune_notifications)
+NOTIFICATION_RETENTION_DAYS = {
+    'default': config('NOTIFICATION_RETENTION_DAYS', default=90, cast=int),
+    'project_created': 30,
+    'project_reminder': 14,
+    'upvote_received': 30,
+}
+
+
+# Outbound SMS/email queue (OutboundMessage), drained by `manage.py run_outbound_worker`.
+# Without Twilio credentials SMS goes to the fake provider, which only keeps messages in memory.
+OUTBOUND_PROVIDERS = {
+    'sms': config(
+        'OUTBOUND_SMS_PROVIDER',
+        default='apps.notifications.providers.TwilioProvider' if TWILIO_ACCOUNT_SID else 'apps.notifications.providers.FakeProvider'
+    ),
+    'email': config('OUTBOUND_EMAIL_PROVIDER', default='apps.notifications.providers.EmailProvider'),
+}
+# Sends per second per provider, shared by all workers through the cache (0 = unlimited)
+OUTBOUND_RATE_LIMITS = {
+    'twilio': config('OUTBOUND_TWILIO_RATE', default=10, cast=int),
+    'email': config('OUTBOUND_EMAIL_RATE', default=5, cast=int),
+}
+OUTBOUND_BATCH_SIZE = config('OUTBOUND_BATCH_SIZE', default=50, cast=int)
+OUTBOUND_MAX_ATTEMPTS = config('OUTBOUND_MAX_ATTEMPTS', default=5, cast=int)
+# Retry n waits OUTBOUND_RETRY_BASE * 2**(n-1) seconds (plus jitter), capped at OUTBOUND_RETRY_MAX
+OUTBOUND_RETRY_BASE = config('OUTBOUND_RETRY_BASE', default=30, cast=int)
+OUTBOUND_RETRY_MAX = config('OUTBOUND_RETRY_MAX', default=3600, cast=int)
+# Seconds a worker may hold claimed messages before another worker takes them over
+OUTBOUND_LEASE_SECONDS = config('OUTBOUND_LEASE_SECONDS', default=300, cast=int)
+# Queue OTP codes as SMS on register/resend_otp (otherwise they are only logged)
+OTP_SMS_ENABLED = config('OTP_SMS_ENABLED', default=False, cast=bool)
+
+
+# Project reminders (`manage.py run_reminder_scheduler`): hours before Project.datetime at which
+# registered volunteers are reminded, in-app and, with PROJECT_REMINDER_SMS, by SMS
+PROJECT_REMINDER_WINDOWS = [
+    int(hours) for hours in config('PROJECT_REMINDER_WINDOWS', default='24,1').split(',') if hours.strip()
+]
+PROJECT_REMINDER_SMS = config('PROJECT_REMINDER_SMS', default=False, cast=bool)
+# A reminder whose send raised is retried after PROJECT_REMINDER_RETRY_SECONDS * 2**(n-1) seconds,
+# and marked failed after PROJECT_REMINDER_MAX_ATTEMPTS tries so it can't hold up the others
+PROJECT_REMINDER_MAX_ATTEMPTS = config('PROJECT_REMINDER_MAX_ATTEMPTS', default=5, cast=int)
+PROJECT_REMINDER_RETRY_SECONDS = config('PROJECT_REMINDER_RETRY_SECONDS', default=60, cast=int)
+PROJECT_REMINDER_SMS_TEMPLATE = config(
+    'PROJECT_REMINDER_SMS_TEMPLATE',
+    default="Reminder: {title} starts on {date} at {time}, {location}. Murakoze!"
+)
+
+
+# Community "hot" feed: score = (upvotes + weight * comments + 1) / (age in hours + 2) ** gravity.
+# Scores are refreshed on every upvote/comment and aged by `manage.py decay_hot_scores`;
+# posts older than the horizon drop out of the ranking.
+HOT_FEED_GRAVITY = config('HOT_FEED_GRAVITY', default=1.5, cast=float)
+HOT_FEED_COMMENT_WEIGHT = config('HOT_FEED_COMMENT_WEIGHT', default=2, cast=int)
+HOT_FEED_HORIZON_DAYS = config('HOT_FEED_HORIZON_DAYS', default=14, cast=int)
+
 
 # Logging Configuration
 LOGGING = {